@@ -0,0 +1,6 @@
+"""
+基准测试模块初始化文件
+"""
+from .workload import WorkloadGenerator
+
+__all__ = ['WorkloadGenerator']
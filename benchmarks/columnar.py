@@ -0,0 +1,108 @@
+"""
+按列读取基准测试
+对比逐行构造字典、记录对象和按列读取（Database.read_columns）三种方式读取窗口会话并按应用汇总时长的耗时，
+以及按列重建小时聚合表的耗时
+
+用法:
+    python benchmarks/columnar.py --days 30
+"""
+import sys
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from typing import Dict, Any, Callable
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database import Database
+from benchmarks.workload import WorkloadGenerator
+from reporting import charts
+
+
+def summarize_dicts(db: Database) -> Dict[str, float]:
+    """旧的读取方式：sqlite3.Row -> dict，再在Python中逐条累加"""
+    cursor = db.connection.cursor()
+    cursor.execute("SELECT * FROM window_activities ORDER BY start_time")
+    return charts.summarize_usage([dict(row) for row in cursor.fetchall()])
+
+
+def summarize_records(db: Database) -> Dict[str, float]:
+    """记录对象：行工厂构造记录，再在Python中逐条累加"""
+    return charts.summarize_usage(db.get_window_activities())
+
+
+def summarize_columns(db: Database) -> Dict[str, float]:
+    """按列读取：只取需要的列，用 bincount 汇总"""
+    columns = db.read_columns('window_activities', columns=['process_name', 'start_time', 'end_time', 'duration'])
+    return charts.summarize_columns(columns)
+
+
+def best_of(func: Callable, repeat: int) -> float:
+    """多次运行取最短耗时（毫秒）"""
+    samples = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - begin) * 1000)
+    return min(samples)
+
+
+def main():
+    """主函数 - 写入工作负载后对比各读取方式"""
+    parser = argparse.ArgumentParser(description="Focus-Insight 按列读取基准测试")
+    parser.add_argument('--days', type=int, default=30, help="生成数据的天数")
+    parser.add_argument('--seed', type=int, default=42, help="随机种子")
+    parser.add_argument('--repeat', type=int, default=5, help="每种方式的重复次数")
+    parser.add_argument('--output', default=None, help="结果JSON文件路径")
+    args = parser.parse_args()
+
+    print("=== 按列读取基准测试 ===")
+    work_dir = tempfile.mkdtemp(prefix="focus_columnar_bench_")
+    try:
+        db = Database(os.path.join(work_dir, "bench.db"))
+        generator = WorkloadGenerator(seed=args.seed)
+        for day_data in generator.iter_days(args.days):
+            for record in day_data['window_activities']:
+                db.insert_window_activity(**record, commit=False)
+        db.commit()
+        sessions = db.count_window_activities()
+
+        # 三种方式的汇总结果应当一致
+        expected = summarize_dicts(db)
+        for func in (summarize_records, summarize_columns):
+            result = func(db)
+            assert result.keys() == expected.keys()
+            assert all(abs(result[app] - expected[app]) < 1e-6 for app in expected)
+
+        results: Dict[str, Any] = {
+            'days': args.days,
+            'sessions': sessions,
+            'summarize_ms': {
+                'dict': best_of(lambda: summarize_dicts(db), args.repeat),
+                'records': best_of(lambda: summarize_records(db), args.repeat),
+                'columns': best_of(lambda: summarize_columns(db), args.repeat),
+            },
+            'rebuild_hourly_buckets_ms': best_of(db.rebuild_hourly_buckets, args.repeat),
+        }
+        db.close()
+
+        print(f"{sessions} 个窗口会话")
+        for name, label in (('dict', "字典"), ('records', "记录对象"), ('columns', "按列读取")):
+            print(f"    [{label}] 读取并按应用汇总 {results['summarize_ms'][name]:.1f} ms")
+        print(f"    重建小时聚合表 {results['rebuild_hourly_buckets_ms']:.1f} ms")
+
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            print(f"结果已保存到: {args.output}")
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+基准测试结果对比
+比较两次运行输出的JSON结果，列出各项指标的变化
+
+用法:
+    python benchmarks/compare.py old.json new.json --threshold 10
+"""
+import sys
+import json
+import argparse
+from typing import Dict, Any, List, Tuple
+
+
+def flatten_metrics(size_result: Dict[str, Any]) -> Dict[str, float]:
+    """把单个数据规模的结果展开为 指标名 -> 数值（数值越小越好）"""
+    metrics = {}
+    for name, stats in size_result.get('queries', {}).items():
+        metrics[f"{name}.median_ms"] = stats['median_ms']
+        metrics[f"{name}.p95_ms"] = stats['p95_ms']
+
+    insert = size_result.get('insert')
+    if insert and insert.get('rows_per_second'):
+        # 吞吐量取倒数，统一为“越小越好”
+        metrics['insert.us_per_row'] = 1e6 / insert['rows_per_second']
+
+    if 'db_size_bytes' in size_result:
+        metrics['db_size_bytes'] = size_result['db_size_bytes']
+
+    render = size_result.get('render')
+    if render:
+        metrics['render.median_ms'] = render['median_ms']
+
+    return metrics
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float) -> List[Tuple[int, str, float, float, float]]:
+    """
+    对比两次结果
+    :return: (天数, 指标, 旧值, 新值, 变化百分比) 列表
+    """
+    old_sizes = {item['days']: item for item in old.get('sizes', [])}
+    rows = []
+    for item in new.get('sizes', []):
+        baseline = old_sizes.get(item['days'])
+        if baseline is None:
+            continue
+
+        old_metrics = flatten_metrics(baseline)
+        for name, value in flatten_metrics(item).items():
+            if name not in old_metrics or old_metrics[name] == 0:
+                continue
+            change = (value - old_metrics[name]) / old_metrics[name] * 100
+            rows.append((item['days'], name, old_metrics[name], value, change))
+    return rows
+
+
+def main():
+    """主函数 - 打印对比结果，出现超过阈值的退化时返回非零退出码"""
+    parser = argparse.ArgumentParser(description="对比两次基准测试结果")
+    parser.add_argument('old', help="基线结果JSON")
+    parser.add_argument('new', help="新结果JSON")
+    parser.add_argument('--threshold', type=float, default=10.0, help="判定为退化的变化百分比")
+    args = parser.parse_args()
+
+    with open(args.old, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+
+    regressions = 0
+    for days, name, old_value, new_value, change in compare(old, new, args.threshold):
+        flag = ""
+        if change > args.threshold:
+            flag = "  <-- 退化"
+            regressions += 1
+        print(f"[{days:>4}天] {name:<36} {old_value:>14.3f} -> {new_value:>14.3f} ({change:+.1f}%){flag}")
+
+    print(f"\n共发现 {regressions} 项退化（阈值 {args.threshold}%）")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+今日数据热层基准测试
+按记录的时间顺序回放最后一天的写入，对比三种写入方式落到磁盘的写入量（按小时折算）：
+逐条提交（同步监控循环）、每2秒批量提交（异步运行时）和热层（内存数据库 + 重做日志，每分钟刷写）；
+并对比查看器打开"今天"时的查询耗时（持久数据库文件 vs 内存数据库）
+
+用法:
+    python benchmarks/hot_tier.py --days 30
+"""
+import sys
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Tuple, Callable
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database import Database
+from data.hot_tier import HotTierDatabase
+from benchmarks.workload import WorkloadGenerator
+from monitoring.clock import FakeClock
+
+
+# 每类记录的写入方法和写入时间（记录结束后才写入）
+RECORD_KINDS = [
+    ('window_activities', 'insert_window_activity', lambda record: record['end_time']),
+    ('browser_activities', 'insert_browser_activity', lambda record: record['end_time']),
+    ('state_changes', 'insert_state_change', lambda record: record['timestamp']),
+    ('input_minutes', 'upsert_input_minutes', lambda record: record['hour_start'] + timedelta(hours=1)),
+]
+
+
+def write_history(db: Database, days: List[Dict[str, Any]]):
+    """写入历史数据（不计入测量）"""
+    for day_data in days:
+        for kind, method, _ in RECORD_KINDS:
+            for record in day_data[kind]:
+                getattr(db, method)(**record, commit=False)
+    db.commit()
+
+
+def timeline(day_data: Dict[str, Any], day_end: datetime) -> List[Tuple[datetime, str, Dict[str, Any]]]:
+    """当天的写入按写入时间排序（最后一小时的输入计数在零点前写入，回放不跨日）"""
+    events = [(min(written_at(record), day_end), method, record)
+              for kind, method, written_at in RECORD_KINDS for record in day_data[kind]]
+    events.sort(key=lambda event: event[0])
+    return events
+
+
+def wal_size(db: Database) -> int:
+    """WAL文件大小（关闭了自动检查点，只增不减）"""
+    path = db.db_path + "-wal"
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def replay_per_record(db: Database, events) -> Dict[str, int]:
+    """逐条提交：同步监控循环中每条记录单独提交"""
+    for _, method, record in events:
+        getattr(db, method)(**record)
+    return {'commits': len(events), 'fsyncs': len(events), 'log_bytes': 0}
+
+
+def replay_batched(db: Database, events, batch_seconds: float = 2.0) -> Dict[str, int]:
+    """攒批提交：异步运行时的写入协程每 batch_seconds 秒提交一次"""
+    commits = 0
+    batch_end = None
+    for moment, method, record in events:
+        if batch_end is not None and moment >= batch_end:
+            db.commit()
+            commits += 1
+            batch_end = None
+        if batch_end is None:
+            batch_end = moment + timedelta(seconds=batch_seconds)
+        getattr(db, method)(**record, commit=False)
+    db.commit()
+    commits += 1
+    return {'commits': commits, 'fsyncs': commits, 'log_bytes': 0}
+
+
+def replay_hot_tier(db: Database, events, log_path: str, clock: FakeClock,
+                    flush_interval: float) -> Tuple[HotTierDatabase, Dict[str, int]]:
+    """热层：写入内存数据库和重做日志，每 flush_interval 秒刷写一次"""
+    hot = HotTierDatabase(db, log_path, flush_interval=flush_interval, clock=clock)
+    base_flushes = hot.flushes
+    for moment, method, record in events:
+        clock.current = moment
+        getattr(hot, method)(**record)
+    hot.flush()
+    hot.log.sync(clock.current, force=True)
+    flushes = hot.flushes - base_flushes
+    return hot, {'commits': flushes, 'fsyncs': flushes + hot.log.syncs, 'log_bytes': hot.log.bytes_written}
+
+
+def today_queries(db: Database, day_start: datetime) -> Callable[[], None]:
+    """查看器打开今天时的查询：时间轴会话、每分钟输入计数和当日摘要"""
+    day_end = day_start + timedelta(days=1) - timedelta(microseconds=1)
+
+    def run():
+        db.get_window_activities(day_start, day_end, clip=True)
+        db.get_input_minutes(day_start, day_end)
+        db.get_daily_summary(day_start)
+    return run
+
+
+def best_of(func: Callable, repeat: int) -> float:
+    """多次运行取最短耗时（毫秒）"""
+    samples = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - begin) * 1000)
+    return min(samples)
+
+
+def main():
+    """主函数 - 在相同的历史数据上分别回放最后一天的写入"""
+    parser = argparse.ArgumentParser(description="Focus-Insight 今日数据热层基准测试")
+    parser.add_argument('--days', type=int, default=30, help="历史数据天数（最后一天作为今天回放）")
+    parser.add_argument('--seed', type=int, default=42, help="随机种子")
+    parser.add_argument('--flush-interval', type=float, default=60.0, help="热层刷写间隔（秒）")
+    parser.add_argument('--repeat', type=int, default=20, help="查询的重复次数")
+    parser.add_argument('--output', default=None, help="结果JSON文件路径")
+    args = parser.parse_args()
+
+    print("=== 今日数据热层基准测试 ===")
+    generator = WorkloadGenerator(seed=args.seed)
+    days = list(generator.iter_days(args.days))
+    day_start = generator.start_date + timedelta(days=args.days - 1)
+    events = timeline(days[-1], day_start + timedelta(days=1) - timedelta(microseconds=1))
+    hours = max((events[-1][0] - events[0][0]).total_seconds() / 3600, 1e-9)
+
+    results: Dict[str, Any] = {'days': args.days, 'records_today': len(events), 'hours': hours, 'designs': {}}
+    work_dir = tempfile.mkdtemp(prefix="focus_hot_tier_bench_")
+    try:
+        for name in ('per_record', 'batched', 'hot_tier'):
+            db = Database(os.path.join(work_dir, f"{name}.db"))
+            write_history(db, days[:-1])
+            db.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            db.connection.execute("PRAGMA wal_autocheckpoint=0")
+            wal_before = wal_size(db)
+
+            query_db = db
+            if name == 'per_record':
+                counts = replay_per_record(db, events)
+            elif name == 'batched':
+                counts = replay_batched(db, events)
+            else:
+                clock = FakeClock(day_start)
+                query_db, counts = replay_hot_tier(db, events, os.path.join(work_dir, "hot_tier.log"),
+                                                   clock, args.flush_interval)
+
+            wal_bytes = wal_size(db) - wal_before
+            query = today_queries(query_db, day_start)
+            query()
+            results['designs'][name] = {
+                'commits_per_hour': counts['commits'] / hours,
+                'fsyncs_per_hour': counts['fsyncs'] / hours,
+                'bytes_per_hour': (wal_bytes + counts['log_bytes']) / hours,
+                'wal_bytes_per_hour': wal_bytes / hours,
+                'log_bytes_per_hour': counts['log_bytes'] / hours,
+                'today_query_ms': best_of(query, args.repeat),
+            }
+            query_db.close()
+
+        print(f"今天 {len(events)} 条记录，跨 {hours:.1f} 小时（历史 {args.days - 1} 天）")
+        for name, label in (('per_record', "逐条提交"), ('batched', "每2秒批量提交"), ('hot_tier', "热层")):
+            values = results['designs'][name]
+            print(f"    [{label}] 每小时 {values['commits_per_hour']:.0f} 次提交 / {values['fsyncs_per_hour']:.0f} 次 fsync / "
+                  f"{values['bytes_per_hour'] / 1024:.0f} KB 写入，今天查询 {values['today_query_ms']:.2f} ms")
+
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            print(f"结果已保存到: {args.output}")
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
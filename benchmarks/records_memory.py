@@ -0,0 +1,119 @@
+"""
+记录对象内存基准测试
+写入指定数量的窗口会话后分别用旧的字典方式（sqlite3.Row -> dict）和记录对象（行工厂）读取全部会话，
+对比常驻内存、峰值内存和读取耗时
+
+用法:
+    python benchmarks/records_memory.py --sessions 100000
+"""
+import sys
+import os
+import gc
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+from datetime import timedelta
+from typing import Dict, Any, Callable
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database import Database
+from benchmarks.workload import WorkloadGenerator
+
+
+def populate_sessions(db: Database, sessions: int, seed: int) -> int:
+    """用工作负载生成器写入至少 sessions 个窗口会话"""
+    generator = WorkloadGenerator(seed=seed)
+    written = 0
+    day = 0
+    while written < sessions:
+        day_data = generator.generate_day(generator.start_date + timedelta(days=day))
+        for record in day_data['window_activities'][:sessions - written]:
+            db.insert_window_activity(**record, commit=False)
+            written += 1
+        db.commit()
+        day += 1
+    return written
+
+
+def load_as_dicts(db: Database) -> list:
+    """旧的读取方式：每行先构造 sqlite3.Row 再复制为字典"""
+    cursor = db.connection.cursor()
+    cursor.execute("SELECT * FROM window_activities ORDER BY start_time DESC")
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def load_as_records(db: Database) -> list:
+    """记录对象：行工厂直接构造带 __slots__ 的记录"""
+    return db.get_window_activities()
+
+
+def measure(loader: Callable, db: Database) -> Dict[str, Any]:
+    """测量读取耗时（不开启内存跟踪），以及读取后的常驻内存和峰值内存"""
+    gc.collect()
+    begin = time.perf_counter()
+    rows = loader(db)
+    seconds = time.perf_counter() - begin
+    del rows
+
+    gc.collect()
+    tracemalloc.start()
+    rows = loader(db)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        'rows': len(rows),
+        'seconds': seconds,
+        'retained_mb': retained / 1024 / 1024,
+        'peak_mb': peak / 1024 / 1024,
+        'bytes_per_row': retained / len(rows) if rows else 0,
+    }
+    del rows
+    return result
+
+
+def main():
+    """主函数 - 对比两种读取方式并输出结果"""
+    parser = argparse.ArgumentParser(description="Focus-Insight 记录对象内存基准测试")
+    parser.add_argument('--sessions', type=int, default=100000, help="窗口会话数量")
+    parser.add_argument('--seed', type=int, default=42, help="随机种子")
+    parser.add_argument('--output', default=None, help="结果JSON文件路径")
+    args = parser.parse_args()
+
+    print("=== 记录对象内存基准测试 ===")
+    work_dir = tempfile.mkdtemp(prefix="focus_records_bench_")
+    try:
+        db = Database(os.path.join(work_dir, "bench.db"))
+        written = populate_sessions(db, args.sessions, args.seed)
+        print(f"写入 {written} 个窗口会话")
+
+        results = {
+            'sessions': written,
+            'dict': measure(load_as_dicts, db),
+            'records': measure(load_as_records, db),
+        }
+        db.close()
+
+        for name, label in (('dict', "字典"), ('records', "记录对象")):
+            values = results[name]
+            print(f"[{label}] 常驻 {values['retained_mb']:.1f} MB ({values['bytes_per_row']:.0f} 字节/条), "
+                  f"峰值 {values['peak_mb']:.1f} MB, 读取 {values['seconds'] * 1000:.0f} ms")
+        ratio = results['dict']['retained_mb'] / results['records']['retained_mb']
+        print(f"记录对象的常驻内存是字典的 1/{ratio:.1f}")
+
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            print(f"结果已保存到: {args.output}")
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+轨迹回放基准测试
+回放录制的（或由工作负载生成器合成的）监控轨迹，测量整条监控流程的吞吐和事件处理延迟，
+在Linux上也能用真实用户轨迹复现
+
+用法:
+    python benchmarks/replay.py --trace session.trace
+    python benchmarks/replay.py --days 1 --seed 42 --output replay.json
+"""
+import sys
+import os
+import json
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+from datetime import timedelta
+from typing import Dict, Any
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.storage import DataStorage
+from benchmarks.workload import WorkloadGenerator
+from monitoring.trace import Trace, TraceWriter, TraceReplayer, KIND_KEY, KIND_CLICK
+
+
+def synthesize_trace(path: str, days: int, seed: int, keys_per_second: float = 1.5,
+                     clicks_per_second: float = 0.3) -> Dict[str, int]:
+    """
+    用工作负载生成器的窗口会话合成轨迹：每个会话开始时切换前台窗口，
+    会话期间按泊松过程产生键鼠事件，空闲期没有事件（回放时由空闲检测还原）
+    :return: 会话数和事件数
+    """
+    generator = WorkloadGenerator(seed=seed)
+    rng = random.Random(seed)
+    sessions = 0
+    events = 0
+    writer = None
+    last_end = None
+
+    for day_data in generator.iter_days(days):
+        for session in day_data['window_activities']:
+            if writer is None:
+                writer = TraceWriter(path, session['start_time'])
+            writer.write_foreground(session['start_time'], (session['process_name'], session['window_title'], 0))
+            sessions += 1
+
+            moment = session['start_time']
+            rate = keys_per_second + clicks_per_second
+            while True:
+                moment += timedelta(seconds=rng.expovariate(rate))
+                if moment >= session['end_time']:
+                    break
+                kind = KIND_KEY if rng.random() < keys_per_second / rate else KIND_CLICK
+                writer.write_event(kind, moment)
+                events += 1
+            last_end = session['end_time']
+
+    if writer is not None:
+        writer.close(last_end)
+    return {'sessions': sessions, 'events': events}
+
+
+def main():
+    """主函数 - 准备轨迹并回放"""
+    parser = argparse.ArgumentParser(description="Focus-Insight 轨迹回放基准测试")
+    parser.add_argument('--trace', default=None, help="录制的轨迹文件，默认合成一条")
+    parser.add_argument('--days', type=int, default=1, help="合成轨迹的天数")
+    parser.add_argument('--seed', type=int, default=42, help="合成轨迹的随机种子")
+    parser.add_argument('--speed', type=float, default=0, help="回放倍速，0表示尽可能快")
+    parser.add_argument('--output', default=None, help="结果JSON文件路径")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="focus_replay_bench_")
+    try:
+        results: Dict[str, Any] = {}
+        trace_path = args.trace
+        if trace_path is None:
+            trace_path = os.path.join(work_dir, "synthetic.trace")
+            results['synthetic'] = synthesize_trace(trace_path, args.days, args.seed)
+            print(f"合成轨迹: {results['synthetic']['sessions']} 个会话, {results['synthetic']['events']} 个键鼠事件")
+
+        trace = Trace(trace_path)
+        size = os.path.getsize(trace_path)
+        record_count = len(trace.foreground) + len(trace.inputs) + len(trace.states)
+        results['trace'] = {
+            'bytes': size,
+            'records': record_count,
+            'bytes_per_record': size / record_count if record_count else 0.0,
+            'hours': trace.duration / 3600,
+        }
+        print(f"轨迹 {trace.duration / 3600:.2f} 小时, {size / 1024:.1f} KB, "
+              f"{results['trace']['bytes_per_record']:.1f} 字节/记录")
+
+        storage = DataStorage(os.path.join(work_dir, "data"))
+        replay = asyncio.run(TraceReplayer(trace, storage, speed=args.speed).run())
+        storage.close()
+        results['replay'] = replay
+
+        print(f"回放用时 {replay['elapsed_seconds']:.2f} 秒（{replay['speedup']:.0f} 倍速）, "
+              f"{replay['probes'] / replay['elapsed_seconds']:.0f} 次探测/秒, "
+              f"{replay['input_events'] / replay['elapsed_seconds']:.0f} 个键鼠事件/秒, "
+              f"写入 {replay['records_written']} 条记录")
+        for name, values in replay['event_metrics'].items():
+            print(f"    {name}: 平均延迟 {values['lag_avg_ms']:.2f} ms, 最大延迟 {values['lag_max_ms']:.2f} ms, "
+                  f"丢弃 {values['dropped']}")
+
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            print(f"结果已保存到: {args.output}")
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
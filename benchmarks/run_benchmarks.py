@@ -0,0 +1,169 @@
+"""
+数据层基准测试
+在多个数据规模下测量插入吞吐、查询延迟、数据库大小和查看器渲染时间，
+结果以JSON格式输出，便于在不同版本之间对比
+
+用法:
+    python benchmarks/run_benchmarks.py --days 1 7 30 --output results.json
+"""
+import sys
+import os
+import json
+import time
+import shutil
+import argparse
+import platform
+import sqlite3
+import statistics
+import tempfile
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Callable, Optional
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database import Database
+from benchmarks.workload import WorkloadGenerator
+
+
+def measure_latency(func: Callable, repeat: int = 20) -> Dict[str, float]:
+    """
+    多次调用函数并统计延迟（毫秒）
+    :param func: 无参数的被测函数
+    :param repeat: 重复次数
+    """
+    samples = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - begin) * 1000)
+
+    samples.sort()
+    return {
+        'median_ms': statistics.median(samples),
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'min_ms': samples[0],
+    }
+
+
+def measure_render(window_data: List[Dict[str, Any]]) -> Optional[Dict[str, float]]:
+    """测量时间轴组件的渲染时间，没有图形环境时返回None"""
+    try:
+        import tkinter as tk
+        from gui.timeline_widget import TimelineWidget
+        root = tk.Tk()
+    except Exception as e:
+        print(f"跳过渲染测试: {e}")
+        return None
+
+    try:
+        root.withdraw()
+        widget = TimelineWidget(root, width=900, height=400)
+        return measure_latency(lambda: widget.set_data(window_data), repeat=3)
+    finally:
+        root.destroy()
+
+
+def run_size(days: int, seed: int, repeat: int, render: bool) -> Dict[str, Any]:
+    """
+    在指定数据规模下运行全部测试
+    :param days: 生成数据的天数
+    :param seed: 随机种子
+    :param repeat: 查询重复次数
+    :param render: 是否测量渲染时间
+    """
+    work_dir = tempfile.mkdtemp(prefix="focus_bench_")
+    db_path = os.path.join(work_dir, "bench.db")
+
+    try:
+        db = Database(db_path)
+        generator = WorkloadGenerator(seed=seed)
+
+        # 插入吞吐
+        begin = time.perf_counter()
+        counts = generator.populate(db, days)
+        insert_seconds = time.perf_counter() - begin
+        total_rows = sum(counts.values())
+
+        # 选取数据最多的一天作为查询目标（生成器从周一开始）
+        target_day = generator.start_date + timedelta(days=min(days - 1, 2))
+        day_start = target_day.replace(hour=0, minute=0, second=0, microsecond=0)
+        day_end = day_start.replace(hour=23, minute=59, second=59, microsecond=999999)
+
+        queries = {
+            'get_window_activities': measure_latency(
+                lambda: db.get_window_activities(day_start, day_end), repeat),
+            'get_daily_summary': measure_latency(
+                lambda: db.get_daily_summary(target_day), repeat),
+            'get_app_statistics': measure_latency(
+                lambda: db.get_app_statistics(), repeat),
+            'get_range_report': measure_latency(
+                lambda: db.get_range_report(generator.start_date,
+                                            generator.start_date + timedelta(days=days - 1)), repeat),
+        }
+
+        window_data = db.get_window_activities(day_start, day_end)
+        render_result = measure_render(window_data) if render else None
+
+        db.close()
+        db_size = os.path.getsize(db_path)
+
+        result = {
+            'days': days,
+            'rows': counts,
+            'insert': {
+                'total_rows': total_rows,
+                'seconds': insert_seconds,
+                'rows_per_second': total_rows / insert_seconds if insert_seconds > 0 else 0,
+            },
+            'queries': queries,
+            'db_size_bytes': db_size,
+            'render': render_result,
+            'day_rows': len(window_data),
+        }
+
+        print(f"[{days}天] 插入 {total_rows} 条, {result['insert']['rows_per_second']:.0f} 条/秒, "
+              f"数据库 {db_size / 1024 / 1024:.2f} MB")
+        for name, stats in queries.items():
+            print(f"    {name}: 中位数 {stats['median_ms']:.2f} ms, p95 {stats['p95_ms']:.2f} ms")
+
+        return result
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    """主函数 - 解析参数并运行基准测试"""
+    parser = argparse.ArgumentParser(description="Focus-Insight 数据层基准测试")
+    parser.add_argument('--days', type=int, nargs='+', default=[1, 7, 30],
+                        help="要测试的数据规模（天数）")
+    parser.add_argument('--seed', type=int, default=42, help="随机种子")
+    parser.add_argument('--repeat', type=int, default=20, help="每个查询的重复次数")
+    parser.add_argument('--no-render', action='store_true', help="跳过查看器渲染测试")
+    parser.add_argument('--output', default=None, help="结果JSON文件路径")
+    args = parser.parse_args()
+
+    print("=== Focus-Insight 基准测试 ===")
+
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'seed': args.seed,
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+        },
+        'sizes': [run_size(days, args.seed, args.repeat, not args.no_render) for days in args.days],
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到: {args.output}")
+    else:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+全文搜索基准测试
+生成大量窗口会话和浏览器页面（默认一百万条），对比全文索引和LIKE扫描的搜索延迟
+
+用法:
+    python benchmarks/search.py --rows 1000000
+"""
+import sys
+import os
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from datetime import timedelta
+from typing import Dict, Any
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database import Database
+from benchmarks.workload import WorkloadGenerator, DEFAULT_APPS, BROWSER_NAMES
+from benchmarks.run_benchmarks import measure_latency
+
+
+# 搜索词：常见词、罕见词、多词组合、短词（走LIKE）
+QUERIES = ['report', 'budget_plan', 'release notes', 'zzzmissing', 'main']
+
+
+def populate(db: Database, rows: int, seed: int) -> float:
+    """
+    直接批量写入原始记录（触发器同步全文索引），跳过聚合表以便快速生成大数据量
+    :return: 写入耗时（秒）
+    """
+    generator = WorkloadGenerator(seed=seed)
+    rng = random.Random(seed)
+    cursor = db.connection.cursor()
+
+    begin = time.perf_counter()
+    current = generator.start_date
+    batch_windows = []
+    batch_browsers = []
+    for i in range(rows):
+        app = rng.choice(DEFAULT_APPS)
+        title = generator._new_title(app)
+        duration = rng.expovariate(1.0 / 60) + 1
+        end = current + timedelta(seconds=duration)
+
+        browser = BROWSER_NAMES.get(app)
+        if browser:
+            batch_browsers.append((browser, title.rsplit(' - ', 1)[0],
+                                   f"https://example.com/{title.split('_')[0]}", current, end, duration))
+        else:
+            batch_windows.append((app, title, current, end, duration))
+        current = end
+
+        if len(batch_windows) + len(batch_browsers) >= 10000 or i == rows - 1:
+            cursor.executemany('''
+                INSERT INTO window_activities (process_name, window_title, start_time, end_time, duration)
+                VALUES (?, ?, ?, ?, ?)
+            ''', batch_windows)
+            cursor.executemany('''
+                INSERT INTO browser_activities (browser_name, page_title, page_url, start_time, end_time, duration)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', batch_browsers)
+            db.commit()
+            batch_windows = []
+            batch_browsers = []
+
+    return time.perf_counter() - begin
+
+
+def main():
+    """主函数 - 生成数据并对比两种搜索方式"""
+    parser = argparse.ArgumentParser(description="Focus-Insight 全文搜索基准测试")
+    parser.add_argument('--rows', type=int, default=1000000, help="生成的记录数")
+    parser.add_argument('--seed', type=int, default=42, help="随机种子")
+    parser.add_argument('--repeat', type=int, default=5, help="每个查询的重复次数")
+    parser.add_argument('--output', default=None, help="结果JSON文件路径")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="focus_search_bench_")
+    try:
+        db = Database(os.path.join(work_dir, "bench.db"))
+        if not db.search_enabled:
+            print("SQLite不支持FTS5，无法对比")
+            return
+
+        print(f"=== 全文搜索基准测试（{args.rows} 条记录）===")
+        insert_seconds = populate(db, args.rows, args.seed)
+        print(f"写入用时 {insert_seconds:.1f} 秒（含全文索引同步）")
+
+        results: Dict[str, Any] = {'rows': args.rows, 'insert_seconds': insert_seconds, 'queries': {}}
+        for query in QUERIES:
+            fts = measure_latency(lambda: db.search_activities(query), args.repeat)
+            like = measure_latency(lambda: db.search_activities(query, use_index=False), args.repeat)
+            hits = len(db.search_activities(query))
+            results['queries'][query] = {'fts': fts, 'like': like, 'hits': hits}
+            print(f"    {query!r}: 全文索引 {fts['median_ms']:.1f} ms, LIKE {like['median_ms']:.1f} ms, "
+                  f"{hits} 条结果")
+
+        db.close()
+        results['db_size_bytes'] = os.path.getsize(os.path.join(work_dir, "bench.db"))
+
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            print(f"结果已保存到: {args.output}")
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
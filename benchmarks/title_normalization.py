@@ -0,0 +1,143 @@
+"""
+窗口标题规范化基准测试
+给合成标题加上真实窗口中常见的易变片段（未保存标记、未读计数、时间、文件路径），
+分别在不规范化和规范化两种模式下写入，对比应用统计的行数（基数）和插入开销
+
+用法:
+    python benchmarks/title_normalization.py --days 7
+"""
+import sys
+import os
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from typing import Dict, Any
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database import Database
+from data.title_normalizer import TitleNormalizer
+from benchmarks.workload import WorkloadGenerator
+
+
+def decorate_title(title: str, start_time, rng: random.Random) -> str:
+    """随机加上易变片段，模拟同一文档/页面在不同时刻的标题"""
+    roll = rng.random()
+    if roll < 0.2:
+        return f"● {title}"
+    if roll < 0.35:
+        return f"({rng.randint(1, 30)}) {title}"
+    if roll < 0.5:
+        return f"{title} {start_time:%H:%M:%S}"
+    if roll < 0.6:
+        return f"C:\\Users\\me\\Projects\\p{rng.randint(1, 50)}\\{title}"
+    return title
+
+
+def run_mode(days: int, seed: int, normalize: bool) -> Dict[str, Any]:
+    """
+    写入带易变片段的工作负载并统计结果
+    :param normalize: 是否启用标题规范化
+    """
+    work_dir = tempfile.mkdtemp(prefix="focus_title_bench_")
+    normalizer = TitleNormalizer() if normalize else None
+
+    try:
+        db = Database(os.path.join(work_dir, "bench.db"), title_normalizer=normalizer)
+        generator = WorkloadGenerator(seed=seed)
+        rng = random.Random(seed)
+
+        records = []
+        for day_data in generator.iter_days(days):
+            for record in day_data['window_activities']:
+                record['window_title'] = decorate_title(record['window_title'], record['start_time'], rng)
+                records.append(record)
+
+        begin = time.perf_counter()
+        for record in records:
+            db.insert_window_activity(**record, commit=False)
+        db.commit()
+        seconds = time.perf_counter() - begin
+
+        cursor = db.connection.cursor()
+        cursor.execute("SELECT COUNT(*) AS count FROM app_statistics")
+        app_statistics_rows = cursor.fetchone()['count']
+        cursor.execute("SELECT COUNT(DISTINCT window_title) AS count FROM window_activities")
+        distinct_raw_titles = cursor.fetchone()['count']
+        db.close()
+
+        result = {
+            'normalize': normalize,
+            'sessions': len(records),
+            'distinct_raw_titles': distinct_raw_titles,
+            'app_statistics_rows': app_statistics_rows,
+            'insert_seconds': seconds,
+            'us_per_insert': seconds / len(records) * 1e6 if records else 0,
+        }
+        if normalizer is not None:
+            info = normalizer.cache_info()
+            result['cache_hits'] = info.hits
+            result['cache_misses'] = info.misses
+        return result
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def measure_normalize_cost(seed: int, count: int = 20000) -> Dict[str, float]:
+    """单独测量规范化本身的开销：缓存未命中（正则流水线）与缓存命中"""
+    rng = random.Random(seed)
+    generator = WorkloadGenerator(seed=seed)
+    titles = [decorate_title(generator._new_title('code.exe'), generator.start_date, rng)
+              for _ in range(count)]
+
+    normalizer = TitleNormalizer(cache_size=count)
+    begin = time.perf_counter()
+    for title in titles:
+        normalizer.normalize(title)
+    cold = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    for title in titles:
+        normalizer.normalize(title)
+    warm = time.perf_counter() - begin
+
+    return {'us_per_title_uncached': cold / count * 1e6, 'us_per_title_cached': warm / count * 1e6}
+
+
+def main():
+    """主函数 - 对比两种模式并输出结果"""
+    parser = argparse.ArgumentParser(description="Focus-Insight 标题规范化基准测试")
+    parser.add_argument('--days', type=int, default=7, help="生成数据的天数")
+    parser.add_argument('--seed', type=int, default=42, help="随机种子")
+    parser.add_argument('--output', default=None, help="结果JSON文件路径")
+    args = parser.parse_args()
+
+    print("=== 标题规范化基准测试 ===")
+    results = {
+        'days': args.days,
+        'seed': args.seed,
+        'modes': [run_mode(args.days, args.seed, normalize) for normalize in (False, True)],
+        'normalize_cost': measure_normalize_cost(args.seed),
+    }
+
+    for mode in results['modes']:
+        label = "规范化" if mode['normalize'] else "原始标题"
+        print(f"[{label}] {mode['sessions']} 个会话, 应用统计 {mode['app_statistics_rows']} 行, "
+              f"插入 {mode['us_per_insert']:.1f} us/条")
+    cost = results['normalize_cost']
+    print(f"规范化开销: 未命中 {cost['us_per_title_uncached']:.2f} us, "
+          f"命中 {cost['us_per_title_cached']:.2f} us")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
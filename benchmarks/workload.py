@@ -0,0 +1,205 @@
+"""
+合成工作负载生成器
+按固定随机种子生成逼真的多日活动数据：窗口会话、浏览器页面、每分钟输入计数和空闲状态变化
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Iterator, Optional
+
+
+# 候选应用列表，按常见程度排序（Zipf分布下排名越靠前越常用）
+DEFAULT_APPS = [
+    'code.exe', 'chrome.exe', 'explorer.exe', 'WeChat.exe', 'msedge.exe',
+    'python.exe', 'cmd.exe', 'firefox.exe', 'zed.exe', 'WINWORD.EXE',
+    'EXCEL.EXE', 'Teams.exe', 'Spotify.exe', 'notepad.exe', 'Postman.exe',
+    'idea64.exe', 'OUTLOOK.EXE', 'POWERPNT.EXE', 'Obsidian.exe', 'steam.exe',
+]
+
+BROWSER_NAMES = {
+    'chrome.exe': 'Chrome',
+    'msedge.exe': 'Edge',
+    'firefox.exe': 'Firefox',
+}
+
+TITLE_WORDS = [
+    'main', 'report', 'design', 'inbox', 'notes', 'review', 'budget', 'plan',
+    'issue', 'draft', 'meeting', 'search', 'docs', 'release', 'config', 'data',
+]
+
+
+class WorkloadGenerator:
+    def __init__(self, seed: int = 42, app_count: int = 20, zipf_s: float = 1.2,
+                 start_date: Optional[datetime] = None):
+        """
+        初始化工作负载生成器
+        :param seed: 随机种子，相同种子生成完全相同的数据
+        :param app_count: 参与生成的应用数量
+        :param zipf_s: Zipf分布指数，越大越集中在少数应用上
+        :param start_date: 第一天的日期，默认2025-01-06（周一）
+        """
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.start_date = start_date or datetime(2025, 1, 6)
+
+        self.apps = [DEFAULT_APPS[i % len(DEFAULT_APPS)] if i < len(DEFAULT_APPS)
+                     else f"app{i}.exe" for i in range(app_count)]
+        weights = [1.0 / (rank ** zipf_s) for rank in range(1, app_count + 1)]
+        total = sum(weights)
+        self.app_weights = [w / total for w in weights]
+
+        # 每个应用维护一个标题池，突发阶段会不断产生新标题
+        self.title_pools = {app: [self._new_title(app) for _ in range(3)] for app in self.apps}
+
+    def _new_title(self, app: str) -> str:
+        """生成一个新的窗口标题"""
+        words = self.rng.sample(TITLE_WORDS, 2)
+        title = f"{words[0]}_{words[1]}_{self.rng.randint(1, 999)}"
+        browser = BROWSER_NAMES.get(app)
+        if browser == 'Chrome':
+            return f"{title} - Google Chrome"
+        if browser == 'Edge':
+            return f"{title} - Microsoft Edge"
+        if browser == 'Firefox':
+            return f"{title} - Mozilla Firefox"
+        return f"{title} - {app.rsplit('.', 1)[0]}"
+
+    def _pick_title(self, app: str, bursty: bool) -> str:
+        """选择窗口标题，突发阶段更容易产生新标题"""
+        pool = self.title_pools[app]
+        if self.rng.random() < (0.6 if bursty else 0.05):
+            pool.append(self._new_title(app))
+            if len(pool) > 50:
+                pool.pop(0)
+            return pool[-1]
+        # 偏向最近使用的标题
+        index = min(int(self.rng.expovariate(0.5)), len(pool) - 1)
+        return pool[-1 - index]
+
+    def generate_day(self, day: datetime) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        生成一天的活动数据
+        :param day: 日期
+        :return: 包含四类记录列表的字典
+        """
+        windows = []
+        browsers = []
+        inputs = []
+        states = []
+
+        day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
+        is_weekend = day_start.weekday() >= 5
+
+        # 工作时段：周末更短更随机
+        if is_weekend:
+            begin = day_start + timedelta(hours=self.rng.uniform(9, 12))
+            end = begin + timedelta(hours=self.rng.uniform(2, 6))
+        else:
+            begin = day_start + timedelta(hours=self.rng.uniform(8, 9.5))
+            end = day_start + timedelta(hours=self.rng.uniform(17.5, 23.5))
+
+        current = begin
+        bursty = False
+        while current < end:
+            # 在突发（频繁切换）和专注两种状态之间切换
+            if self.rng.random() < 0.05:
+                bursty = not bursty
+
+            # 偶尔进入空闲期（离开座位、开会等）
+            if self.rng.random() < 0.02:
+                idle_seconds = self.rng.uniform(300, 3600)
+                threshold = 300.0
+                states.append({'state_type': 'idle',
+                               'timestamp': current + timedelta(seconds=threshold),
+                               'idle_duration': threshold})
+                current += timedelta(seconds=idle_seconds)
+                states.append({'state_type': 'active', 'timestamp': current, 'idle_duration': None})
+                continue
+
+            app = self.rng.choices(self.apps, weights=self.app_weights)[0]
+            title = self._pick_title(app, bursty)
+            mean = 15.0 if bursty else 120.0
+            duration = min(self.rng.expovariate(1.0 / mean) + 1.0, 3600.0)
+            session_end = current + timedelta(seconds=duration)
+
+            windows.append({
+                'process_name': app,
+                'window_title': title,
+                'start_time': current,
+                'end_time': session_end,
+                'duration': duration,
+            })
+
+            browser = BROWSER_NAMES.get(app)
+            if browser:
+                browsers.append({
+                    'browser_name': browser,
+                    'page_title': title.rsplit(' - ', 1)[0],
+                    'page_url': f"https://example.com/{title.split('_')[0]}",
+                    'start_time': current,
+                    'end_time': session_end,
+                    'duration': duration,
+                })
+
+            current = session_end
+
+        # 每分钟输入计数，按小时打包（与监控程序的写入方式一致）
+        minute = begin.replace(second=0, microsecond=0)
+        hours = {}
+        while minute < end:
+            hour_start = minute.replace(minute=0)
+            if hour_start not in hours:
+                hours[hour_start] = ([0] * 60, [0] * 60)
+            keyboard_counts, mouse_counts = hours[hour_start]
+            keyboard_counts[minute.minute] = min(int(self.rng.gammavariate(2.0, 40.0)), 65535)
+            mouse_counts[minute.minute] = min(int(self.rng.gammavariate(2.0, 8.0)), 65535)
+            minute += timedelta(minutes=1)
+
+        for hour_start, (keyboard_counts, mouse_counts) in hours.items():
+            inputs.append({'hour_start': hour_start, 'activity_type': 'keyboard', 'counts': keyboard_counts})
+            inputs.append({'hour_start': hour_start, 'activity_type': 'mouse', 'counts': mouse_counts})
+
+        return {
+            'window_activities': windows,
+            'browser_activities': browsers,
+            'input_minutes': inputs,
+            'state_changes': states,
+        }
+
+    def iter_days(self, days: int) -> Iterator[Dict[str, List[Dict[str, Any]]]]:
+        """按天依次生成数据"""
+        for offset in range(days):
+            yield self.generate_day(self.start_date + timedelta(days=offset))
+
+    def populate(self, db, days: int) -> Dict[str, int]:
+        """
+        通过Database的插入接口写入数据
+        :param db: Database实例
+        :param days: 生成的天数
+        :return: 每类记录的插入条数
+        """
+        counts = {'window_activities': 0, 'browser_activities': 0,
+                  'input_minutes': 0, 'state_changes': 0}
+
+        for day_data in self.iter_days(days):
+            for record in day_data['window_activities']:
+                db.insert_window_activity(**record)
+            for record in day_data['browser_activities']:
+                db.insert_browser_activity(**record)
+            for record in day_data['input_minutes']:
+                db.upsert_input_minutes(**record)
+            for record in day_data['state_changes']:
+                db.insert_state_change(**record)
+
+            for key in counts:
+                counts[key] += len(day_data[key])
+
+        return counts
+
+
+# 测试代码
+if __name__ == "__main__":
+    generator = WorkloadGenerator(seed=1)
+    sample = generator.generate_day(generator.start_date)
+    for key, records in sample.items():
+        print(f"{key}: {len(records)} 条")
+    print(f"示例窗口记录: {sample['window_activities'][0]}")
@@ -4,22 +4,57 @@
 """
 import sqlite3
 import os
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+import struct
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+
+from .intervals import (to_datetime, build_idle_intervals, sweep_active_segments,
+                        find_focus_streaks, clip_interval)
+from .records import RecordFactory, WindowActivity, BrowserActivity
+
+
+# 每小时一行的分钟计数：60个小端uint16
+MINUTE_COUNTS_FORMAT = struct.Struct('<60H')
+
+# 只读打开时要求已经存在的表和后来增加的列（由监控程序建表和升级）
+SCHEMA_TABLES = ('window_activities', 'browser_activities', 'input_activities', 'input_minutes',
+                 'state_changes', 'app_statistics', 'hourly_buckets', 'active_segments',
+                 'idle_periods', 'derived_watermarks', 'summary_cache')
+UPGRADED_COLUMNS = ('normalized_title', 'keystrokes', 'clicks')
 
 
 class Database:
-    def __init__(self, db_path: str = "focus_insight.db"):
+    def __init__(self, db_path: str = "focus_insight.db", title_normalizer=None,
+                 keep_raw_title: bool = True, read_only: bool = False):
         """
         初始化数据库
         :param db_path: 数据库文件路径
+        :param title_normalizer: 窗口标题规范化器（TitleNormalizer），为None时不做规范化
+        :param keep_raw_title: 是否在 window_title 中保留原始标题，否则只保存规范化后的标题
+        :param read_only: 以只读方式打开（查看器、报告），不建表、不升级、不回填
         """
         self.db_path = db_path
+        self.title_normalizer = title_normalizer
+        self.keep_raw_title = keep_raw_title
+        self.read_only = read_only
         self.connection = None
+
+        # 行工厂：会话直接构造为记录对象；裁剪查询的 clip_* 列覆盖原始的起止时间和时长
+        # 进程名、标题在一天内大量重复，同一次查询中共用字符串对象
+        window_shared = ('process_name', 'window_title', 'normalized_title', 'created_at')
+        self.window_factory = RecordFactory(WindowActivity, shared=window_shared)
+        self.clipped_window_factory = RecordFactory(WindowActivity, {
+            'clip_start': 'start_time', 'clip_end': 'end_time', 'clip_duration': 'duration'}, shared=window_shared)
+        self.browser_factory = RecordFactory(BrowserActivity, shared=('browser_name', 'page_title', 'page_url'))
+
         self.init_database()
 
     def init_database(self):
         """初始化数据库表结构"""
+        if self.read_only and self._open_read_only():
+            return
+
         # 确保数据目录存在
         os.makedirs(os.path.dirname(self.db_path) if os.path.dirname(self.db_path) else '.', exist_ok=True)
 
@@ -27,9 +62,50 @@ class Database:
         self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
         self.connection.row_factory = sqlite3.Row  # 使结果可以按列名访问
 
+        # 增量回收空闲页（只对新建的数据库文件生效，旧数据库由维护任务在空闲时转换）
+        self.connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+
+        # WAL模式：监控程序写入时查看器仍可读取，互不阻塞
+        self.connection.execute("PRAGMA journal_mode=WAL")
+
         # 创建表
         self.create_tables()
 
+        # 全文索引（SQLite未编译FTS5时退回LIKE扫描）
+        self.search_enabled = self.create_search_index()
+
+        # 旧数据库首次升级时，根据已有记录补齐小时聚合表
+        if self._needs_bucket_backfill():
+            self.rebuild_hourly_buckets()
+
+    def _open_read_only(self) -> bool:
+        """
+        以 mode=ro 打开已有的数据库，不执行任何写操作
+        :return: 是否成功；文件还不存在或表结构尚未由监控程序升级时返回False，
+                 此时按读写方式初始化（只有第一次使用时会发生）
+        """
+        if not os.path.exists(self.db_path):
+            return False
+
+        uri = Path(self.db_path).absolute().as_uri() + "?mode=ro"
+        self.connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        tables = {row['name'] for row in cursor.fetchall()}
+        cursor.execute("PRAGMA table_info(window_activities)")
+        columns = {row['name'] for row in cursor.fetchall()}
+        if (not set(SCHEMA_TABLES) <= tables or not set(UPGRADED_COLUMNS) <= columns
+                or self._needs_bucket_backfill()):
+            print(f"数据库 {self.db_path} 尚未创建或升级，以读写方式打开")
+            self.connection.close()
+            self.connection = None
+            return False
+
+        self.search_enabled = 'activity_search' in tables
+        return True
+
     def create_tables(self):
         """创建所有必要的表"""
         cursor = self.connection.cursor()
@@ -43,9 +119,15 @@ class Database:
                 start_time TIMESTAMP NOT NULL,
                 end_time TIMESTAMP NOT NULL,
                 duration REAL NOT NULL,
+                normalized_title TEXT,
+                keystrokes INTEGER NOT NULL DEFAULT 0,
+                clicks INTEGER NOT NULL DEFAULT 0,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+        self._ensure_column('window_activities', 'normalized_title', 'TEXT')
+        self._ensure_column('window_activities', 'keystrokes', 'INTEGER NOT NULL DEFAULT 0')
+        self._ensure_column('window_activities', 'clicks', 'INTEGER NOT NULL DEFAULT 0')
 
         # 浏览器活动记录表
         cursor.execute('''
@@ -74,6 +156,16 @@ class Database:
             )
         ''')
 
+        # 每分钟输入计数表：每小时每种设备一行，counts为60个uint16打包的二进制
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS input_minutes (
+                hour_start TIMESTAMP NOT NULL,
+                activity_type TEXT NOT NULL,  -- 'keyboard' 或 'mouse'
+                counts BLOB NOT NULL,
+                PRIMARY KEY (hour_start, activity_type)
+            )
+        ''')
+
         # 状态变化记录表（空闲/活跃切换）
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS state_changes (
@@ -100,26 +192,228 @@ class Database:
             )
         ''')
 
+        # 小时聚合表（小时 × 应用 → 时长、按键数、点击数），在写入时增量更新
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS hourly_buckets (
+                bucket_start TIMESTAMP NOT NULL,
+                process_name TEXT NOT NULL,
+                seconds REAL NOT NULL DEFAULT 0,
+                keystrokes INTEGER NOT NULL DEFAULT 0,
+                clicks INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (bucket_start, process_name)
+            )
+        ''')
+
+        # 派生表：扣除空闲后的真实活跃片段，按天存放
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS active_segments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                day DATE NOT NULL,
+                window_id INTEGER,
+                process_name TEXT NOT NULL,
+                start_time TIMESTAMP NOT NULL,
+                end_time TIMESTAMP NOT NULL,
+                duration REAL NOT NULL
+            )
+        ''')
+
+        # 派生表：空闲区间，按天存放
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS idle_periods (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                day DATE NOT NULL,
+                start_time TIMESTAMP NOT NULL,
+                end_time TIMESTAMP NOT NULL,
+                duration REAL NOT NULL
+            )
+        ''')
+
+        # 派生数据的处理进度（每个源表已处理到的最大id）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS derived_watermarks (
+                name TEXT PRIMARY KEY,
+                last_id INTEGER NOT NULL
+            )
+        ''')
+
+        # 每日摘要缓存（由 DataStorage 读写），summary 为JSON
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS summary_cache (
+                day DATE PRIMARY KEY,
+                summary TEXT NOT NULL,
+                watermark TEXT NOT NULL,
+                computed_at TIMESTAMP NOT NULL
+            )
+        ''')
+
+        # 迟到的写入（跨零点的会话、崩溃后恢复的会话、结束前一天空闲的状态变化）
+        # 会改变已经结束的日期，由触发器删除受影响日期的缓存
+        cursor.executescript('''
+            CREATE TRIGGER IF NOT EXISTS window_activities_summary_invalidate
+            AFTER INSERT ON window_activities
+            WHEN date(new.start_time) < date('now', 'localtime')
+            BEGIN
+                DELETE FROM summary_cache WHERE day >= date(new.start_time);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS state_changes_summary_invalidate
+            AFTER INSERT ON state_changes
+            BEGIN
+                DELETE FROM summary_cache WHERE day >= MIN(
+                    date(new.timestamp, '-' || COALESCE(new.idle_duration, 0) || ' seconds'),
+                    COALESCE((SELECT date(timestamp) FROM state_changes WHERE id < new.id
+                              ORDER BY id DESC LIMIT 1), date(new.timestamp))
+                );
+            END;
+        ''')
+
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_active_segments_day
+            ON active_segments (day, start_time)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_idle_periods_day
+            ON idle_periods (day)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_state_changes_time
+            ON state_changes (timestamp)
+        ''')
+
+        # 区间查询索引：(start_time, end_time) 支持重叠判断，duration 用于推出起点下界
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_window_activities_time
+            ON window_activities (start_time, end_time)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_window_activities_duration
+            ON window_activities (duration)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_window_activities_process
+            ON window_activities (process_name, start_time)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_browser_activities_time
+            ON browser_activities (start_time, end_time)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_browser_activities_duration
+            ON browser_activities (duration)
+        ''')
+
         # 提交更改
         self.connection.commit()
 
+    def _ensure_column(self, table: str, column: str, definition: str):
+        """旧数据库升级：列不存在时追加"""
+        cursor = self.connection.cursor()
+        cursor.execute(f"PRAGMA table_info({table})")
+        if column not in [row['name'] for row in cursor.fetchall()]:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def normalize_title(self, window_title: str) -> str:
+        """获取用于聚合的规范化标题"""
+        if self.title_normalizer is None:
+            return window_title
+        return self.title_normalizer.normalize(window_title)
+
+    def create_search_index(self) -> bool:
+        """
+        创建窗口标题和浏览器页面的全文索引，由触发器与原表保持同步
+        rowid 编码来源：窗口记录为 id*2，浏览器记录为 id*2+1
+        :return: 全文索引是否可用
+        """
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'activity_search'")
+        if cursor.fetchone():
+            return True
+
+        # trigram分词支持任意子串匹配（包括中文），旧版本SQLite退回unicode61
+        for tokenizer in ("trigram", "unicode61"):
+            try:
+                cursor.execute(f'''
+                    CREATE VIRTUAL TABLE activity_search
+                    USING fts5(title, url, tokenize='{tokenizer}')
+                ''')
+                break
+            except sqlite3.OperationalError:
+                continue
+        else:
+            print("SQLite不支持FTS5，搜索将使用LIKE扫描")
+            return False
+
+        cursor.executescript('''
+            CREATE TRIGGER IF NOT EXISTS window_activities_search_insert
+            AFTER INSERT ON window_activities BEGIN
+                INSERT INTO activity_search (rowid, title, url) VALUES (new.id * 2, new.window_title, '');
+            END;
+            CREATE TRIGGER IF NOT EXISTS window_activities_search_delete
+            AFTER DELETE ON window_activities BEGIN
+                DELETE FROM activity_search WHERE rowid = old.id * 2;
+            END;
+            CREATE TRIGGER IF NOT EXISTS window_activities_search_update
+            AFTER UPDATE OF window_title ON window_activities BEGIN
+                UPDATE activity_search SET title = new.window_title WHERE rowid = new.id * 2;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS browser_activities_search_insert
+            AFTER INSERT ON browser_activities BEGIN
+                INSERT INTO activity_search (rowid, title, url)
+                VALUES (new.id * 2 + 1, new.page_title, COALESCE(new.page_url, ''));
+            END;
+            CREATE TRIGGER IF NOT EXISTS browser_activities_search_delete
+            AFTER DELETE ON browser_activities BEGIN
+                DELETE FROM activity_search WHERE rowid = old.id * 2 + 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS browser_activities_search_update
+            AFTER UPDATE OF page_title, page_url ON browser_activities BEGIN
+                UPDATE activity_search SET title = new.page_title, url = COALESCE(new.page_url, '')
+                WHERE rowid = new.id * 2 + 1;
+            END;
+        ''')
+
+        # 旧数据库首次升级时，为已有记录建立索引
+        cursor.execute('''
+            INSERT INTO activity_search (rowid, title, url)
+            SELECT id * 2, window_title, '' FROM window_activities
+        ''')
+        cursor.execute('''
+            INSERT INTO activity_search (rowid, title, url)
+            SELECT id * 2 + 1, page_title, COALESCE(page_url, '') FROM browser_activities
+        ''')
+        self.connection.commit()
+        return True
+
     def insert_window_activity(self, process_name: str, window_title: str,
-                              start_time: datetime, end_time: datetime, duration: float):
-        """插入窗口活动记录"""
+                              start_time: datetime, end_time: datetime, duration: float,
+                              keystrokes: int = 0, clicks: int = 0, commit: bool = True):
+        """
+        插入窗口活动记录
+        :param keystrokes: 会话期间的按键次数
+        :param clicks: 会话期间的鼠标点击次数
+        :param commit: 是否立即提交，批量写入时由调用方统一提交
+        """
+        normalized_title = self.normalize_title(window_title)
+        stored_title = window_title if self.keep_raw_title else normalized_title
+
         cursor = self.connection.cursor()
         cursor.execute('''
             INSERT INTO window_activities
-            (process_name, window_title, start_time, end_time, duration)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (process_name, window_title, start_time, end_time, duration))
-        self.connection.commit()
+            (process_name, window_title, start_time, end_time, duration, normalized_title, keystrokes, clicks)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (process_name, stored_title, start_time, end_time, duration, normalized_title, keystrokes, clicks))
+        self._add_to_hourly_buckets(process_name, start_time, end_time, keystrokes, clicks)
+
+        # 更新应用统计（按规范化标题聚合）
+        self._update_app_statistics(process_name, normalized_title, duration, end_time, commit=False)
 
-        # 更新应用统计
-        self._update_app_statistics(process_name, window_title, duration, end_time)
+        if commit:
+            self.connection.commit()
 
     def insert_browser_activity(self, browser_name: str, page_title: str, page_url: str,
                                start_time: datetime, end_time: Optional[datetime] = None,
-                               duration: Optional[float] = None):
+                               duration: Optional[float] = None, commit: bool = True):
         """插入浏览器活动记录"""
         cursor = self.connection.cursor()
         cursor.execute('''
@@ -127,7 +421,8 @@ class Database:
             (browser_name, page_title, page_url, start_time, end_time, duration)
             VALUES (?, ?, ?, ?, ?, ?)
         ''', (browser_name, page_title, page_url, start_time, end_time, duration))
-        self.connection.commit()
+        if commit:
+            self.connection.commit()
 
     def insert_input_activity(self, activity_type: str, event_count: int, frequency: float,
                              window_start: datetime, window_end: datetime):
@@ -140,7 +435,170 @@ class Database:
         ''', (activity_type, event_count, frequency, window_start, window_end))
         self.connection.commit()
 
-    def insert_state_change(self, state_type: str, timestamp: datetime, idle_duration: Optional[float] = None):
+    def upsert_input_minutes(self, hour_start: datetime, activity_type: str, counts,
+                             commit: bool = True):
+        """
+        写入一小时的分钟计数，与已有数据逐分钟相加（同一小时可能分多次写入）
+        :param counts: 长度为60的整数序列
+        """
+        cursor = self.connection.cursor()
+        cursor.execute('''
+            SELECT counts FROM input_minutes WHERE hour_start = ? AND activity_type = ?
+        ''', (hour_start, activity_type))
+        row = cursor.fetchone()
+
+        merged = list(counts)
+        if row is not None:
+            existing = MINUTE_COUNTS_FORMAT.unpack(row['counts'])
+            merged = [min(a + b, 65535) for a, b in zip(existing, merged)]
+
+        cursor.execute('''
+            INSERT OR REPLACE INTO input_minutes (hour_start, activity_type, counts)
+            VALUES (?, ?, ?)
+        ''', (hour_start, activity_type, MINUTE_COUNTS_FORMAT.pack(*merged)))
+        if commit:
+            self.connection.commit()
+
+    def get_input_minutes(self, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
+        """
+        获取时间范围内的每分钟输入计数
+        :return: {'times': datetime64[m]数组, 'keyboard': int数组, 'mouse': int数组}，缺失的分钟为0
+        """
+        import numpy as np
+
+        first_hour = start_date.replace(minute=0, second=0, microsecond=0)
+        last_hour = end_date.replace(minute=0, second=0, microsecond=0)
+        hour_count = int((last_hour - first_hour).total_seconds() // 3600) + 1
+
+        series = {
+            'times': np.datetime64(first_hour, 'm') + np.arange(hour_count * 60),
+            'keyboard': np.zeros(hour_count * 60, dtype=np.int64),
+            'mouse': np.zeros(hour_count * 60, dtype=np.int64),
+        }
+
+        cursor = self.connection.cursor()
+        cursor.execute('''
+            SELECT hour_start, activity_type, counts FROM input_minutes
+            WHERE hour_start >= ? AND hour_start <= ?
+        ''', (first_hour, last_hour))
+        for row in cursor.fetchall():
+            if row['activity_type'] not in series:
+                continue
+            offset = int((to_datetime(row['hour_start']) - first_hour).total_seconds() // 60)
+            series[row['activity_type']][offset:offset + 60] = np.frombuffer(row['counts'], dtype='<u2')
+
+        # 裁剪到请求的分钟范围
+        begin = int((start_date - first_hour).total_seconds() // 60)
+        end = int((end_date - first_hour).total_seconds() // 60) + 1
+        return {key: values[begin:end] for key, values in series.items()}
+
+    # 列的声明类型到数组类型：时间列为 int64 纪元微秒，文本列为分类编码
+    COLUMN_KINDS = {'TIMESTAMP': 'time', 'DATE': 'time', 'INTEGER': 'int', 'REAL': 'float', 'TEXT': 'text'}
+
+    def read_columns(self, table: str, start_date: Optional[datetime] = None,
+                     end_date: Optional[datetime] = None, columns: Optional[List[str]] = None,
+                     time_column: str = 'start_time', clip: bool = False,
+                     chunk_size: int = 8192) -> Dict[str, Any]:
+        """
+        按列批量读取（分析、绘图和导出使用），不为每行构造对象
+        :param table: 表名
+        :param start_date: 起始时间（包含），为None时不限制
+        :param end_date: 结束时间（包含），为None时不限制
+        :param columns: 读取的列，默认为全部列
+        :param time_column: 按时间筛选的列；为 start_time 时按区间重叠筛选（与 get_window_activities 相同），
+                            其它列按 [start_date, end_date] 筛选
+        :param clip: 是否把 start_time/end_time/duration 裁剪到查询范围内
+        :param chunk_size: 每次 fetchmany 读取的行数
+        :return: {列名: 数组, ..., 'dictionaries': {文本列名: [字符串, ...]}, 'time_columns': [时间列名, ...]}，
+                 按 time_column 升序；时间列为 int64 纪元微秒（NULL 为 int64 最小值，.view('datetime64[us]') 后即为 NaT），
+                 整数列为 int64（NULL 为0），实数列为 float64（NULL 为 NaN），
+                 文本列为 int32 编码，对应的字符串在 dictionaries 中
+        """
+        import numpy as np
+
+        cursor = self.connection.cursor()
+        cursor.execute(f"PRAGMA table_info({table})")
+        declared = {row['name']: row['type'].upper() for row in cursor.fetchall()}
+        if not declared:
+            raise ValueError(f"表不存在: {table}")
+        columns = list(columns or declared)
+        for name in columns + [time_column]:
+            if name not in declared:
+                raise ValueError(f"{table} 没有列: {name}")
+            if declared[name] not in self.COLUMN_KINDS:
+                raise ValueError(f"不支持按列读取 {declared[name]} 类型的列: {name}")
+        kinds = [self.COLUMN_KINDS[declared[name]] for name in columns]
+
+        expressions = []
+        params = []
+        for name, kind in zip(columns, kinds):
+            expression = name
+            if clip and name in ('start_time', 'end_time', 'duration'):
+                start_expr = "MAX(start_time, ?)" if start_date else "start_time"
+                end_expr = "MIN(end_time, ?)" if end_date else "end_time"
+                start_params = [start_date] if start_date else []
+                end_params = [end_date] if end_date else []
+                if name == 'start_time':
+                    expression = start_expr
+                    params += start_params
+                elif name == 'end_time':
+                    expression = end_expr
+                    params += end_params
+                else:
+                    expression = f"MAX(ROUND((julianday({end_expr}) - julianday({start_expr})) * 86400.0, 3), 0.0)"
+                    params += end_params + start_params
+            if kind == 'int':
+                expression = f"COALESCE({expression}, 0)"
+            expressions.append(expression)
+
+        if time_column == 'start_time':
+            where, where_params = self._overlap_filter(table, start_date, end_date)
+        else:
+            where, where_params = "", []
+            if start_date:
+                where += f" AND {time_column} >= ?"
+                where_params.append(start_date)
+            if end_date:
+                where += f" AND {time_column} <= ?"
+                where_params.append(end_date)
+
+        cursor.execute(f"SELECT COUNT(*) AS count FROM {table} WHERE 1=1{where}", where_params)
+        count = cursor.fetchone()['count']
+
+        # 按行数预先分配数组，分块读取后整列写入
+        dtypes = {'time': np.int64, 'int': np.int64, 'float': np.float64, 'text': np.int32}
+        buffers = [np.empty(count, dtype=dtypes[kind]) for kind in kinds]
+        lookups = {name: {} for name, kind in zip(columns, kinds) if kind == 'text'}
+
+        cursor.row_factory = None
+        cursor.execute(f"SELECT {', '.join(expressions)} FROM {table} WHERE 1=1{where} ORDER BY {time_column}",
+                       params + where_params)
+        position = 0
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            end = position + len(rows)
+            if end > len(buffers[0]):
+                # 统计行数之后又有新写入
+                buffers = [np.resize(buffer, max(end, len(buffer) * 2)) for buffer in buffers]
+            for name, kind, buffer, values in zip(columns, kinds, buffers, zip(*rows)):
+                if kind == 'time':
+                    buffer[position:end] = np.array(values, dtype='datetime64[us]').view(np.int64)
+                elif kind == 'text':
+                    lookup = lookups[name]
+                    buffer[position:end] = [lookup.setdefault(value, len(lookup)) for value in values]
+                else:
+                    buffer[position:end] = values
+            position = end
+
+        result: Dict[str, Any] = {name: buffer[:position] for name, buffer in zip(columns, buffers)}
+        result['dictionaries'] = {name: list(lookup) for name, lookup in lookups.items()}
+        result['time_columns'] = [name for name, kind in zip(columns, kinds) if kind == 'time']
+        return result
+
+    def insert_state_change(self, state_type: str, timestamp: datetime, idle_duration: Optional[float] = None,
+                            commit: bool = True):
         """插入状态变化记录"""
         cursor = self.connection.cursor()
         cursor.execute('''
@@ -148,66 +606,439 @@ class Database:
             (state_type, timestamp, idle_duration)
             VALUES (?, ?, ?)
         ''', (state_type, timestamp, idle_duration))
+        if commit:
+            self.connection.commit()
+
+    def commit(self):
+        """提交当前事务（配合 commit=False 的批量写入使用）"""
         self.connection.commit()
 
-    def _update_app_statistics(self, process_name: str, window_title: str, duration: float, last_used: datetime):
+    def partition_for(self, moment: datetime) -> Optional['Database']:
+        """
+        保存该时间数据的数据库文件（单文件数据库为自身，按月分区时为对应月份，见 PartitionedDatabase）
+        只查找不创建，按月分区时该月份还没有数据则返回None
+        """
+        return self
+
+    def partition_for_insert(self, moment: datetime) -> 'Database':
+        """写入该时间的数据时使用的数据库文件（按月分区时不存在则创建）"""
+        return self
+
+    def route(self, method: str, arguments: Dict[str, Any]) -> List[Tuple['Database', Dict[str, Any]]]:
+        """
+        一次写入（写入方法名和参数）落到的数据库文件及各文件上的参数，
+        供需要按文件分别提交的调用方使用（单文件数据库为自身，按月分区见 PartitionedDatabase.route）
+        """
+        return [(self, arguments)]
+
+    def partitions(self) -> List['Database']:
+        """全部数据库文件"""
+        return [self]
+
+    def _update_app_statistics(self, process_name: str, window_title: str, duration: float, last_used: datetime,
+                               commit: bool = True):
         """更新应用统计信息"""
         cursor = self.connection.cursor()
         cursor.execute('''
-            INSERT OR REPLACE INTO app_statistics
+            INSERT INTO app_statistics
             (process_name, window_title, total_duration, session_count, last_used, updated_at)
-            VALUES (
-                ?, ?,
-                COALESCE((SELECT total_duration FROM app_statistics
-                         WHERE process_name = ? AND window_title = ?), 0) + ?,
-                COALESCE((SELECT session_count FROM app_statistics
-                         WHERE process_name = ? AND window_title = ?), 0) + 1,
-                ?, CURRENT_TIMESTAMP
-            )
-        ''', (process_name, window_title, process_name, window_title, duration,
-              process_name, window_title, last_used))
+            VALUES (?, ?, ?, 1, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(process_name, window_title) DO UPDATE SET
+                total_duration = total_duration + excluded.total_duration,
+                session_count = session_count + 1,
+                last_used = excluded.last_used,
+                updated_at = CURRENT_TIMESTAMP
+        ''', (process_name, window_title, duration, last_used))
+        if commit:
+            self.connection.commit()
+
+    def rebuild_app_statistics(self):
+        """
+        根据窗口活动记录重建应用统计
+        修改规范化规则后调用，旧记录按当前规则重新规范化并回写 normalized_title
+        """
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT id, process_name, window_title, end_time, duration FROM window_activities")
+        rows = cursor.fetchall()
+
+        totals = {}
+        updates = []
+        for row in rows:
+            normalized_title = self.normalize_title(row['window_title'])
+            updates.append((normalized_title, row['id']))
+
+            key = (row['process_name'], normalized_title)
+            total_duration, session_count, last_used = totals.get(key, (0.0, 0, row['end_time']))
+            totals[key] = (total_duration + row['duration'], session_count + 1,
+                           max(last_used, row['end_time']))
+
+        cursor.executemany("UPDATE window_activities SET normalized_title = ? WHERE id = ?", updates)
+        cursor.execute("DELETE FROM app_statistics")
+        cursor.executemany('''
+            INSERT INTO app_statistics
+            (process_name, window_title, total_duration, session_count, last_used)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [key + value for key, value in totals.items()])
         self.connection.commit()
 
-    def get_window_activities(self, start_date: Optional[datetime] = None,
-                             end_date: Optional[datetime] = None) -> List[Dict]:
-        """获取窗口活动记录"""
+    @staticmethod
+    def _split_by_hour(start_time: datetime, end_time: datetime) -> List[tuple]:
+        """
+        按整点切分时间区间
+        :return: [(小时起点, 该小时内的秒数), ...]
+        """
+        pieces = []
+        hour_start = start_time.replace(minute=0, second=0, microsecond=0)
+        current = start_time
+        while current < end_time:
+            next_hour = hour_start + timedelta(hours=1)
+            piece_end = min(next_hour, end_time)
+            pieces.append((hour_start, (piece_end - current).total_seconds()))
+            current = piece_end
+            hour_start = next_hour
+        return pieces
+
+    def _add_to_hourly_buckets(self, process_name: str, start_time: datetime, end_time: datetime,
+                               keystrokes: int = 0, clicks: int = 0):
+        """把一段会话累加到小时聚合表（不提交），输入计数按时长比例分摊到各小时"""
+        pieces = self._split_by_hour(start_time, end_time)
+        if not pieces:
+            return
+
+        total = sum(seconds for _, seconds in pieces)
+        rows = []
+        elapsed = 0.0
+        keys_given = clicks_given = 0
+        for hour_start, seconds in pieces:
+            # 按累计比例取整，各小时之和与会话计数一致
+            elapsed += seconds
+            share = elapsed / total if total > 0 else 1.0
+            keys_share = round(keystrokes * share) - keys_given
+            clicks_share = round(clicks * share) - clicks_given
+            keys_given += keys_share
+            clicks_given += clicks_share
+            rows.append((hour_start, process_name, seconds, keys_share, clicks_share))
+
+        self.connection.executemany('''
+            INSERT INTO hourly_buckets (bucket_start, process_name, seconds, keystrokes, clicks)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(bucket_start, process_name) DO UPDATE SET
+                seconds = seconds + excluded.seconds,
+                keystrokes = keystrokes + excluded.keystrokes,
+                clicks = clicks + excluded.clicks
+        ''', rows)
+
+    def _needs_bucket_backfill(self) -> bool:
+        """判断小时聚合表是否为空而原始记录已存在"""
         cursor = self.connection.cursor()
-        query = "SELECT * FROM window_activities WHERE 1=1"
+        cursor.execute("SELECT EXISTS(SELECT 1 FROM hourly_buckets) AS has_buckets")
+        if cursor.fetchone()['has_buckets']:
+            return False
+        cursor.execute("SELECT EXISTS(SELECT 1 FROM window_activities) AS has_rows")
+        return bool(cursor.fetchone()['has_rows'])
+
+    def rebuild_hourly_buckets(self):
+        """
+        根据窗口活动记录重建小时聚合表
+        按列读取全部会话，在数组上按整点切分并汇总（分摊方式与 _add_to_hourly_buckets 相同），最后一次写入
+        """
+        import numpy as np
+
+        columns = self.read_columns('window_activities',
+                                    columns=['process_name', 'start_time', 'end_time', 'keystrokes', 'clicks'])
+        valid = columns['end_time'] > columns['start_time']
+        start = columns['start_time'][valid]
+        end = columns['end_time'][valid]
+        hour = 3600 * 1000000
+
+        # 每个会话拆成它覆盖的各个小时
+        first_hour = start // hour
+        piece_counts = (end - 1) // hour - first_hour + 1
+        first_piece = np.cumsum(piece_counts) - piece_counts
+        session = np.repeat(np.arange(len(start)), piece_counts)
+        bucket = first_hour[session] + np.arange(len(session)) - first_piece[session]
+        piece_end = np.minimum(end[session], (bucket + 1) * hour)
+        seconds = (piece_end - np.maximum(start[session], bucket * hour)) / 1e6
+
+        # 输入计数按累计比例取整，各小时之和与会话计数一致
+        share = (piece_end - start[session]) / (end - start)[session]
+        is_first = np.zeros(len(session), dtype=bool)
+        is_first[first_piece[piece_counts > 0]] = True
+        counts = {}
+        for name in ('keystrokes', 'clicks'):
+            given = np.round(columns[name][valid][session] * share)
+            before = np.concatenate(([0.0], given[:-1]))
+            before[is_first] = 0.0
+            counts[name] = given - before
+
+        # 按 (小时, 应用) 汇总
+        names = columns['dictionaries']['process_name']
+        app_count = max(len(names), 1)
+        keys, inverse = np.unique(bucket * app_count + columns['process_name'][valid][session],
+                                  return_inverse=True)
+        seconds_sum = np.bincount(inverse, weights=seconds, minlength=len(keys))
+        keystrokes_sum = np.bincount(inverse, weights=counts['keystrokes'], minlength=len(keys))
+        clicks_sum = np.bincount(inverse, weights=counts['clicks'], minlength=len(keys))
+        bucket_starts = ((keys // app_count) * hour).astype('datetime64[us]').astype(object)
+
+        cursor = self.connection.cursor()
+        cursor.execute("DELETE FROM hourly_buckets")
+        cursor.executemany('''
+            INSERT INTO hourly_buckets (bucket_start, process_name, seconds, keystrokes, clicks)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(bucket_starts[i], names[keys[i] % app_count], float(seconds_sum[i]),
+               int(keystrokes_sum[i]), int(clicks_sum[i])) for i in range(len(keys))])
+        self.connection.commit()
+
+    def _overlap_filter(self, table: str, start_date: Optional[datetime],
+                        end_date: Optional[datetime]) -> Tuple[str, list]:
+        """
+        构造区间重叠条件：与 [start_date, end_date] 有交集的记录都会命中
+        起点下界由最长会话时长推出，使查询能走 (start_time, end_time) 索引
+        """
+        where = ""
         params = []
 
         if start_date:
-            query += " AND start_time >= ?"
-            params.append(start_date)
+            cursor = self.connection.cursor()
+            cursor.execute(f"SELECT MAX(duration) AS longest FROM {table}")
+            longest = cursor.fetchone()['longest'] or 0
+            where += " AND start_time >= ? AND (COALESCE(end_time, start_time) > ? OR start_time >= ?)"
+            params += [start_date - timedelta(seconds=longest + 1), start_date, start_date]
 
         if end_date:
-            query += " AND start_time <= ?"
+            where += " AND start_time <= ?"
             params.append(end_date)
 
-        query += " ORDER BY start_time DESC"
+        return where, params
+
+    def get_window_activities(self, start_date: Optional[datetime] = None,
+                             end_date: Optional[datetime] = None, clip: bool = False,
+                             after_id: Optional[int] = None) -> List[WindowActivity]:
+        """
+        获取窗口活动记录（与时间范围重叠的会话）
+        :param clip: 是否把会话裁剪到查询范围内，跨越边界的会话只保留范围内的部分
+        :param after_id: 只返回 id 大于该值的记录（实时模式的增量查询）
+        :return: 记录对象列表，可以像字典一样按键访问
+        """
+        cursor = self.connection.cursor()
+        cursor.row_factory = self.clipped_window_factory if clip else self.window_factory
+        query = "SELECT *"
+        params = []
+
+        if clip:
+            start_expr = "MAX(start_time, ?)" if start_date else "start_time"
+            end_expr = "MIN(end_time, ?)" if end_date else "end_time"
+            query += (f", {start_expr} AS clip_start, {end_expr} AS clip_end"
+                      f", MAX(ROUND((julianday({end_expr}) - julianday({start_expr})) * 86400.0, 3), 0.0)"
+                      f" AS clip_duration")
+            bounds = ([start_date] if start_date else []) + ([end_date] if end_date else [])
+            params += bounds + bounds[::-1]
+
+        where, where_params = self._overlap_filter('window_activities', start_date, end_date)
+        if after_id is not None:
+            where += " AND id > ?"
+            where_params.append(after_id)
+        query += " FROM window_activities WHERE 1=1" + where + " ORDER BY start_time DESC"
+        params += where_params
 
         cursor.execute(query, params)
-        return [dict(row) for row in cursor.fetchall()]
+        return cursor.fetchall()
 
-    def get_browser_activities(self, start_date: Optional[datetime] = None,
-                              end_date: Optional[datetime] = None) -> List[Dict]:
-        """获取浏览器活动记录"""
+    # 会话列表允许的排序列
+    PAGE_SORT_COLUMNS = ('start_time', 'duration', 'process_name')
+
+    @staticmethod
+    def _like_pattern(text: str) -> str:
+        """构造子串匹配的LIKE模式（转义通配符，配合 ESCAPE '\\' 使用）"""
+        escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return f"%{escaped}%"
+
+    def _session_filter(self, start_date: Optional[datetime], end_date: Optional[datetime],
+                        process_name: Optional[str], title_filter: Optional[str]) -> Tuple[str, list]:
+        """构造会话列表的筛选条件：时间范围、应用名、标题子串"""
+        where, params = self._overlap_filter('window_activities', start_date, end_date)
+        if process_name:
+            where += " AND process_name = ?"
+            params.append(process_name)
+        if title_filter:
+            where += " AND window_title LIKE ? ESCAPE '\\'"
+            params.append(self._like_pattern(title_filter))
+        return where, params
+
+    def get_window_activities_page(self, start_date: Optional[datetime] = None,
+                                   end_date: Optional[datetime] = None,
+                                   after: Optional[Tuple[Any, int]] = None, limit: int = 200,
+                                   sort: str = 'start_time', descending: bool = True,
+                                   process_name: Optional[str] = None,
+                                   title_filter: Optional[str] = None) -> List[WindowActivity]:
+        """
+        分页获取窗口活动记录（键集分页，翻页代价与页码无关）
+        :param after: 上一页最后一条记录的 (排序列的值, id)，为None时从第一页开始
+        :param limit: 每页条数
+        :param sort: 排序列，见 PAGE_SORT_COLUMNS
+        :param descending: 是否降序
+        :param process_name: 只显示该应用的记录
+        :param title_filter: 标题包含的子串
+        """
+        if sort not in self.PAGE_SORT_COLUMNS:
+            raise ValueError(f"不支持的排序列: {sort}")
+
+        where, params = self._session_filter(start_date, end_date, process_name, title_filter)
+        if after is not None:
+            where += f" AND ({sort}, id) {'<' if descending else '>'} (?, ?)"
+            params += list(after)
+
+        order = "DESC" if descending else "ASC"
         cursor = self.connection.cursor()
-        query = "SELECT * FROM browser_activities WHERE 1=1"
-        params = []
+        cursor.row_factory = self.window_factory
+        cursor.execute(f'''
+            SELECT * FROM window_activities WHERE 1=1{where}
+            ORDER BY {sort} {order}, id {order}
+            LIMIT ?
+        ''', params + [limit])
+        return cursor.fetchall()
 
-        if start_date:
-            query += " AND start_time >= ?"
-            params.append(start_date)
+    def count_window_activities(self, start_date: Optional[datetime] = None,
+                                end_date: Optional[datetime] = None,
+                                process_name: Optional[str] = None,
+                                title_filter: Optional[str] = None) -> int:
+        """统计满足筛选条件的窗口活动记录数"""
+        where, params = self._session_filter(start_date, end_date, process_name, title_filter)
+        cursor = self.connection.cursor()
+        cursor.execute(f"SELECT COUNT(*) AS count FROM window_activities WHERE 1=1{where}", params)
+        return cursor.fetchone()['count']
+
+    def get_process_names(self, start_date: Optional[datetime] = None,
+                          end_date: Optional[datetime] = None) -> List[str]:
+        """获取时间范围内出现过的应用名"""
+        where, params = self._overlap_filter('window_activities', start_date, end_date)
+        cursor = self.connection.cursor()
+        cursor.execute(f"SELECT DISTINCT process_name FROM window_activities WHERE 1=1{where} "
+                       f"ORDER BY process_name", params)
+        return [row['process_name'] for row in cursor.fetchall()]
+
+    @staticmethod
+    def _match_expression(query: str) -> Optional[str]:
+        """
+        把用户输入转换为FTS5查询：每个词作为短语，词之间为AND
+        trigram分词无法匹配少于3个字符的词，此时返回None改用LIKE
+        """
+        terms = query.split()
+        if not terms or any(len(term) < 3 for term in terms):
+            return None
+        return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+    def search_activities(self, query: str, start_date: Optional[datetime] = None,
+                          end_date: Optional[datetime] = None, limit: int = 50,
+                          use_index: bool = True) -> List[Dict]:
+        """
+        按标题/网址搜索窗口会话和浏览器页面，相同标题的会话合并
+        :param query: 搜索词，空格分隔的多个词需要同时出现
+        :param use_index: 是否使用全文索引（False时用LIKE扫描，用于对比测试）
+        :return: [{'source', 'app', 'title', 'url', 'total_duration', 'session_count',
+                   'first_seen', 'last_seen', 'score'}, ...]，按相关度和总时长排序
+        """
+        match = self._match_expression(query) if use_index and self.search_enabled else None
 
+        time_filter = ""
+        time_params = []
+        if start_date:
+            time_filter += " AND COALESCE(a.end_time, a.start_time) >= ?"
+            time_params.append(start_date)
         if end_date:
-            query += " AND start_time <= ?"
-            params.append(end_date)
+            time_filter += " AND a.start_time <= ?"
+            time_params.append(end_date)
 
-        query += " ORDER BY start_time DESC"
+        if match is not None:
+            # rank（默认为bm25）越小越相关
+            window_source = '''
+                FROM (SELECT rowid, rank AS score FROM activity_search
+                      WHERE activity_search MATCH ?) h
+                JOIN window_activities a ON a.id = h.rowid / 2
+                WHERE h.rowid % 2 = 0'''
+            browser_source = '''
+                FROM (SELECT rowid, rank AS score FROM activity_search
+                      WHERE activity_search MATCH ?) h
+                JOIN browser_activities a ON a.id = h.rowid / 2
+                WHERE h.rowid % 2 = 1'''
+            window_params = [match] + time_params
+            browser_params = [match] + time_params
+            score = "MIN(h.score)"
+        else:
+            terms = query.split() or [query]
+            patterns = [self._like_pattern(term) for term in terms]
+            window_like = "".join(" AND a.window_title LIKE ? ESCAPE '\\'" for _ in terms)
+            browser_like = "".join(" AND (a.page_title LIKE ? ESCAPE '\\' OR a.page_url LIKE ? ESCAPE '\\')"
+                                   for _ in terms)
+            window_source = f" FROM window_activities a WHERE 1=1{window_like}"
+            browser_source = f" FROM browser_activities a WHERE 1=1{browser_like}"
+            window_params = patterns + time_params
+            browser_params = [p for pattern in patterns for p in (pattern, pattern)] + time_params
+            score = "0.0"
 
-        cursor.execute(query, params)
+        cursor = self.connection.cursor()
+        cursor.execute(f'''
+            SELECT 'window' AS source, a.process_name AS app, a.window_title AS title, '' AS url,
+                   SUM(a.duration) AS total_duration, COUNT(*) AS session_count,
+                   MIN(a.start_time) AS first_seen, MAX(a.end_time) AS last_seen, {score} AS score
+            {window_source}{time_filter}
+            GROUP BY a.process_name, a.window_title
+            UNION ALL
+            SELECT 'browser' AS source, a.browser_name AS app, a.page_title AS title,
+                   MAX(COALESCE(a.page_url, '')) AS url,
+                   SUM(COALESCE(a.duration, 0)) AS total_duration, COUNT(*) AS session_count,
+                   MIN(a.start_time) AS first_seen, MAX(COALESCE(a.end_time, a.start_time)) AS last_seen,
+                   {score} AS score
+            {browser_source}{time_filter}
+            GROUP BY a.browser_name, a.page_title
+            ORDER BY score, total_duration DESC
+            LIMIT ?
+        ''', window_params + browser_params + [limit])
         return [dict(row) for row in cursor.fetchall()]
 
+    def get_max_id(self, table: str) -> int:
+        """获取表中最大的id（实时模式的增量查询起点）"""
+        cursor = self.connection.cursor()
+        cursor.execute(f"SELECT MAX(id) AS max_id FROM {table}")
+        return cursor.fetchone()['max_id'] or 0
+
+    def get_range_watermark(self, start_date: datetime, end_date: datetime) -> str:
+        """
+        时间范围内数据的版本标记：与范围重叠的窗口会话、范围内的状态变化和每分钟输入计数的
+        条数与最大id，任何写入、删除或替换都会改变它（报告命令行据此跳过未变化的日期）
+        """
+        cursor = self.connection.cursor()
+        where, params = self._overlap_filter('window_activities', start_date, end_date)
+        cursor.execute("SELECT COUNT(*) AS count, MAX(id) AS max_id FROM window_activities WHERE 1=1" + where,
+                       params)
+        window = cursor.fetchone()
+
+        cursor.execute('''
+            SELECT COUNT(*) AS count, MAX(id) AS max_id FROM state_changes
+            WHERE timestamp >= ? AND timestamp <= ?
+        ''', (start_date, end_date))
+        state = cursor.fetchone()
+
+        cursor.execute('''
+            SELECT COUNT(*) AS count, MAX(rowid) AS max_id FROM input_minutes
+            WHERE hour_start >= ? AND hour_start <= ?
+        ''', (start_date.replace(minute=0, second=0, microsecond=0), end_date))
+        minutes = cursor.fetchone()
+
+        return ":".join(f"{row['count']}-{row['max_id'] or 0}" for row in (window, state, minutes))
+
+    def get_browser_activities(self, start_date: Optional[datetime] = None,
+                              end_date: Optional[datetime] = None) -> List[BrowserActivity]:
+        """获取浏览器活动记录（与时间范围重叠的记录）"""
+        where, params = self._overlap_filter('browser_activities', start_date, end_date)
+        query = "SELECT * FROM browser_activities WHERE 1=1" + where + " ORDER BY start_time DESC"
+
+        cursor = self.connection.cursor()
+        cursor.row_factory = self.browser_factory
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
     def get_app_statistics(self, limit: int = 10) -> List[Dict]:
         """获取应用使用统计"""
         cursor = self.connection.cursor()
@@ -219,44 +1050,354 @@ class Database:
         return [dict(row) for row in cursor.fetchall()]
 
     def get_daily_summary(self, date: datetime) -> Dict:
-        """获取某天的使用摘要"""
+        """获取某天的使用摘要（活跃时间已扣除空闲区间）"""
         start_of_day = date.replace(hour=0, minute=0, second=0, microsecond=0)
         end_of_day = start_of_day.replace(hour=23, minute=59, second=59, microsecond=999999)
+        next_day = start_of_day + timedelta(days=1)
 
         cursor = self.connection.cursor()
 
-        # 总活跃时间
+        # 窗口会话总时长和应用数量：跨越零点的会话只计算当天部分
+        where, params = self._overlap_filter('window_activities', start_of_day, end_of_day)
         cursor.execute('''
-            SELECT SUM(duration) as total_time
+            SELECT ROUND(SUM((julianday(MIN(end_time, ?)) - julianday(MAX(start_time, ?))) * 86400.0), 3) as session_time,
+                   COUNT(DISTINCT process_name) as app_count
             FROM window_activities
-            WHERE start_time >= ? AND start_time <= ?
-        ''', (start_of_day, end_of_day))
-        total_time = cursor.fetchone()['total_time'] or 0
+            WHERE 1=1
+        ''' + where, [next_day, start_of_day] + params)
+        row = cursor.fetchone()
+        session_time = row['session_time'] or 0
+        app_count = row['app_count'] or 0
 
-        # 应用数量
-        cursor.execute('''
-            SELECT COUNT(DISTINCT process_name) as app_count
-            FROM window_activities
-            WHERE start_time >= ? AND start_time <= ?
-        ''', (start_of_day, end_of_day))
-        app_count = cursor.fetchone()['app_count'] or 0
+        # 真实活跃时间和空闲时间来自派生时间线（时间线落后时只读地现算，不写入）
+        segments, idle_periods = self._timeline_day(start_of_day)
+        total_time = sum(item['duration'] for item in segments)
+        idle_time = sum(item['duration'] for item in idle_periods)
 
-        # 空闲时间
-        cursor.execute('''
-            SELECT SUM(idle_duration) as idle_time
-            FROM state_changes
-            WHERE state_type = 'idle' AND timestamp >= ? AND timestamp <= ?
-        ''', (start_of_day, end_of_day))
-        idle_time = cursor.fetchone()['idle_time'] or 0
+        streaks = find_focus_streaks(segments)
+        return self.make_daily_summary(date, total_time, idle_time, session_time, app_count, streaks)
 
+    @staticmethod
+    def make_daily_summary(date: datetime, total_time: float, idle_time: float, session_time: float,
+                           app_count: int, streaks: List[Dict]) -> Dict:
+        """组装每日摘要"""
         return {
             'date': date.date(),
             'total_active_time': total_time,
             'total_idle_time': idle_time,
+            'total_session_time': session_time,
             'app_count': app_count,
+            'focus_streak_count': len(streaks),
+            'longest_focus_streak': max((item['active_time'] for item in streaks), default=0),
             'focus_efficiency': (total_time / (total_time + idle_time) * 100) if (total_time + idle_time) > 0 else 0
         }
 
+    def _get_watermark(self, name: str) -> int:
+        """读取派生数据的处理进度"""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT last_id FROM derived_watermarks WHERE name = ?", (name,))
+        row = cursor.fetchone()
+        return row['last_id'] if row else 0
+
+    def _set_watermark(self, name: str, last_id: int):
+        """保存派生数据的处理进度（不提交）"""
+        self.connection.execute('''
+            INSERT INTO derived_watermarks (name, last_id) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET last_id = excluded.last_id
+        ''', (name, last_id))
+
+    def refresh_activity_timeline(self):
+        """
+        增量更新派生的活跃/空闲时间线
+        只重算新增窗口会话和状态变化所涉及的日期，没有新数据时只需两次索引查询
+        """
+        cursor = self.connection.cursor()
+        window_mark = self._get_watermark('window_activities')
+        state_mark = self._get_watermark('state_changes')
+
+        cursor.execute('''
+            SELECT MAX(id) AS max_id, MIN(start_time) AS first_time, MAX(end_time) AS last_time
+            FROM window_activities WHERE id > ?
+        ''', (window_mark,))
+        new_windows = cursor.fetchone()
+
+        cursor.execute('''
+            SELECT MAX(id) AS max_id, MIN(timestamp) AS first_time, MAX(timestamp) AS last_time,
+                   MAX(idle_duration) AS longest_idle
+            FROM state_changes WHERE id > ?
+        ''', (state_mark,))
+        new_states = cursor.fetchone()
+
+        if new_windows['max_id'] is None and new_states['max_id'] is None:
+            return
+
+        first_times = []
+        last_times = []
+        if new_windows['max_id'] is not None:
+            first_times.append(to_datetime(new_windows['first_time']))
+            last_times.append(to_datetime(new_windows['last_time']))
+        if new_states['max_id'] is not None:
+            first_times.append(to_datetime(new_states['first_time'])
+                               - timedelta(seconds=new_states['longest_idle'] or 0))
+            last_times.append(to_datetime(new_states['last_time']))
+
+        # 上次处理时仍未结束的空闲区间，可能被新的记录关闭
+        cursor.execute('''
+            SELECT state_type, timestamp, idle_duration FROM state_changes
+            WHERE id <= ? ORDER BY id DESC LIMIT 1
+        ''', (state_mark,))
+        last_state = cursor.fetchone()
+        if last_state is not None and last_state['state_type'] == 'idle':
+            first_times.append(to_datetime(last_state['timestamp'])
+                               - timedelta(seconds=last_state['idle_duration'] or 0))
+
+        # 未结束的空闲区间截止到最新一条记录
+        cursor.execute("SELECT MAX(end_time) AS last_time FROM window_activities")
+        latest = [to_datetime(cursor.fetchone()['last_time'])] + last_times
+        until = max(value for value in latest if value is not None)
+
+        day = min(first_times).replace(hour=0, minute=0, second=0, microsecond=0)
+        last_day = max(last_times)
+        while day <= last_day:
+            self._rebuild_timeline_day(day, until)
+            day += timedelta(days=1)
+
+        if new_windows['max_id'] is not None:
+            self._set_watermark('window_activities', new_windows['max_id'])
+        if new_states['max_id'] is not None:
+            self._set_watermark('state_changes', new_states['max_id'])
+        self.connection.commit()
+
+    def _rebuild_timeline_day(self, day: datetime, until: datetime):
+        """重算某一天的活跃片段和空闲区间（不提交）"""
+        segments, idle_intervals = self._compute_timeline_day(day, until)
+        cursor = self.connection.cursor()
+        cursor.execute("DELETE FROM active_segments WHERE day = ?", (day.date(),))
+        cursor.execute("DELETE FROM idle_periods WHERE day = ?", (day.date(),))
+        cursor.executemany('''
+            INSERT INTO active_segments (day, window_id, process_name, start_time, end_time, duration)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(day.date(), item['window_id'], item['process_name'],
+               item['start_time'], item['end_time'], item['duration']) for item in segments])
+        cursor.executemany('''
+            INSERT INTO idle_periods (day, start_time, end_time, duration)
+            VALUES (?, ?, ?, ?)
+        ''', [(day.date(), start, end, (end - start).total_seconds())
+               for start, end in idle_intervals])
+
+    def _compute_timeline_day(self, day: datetime,
+                              until: datetime) -> Tuple[List[Dict], List[Tuple[datetime, datetime]]]:
+        """只读地计算某一天的活跃片段和空闲区间"""
+        day_start = day
+        next_day = day_start + timedelta(days=1)
+        state_rows = self._states_around(day_start, next_day)
+
+        idle_intervals = []
+        for start, end in build_idle_intervals(state_rows, min(until, next_day)):
+            clipped = clip_interval(start, end, day_start, next_day)
+            if clipped:
+                idle_intervals.append(clipped)
+
+        sessions = self.get_window_activities(day_start, next_day - timedelta(microseconds=1), clip=True)
+        sessions.reverse()
+        segments = sweep_active_segments(sessions, idle_intervals)
+        return segments, idle_intervals
+
+    def _states_around(self, day_start: datetime, next_day: datetime) -> List[sqlite3.Row]:
+        """某天的状态记录：当天之前的最后一条、当天的全部以及之后的第一条（按时间排序）"""
+        cursor = self.connection.cursor()
+        cursor.execute('''
+            SELECT * FROM (
+                SELECT state_type, timestamp, idle_duration FROM state_changes
+                WHERE timestamp < ? ORDER BY timestamp DESC LIMIT 1
+            )
+            UNION ALL
+            SELECT state_type, timestamp, idle_duration FROM state_changes
+            WHERE timestamp >= ? AND timestamp < ?
+            UNION ALL
+            SELECT * FROM (
+                SELECT state_type, timestamp, idle_duration FROM state_changes
+                WHERE timestamp >= ? ORDER BY timestamp LIMIT 1
+            )
+        ''', (day_start, day_start, next_day, next_day))
+        return sorted(cursor.fetchall(), key=lambda row: row['timestamp'])
+
+    def _timeline_is_current(self) -> bool:
+        """派生时间线是否已包含全部窗口会话和状态变化（只读，两次主键查询）"""
+        cursor = self.connection.cursor()
+        cursor.execute('''
+            SELECT (SELECT MAX(id) FROM window_activities) AS window_id,
+                   (SELECT MAX(id) FROM state_changes) AS state_id
+        ''')
+        row = cursor.fetchone()
+        return ((row['window_id'] or 0) <= self._get_watermark('window_activities')
+                and (row['state_id'] or 0) <= self._get_watermark('state_changes'))
+
+    def _timeline_day(self, date: datetime) -> Tuple[List[Dict], List[Dict]]:
+        """
+        读取某天的活跃片段和空闲区间
+        派生时间线已是最新时直接读表；写入方尚未刷新时只读地现算，结果与刷新后读表一致
+        """
+        day_start = date.replace(hour=0, minute=0, second=0, microsecond=0)
+        cursor = self.connection.cursor()
+
+        if self._timeline_is_current():
+            cursor.execute('''
+                SELECT window_id, process_name, start_time, end_time, duration
+                FROM active_segments WHERE day = ? ORDER BY start_time
+            ''', (day_start.date(),))
+            segments = [dict(row) for row in cursor.fetchall()]
+            cursor.execute('''
+                SELECT start_time, end_time, duration
+                FROM idle_periods WHERE day = ? ORDER BY start_time
+            ''', (day_start.date(),))
+            return segments, [dict(row) for row in cursor.fetchall()]
+
+        # 未结束的空闲区间截止到最新一条记录，与 refresh_activity_timeline 相同
+        cursor.execute('''
+            SELECT (SELECT MAX(end_time) FROM window_activities) AS window_time,
+                   (SELECT MAX(timestamp) FROM state_changes) AS state_time
+        ''')
+        row = cursor.fetchone()
+        latest = [to_datetime(row['window_time']), to_datetime(row['state_time'])]
+        until = max((value for value in latest if value is not None), default=day_start)
+
+        # 与表中存储的格式保持一致（时间为字符串）
+        segments, idle_intervals = self._compute_timeline_day(day_start, until)
+        segments = [{**item, 'start_time': str(item['start_time']), 'end_time': str(item['end_time'])}
+                    for item in segments]
+        segments.sort(key=lambda item: item['start_time'])
+        idle_periods = [{'start_time': str(start), 'end_time': str(end),
+                         'duration': (end - start).total_seconds()}
+                        for start, end in idle_intervals]
+        return segments, idle_periods
+
+    def get_active_segments(self, date: datetime) -> List[Dict]:
+        """获取某天扣除空闲后的活跃片段"""
+        return self._timeline_day(date)[0]
+
+    def get_idle_periods(self, date: datetime) -> List[Dict]:
+        """获取某天的空闲区间"""
+        return self._timeline_day(date)[1]
+
+    def get_focus_streaks(self, date: datetime, gap_tolerance: float = 60.0,
+                          min_duration: float = 300.0) -> List[Dict]:
+        """获取某天的专注连续段"""
+        return find_focus_streaks(self.get_active_segments(date), gap_tolerance, min_duration)
+
+    def get_active_time_by_app(self, start_date: datetime, end_date: datetime) -> List[Dict]:
+        """获取日期范围内各应用的真实活跃时间（已扣除空闲）"""
+        cursor = self.connection.cursor()
+        cursor.execute('''
+            SELECT process_name, SUM(duration) AS active_time
+            FROM active_segments
+            WHERE day >= ? AND day <= ?
+            GROUP BY process_name
+            ORDER BY active_time DESC
+        ''', (start_date.date(), end_date.date()))
+        return [dict(row) for row in cursor.fetchall()]
+
+    def get_app_input_intensity(self, start_date: datetime, end_date: datetime) -> List[Dict]:
+        """
+        获取日期范围内各应用的输入强度（只读取小时聚合表）
+        :param start_date: 起始日期（包含）
+        :param end_date: 结束日期（包含）
+        :return: [{'process_name', 'seconds', 'keystrokes', 'clicks',
+                   'keys_per_minute', 'clicks_per_minute'}, ...]，按每分钟输入次数降序
+        """
+        range_start = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        range_end = end_date.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        cursor = self.connection.cursor()
+        cursor.execute('''
+            SELECT process_name, SUM(seconds) AS seconds,
+                   SUM(keystrokes) AS keystrokes, SUM(clicks) AS clicks,
+                   SUM(keystrokes) * 60.0 / SUM(seconds) AS keys_per_minute,
+                   SUM(clicks) * 60.0 / SUM(seconds) AS clicks_per_minute
+            FROM hourly_buckets
+            WHERE bucket_start >= ? AND bucket_start < ?
+            GROUP BY process_name
+            HAVING SUM(seconds) > 0
+            ORDER BY keys_per_minute + clicks_per_minute DESC
+        ''', (range_start, range_end))
+        return [dict(row) for row in cursor.fetchall()]
+
+    def get_hourly_buckets(self, start_date: datetime, end_date: datetime) -> List[Dict]:
+        """
+        获取小时聚合记录（时间轴缩小到多天时使用）
+        :return: [{'bucket_start', 'process_name', 'seconds', 'keystrokes', 'clicks'}, ...]，
+                 按小时排序，同一小时内按时长降序
+        """
+        cursor = self.connection.cursor()
+        cursor.execute('''
+            SELECT bucket_start, process_name, seconds, keystrokes, clicks
+            FROM hourly_buckets
+            WHERE bucket_start >= ? AND bucket_start < ?
+            ORDER BY bucket_start, seconds DESC
+        ''', (start_date, end_date))
+        return [dict(row) for row in cursor.fetchall()]
+
+    def get_range_report(self, start_date: datetime, end_date: datetime) -> Dict:
+        """
+        获取日期范围报告（只读取小时聚合表）
+        :param start_date: 起始日期（包含）
+        :param end_date: 结束日期（包含）
+        :return: 应用总计、星期×小时热力图和每日趋势
+        """
+        range_start = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        range_end = end_date.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        params = (range_start, range_end)
+
+        cursor = self.connection.cursor()
+
+        # 各应用总计
+        cursor.execute('''
+            SELECT process_name, SUM(seconds) AS seconds,
+                   SUM(keystrokes) AS keystrokes, SUM(clicks) AS clicks
+            FROM hourly_buckets
+            WHERE bucket_start >= ? AND bucket_start < ?
+            GROUP BY process_name
+            ORDER BY seconds DESC
+        ''', params)
+        app_totals = [dict(row) for row in cursor.fetchall()]
+
+        # 星期 × 小时热力图（星期一为0，与 datetime.weekday() 一致）
+        heatmap = [[0.0] * 24 for _ in range(7)]
+        cursor.execute('''
+            SELECT (CAST(strftime('%w', bucket_start) AS INTEGER) + 6) % 7 AS weekday,
+                   CAST(strftime('%H', bucket_start) AS INTEGER) AS hour,
+                   SUM(seconds) AS seconds
+            FROM hourly_buckets
+            WHERE bucket_start >= ? AND bucket_start < ?
+            GROUP BY weekday, hour
+        ''', params)
+        for row in cursor.fetchall():
+            heatmap[row['weekday']][row['hour']] = row['seconds']
+
+        # 每日趋势，没有数据的日期补0
+        cursor.execute('''
+            SELECT date(bucket_start) AS day, SUM(seconds) AS seconds
+            FROM hourly_buckets
+            WHERE bucket_start >= ? AND bucket_start < ?
+            GROUP BY day
+        ''', params)
+        daily_seconds = {row['day']: row['seconds'] for row in cursor.fetchall()}
+
+        daily_trend = []
+        day = range_start
+        while day < range_end:
+            key = day.strftime('%Y-%m-%d')
+            daily_trend.append({'date': day.date(), 'seconds': daily_seconds.get(key, 0.0)})
+            day += timedelta(days=1)
+
+        return {
+            'start_date': range_start.date(),
+            'end_date': (range_end - timedelta(days=1)).date(),
+            'total_time': sum(item['seconds'] for item in app_totals),
+            'app_totals': app_totals,
+            'heatmap': heatmap,
+            'daily_trend': daily_trend,
+        }
+
     def close(self):
         """关闭数据库连接"""
         if self.connection:
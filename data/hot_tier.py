@@ -0,0 +1,460 @@
+"""
+今日数据热层模块
+监控程序把当天的记录写入内存数据库，同进程中对今天的查询直接由内存数据库回答；
+持久数据库只在定期批量刷写时写入一次，查看器读取持久文件时不再与逐条提交争抢。
+每条记录在写入内存的同时追加到重做日志（按会话日志的心跳间隔 fsync），
+进程异常退出后启动时从日志补写，丢失不超过会话日志的心跳窗口
+"""
+import os
+import json
+import zlib
+import inspect
+import functools
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple, Callable
+
+from .database import Database
+from .partitions import month_id_base, month_of
+
+
+# 日志中需要还原为 datetime 的参数
+TIME_ARGUMENTS = ('start_time', 'end_time', 'timestamp', 'hour_start', 'window_start', 'window_end')
+
+# 持久数据库中记录日志补写进度的 derived_watermarks 名称前缀（每天一行）
+WATERMARK_PREFIX = 'hot_tier:'
+
+# 进入内存数据库的表和筛选条件（当天开始之后的数据）
+SEED_TABLES = {
+    'input_minutes': "hour_start >= ?",
+    'hourly_buckets': "bucket_start >= ?",
+}
+AUTOINCREMENT_TABLES = ('window_activities', 'browser_activities', 'input_activities', 'state_changes')
+
+
+def day_start_of(moment: datetime) -> datetime:
+    """时间所在日期的零点"""
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class RedoLog:
+    def __init__(self, path: str, sync_interval: float = 5.0):
+        """
+        初始化重做日志：每条待刷写的记录一行（CRC + JSON），刷写到持久数据库后清空
+        :param path: 日志文件路径
+        :param sync_interval: fsync 的最短间隔（秒），与会话日志心跳间隔相同时断电丢失不超过会话日志的窗口
+        """
+        self.path = path
+        self.sync_interval = sync_interval
+        self.file = open(path, 'a+b')
+        self.last_sync = None
+        self.dirty = False
+
+        # 统计数据
+        self.bytes_written = 0
+        self.syncs = 0
+
+    def read(self) -> Tuple[Optional[str], List[Tuple[int, str, Dict[str, Any]]]]:
+        """
+        读取日志中的全部有效记录（末尾写了一半的行被忽略）
+        :return: (日期, [(序号, 方法名, 参数), ...])
+        """
+        self.file.seek(0)
+        day = None
+        records = []
+        for line in self.file.read().split(b'\n'):
+            crc, _, body = line.partition(b' ')
+            if not body or len(crc) != 8 or int(crc, 16) != zlib.crc32(body):
+                continue
+            item = json.loads(body)
+            if 'day' in item:
+                day = item['day']
+                continue
+            sequence, method, arguments = item['seq'], item['op'], item['args']
+            for name in TIME_ARGUMENTS:
+                if isinstance(arguments.get(name), str):
+                    arguments[name] = datetime.fromisoformat(arguments[name])
+            records.append((sequence, method, arguments))
+        return day, records
+
+    def _append(self, item: Dict[str, Any]):
+        """追加一行并交给操作系统（进程被杀不会丢失），fsync 由 sync() 按间隔执行"""
+        body = json.dumps(item, ensure_ascii=False, default=str).encode('utf-8')
+        line = b'%08x ' % zlib.crc32(body) + body + b'\n'
+        self.file.write(line)
+        self.file.flush()
+        self.bytes_written += len(line)
+        self.dirty = True
+
+    def append(self, sequence: int, method: str, arguments: Dict[str, Any]):
+        """记录一次写入"""
+        self._append({'seq': sequence, 'op': method, 'args': arguments})
+
+    def sync(self, now: datetime, force: bool = False):
+        """距上次 fsync 超过间隔时把日志写入磁盘"""
+        if not self.dirty:
+            return
+        if not force and self.last_sync is not None and (now - self.last_sync).total_seconds() < self.sync_interval:
+            return
+        os.fsync(self.file.fileno())
+        self.last_sync = now
+        self.dirty = False
+        self.syncs += 1
+
+    def reset(self, day: datetime):
+        """刷写完成后清空日志，新日志以所属日期开头"""
+        self.file.truncate(0)
+        self._append({'day': day.date().isoformat()})
+        self.dirty = False
+
+    def close(self):
+        """关闭日志文件"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def _today_or_durable(method: Callable) -> Callable:
+    """
+    查询方法的路由：起始时间在今天之内时由内存数据库回答，
+    否则先把待刷写的记录写入持久数据库，再由持久数据库回答
+    """
+    signature = inspect.signature(method)
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        arguments = signature.bind(self, *args, **kwargs).arguments
+        start = arguments.get('start_date', arguments.get('date'))
+        if start is not None and start >= self.day_start:
+            self.hot_reads += 1
+            return method(self, *args, **kwargs)
+        self.flush()
+        self.durable_reads += 1
+        return getattr(self.durable, name)(*args, **kwargs)
+    return wrapper
+
+
+class HotTierDatabase(Database):
+    """
+    今日数据热层，接口与 Database 相同
+    自身的连接是内存数据库，保存今天（以及跨过零点的会话）的全部记录；写入先进入内存并记入重做日志，
+    每隔 flush_interval 秒或待刷写记录达到 max_pending 条时一次写入持久数据库
+    第一条属于新日期的记录到达时先刷写再轮换：重建内存数据库，并从持久数据库载入新一天已有的记录
+    """
+
+    def __init__(self, durable: Database, log_path: str, flush_interval: float = 60.0,
+                 sync_interval: float = 5.0, max_pending: int = 1000, clock=None):
+        """
+        初始化热层
+        :param durable: 持久数据库（单文件或按月分区）
+        :param log_path: 重做日志路径
+        :param flush_interval: 批量刷写到持久数据库的间隔（秒）
+        :param sync_interval: 重做日志 fsync 的间隔（秒）
+        :param max_pending: 待刷写记录数上限，达到后立即刷写
+        :param clock: 时钟对象，用于判断刷写和 fsync 是否到期，默认使用系统时间
+        """
+        self.durable = durable
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.now = clock.now if clock is not None else datetime.now
+
+        self.pending: List[Tuple[int, str, Dict[str, Any]]] = []
+        self.sequence = 0
+        self.last_flush = self.now()
+        self.day_start = day_start_of(self.last_flush)
+
+        # 统计数据
+        self.flushes = 0
+        self.records_flushed = 0
+        self.rotations = 0
+        self.hot_reads = 0
+        self.durable_reads = 0
+
+        super().__init__(":memory:", durable.title_normalizer, durable.keep_raw_title)
+
+        # 上次异常退出时日志中还没有写入持久数据库的记录
+        self.log = RedoLog(log_path, sync_interval)
+        replayed = self._replay()
+        if replayed:
+            print(f"从重做日志补写 {replayed} 条记录")
+        # 同一天重启时序号从当天的补写进度继续，否则新记录的序号不大于补写进度，再次崩溃后重放会跳过它们
+        self.sequence = self._applied(self.day_start)
+        self.log.reset(self.day_start)
+        self._seed()
+
+    def _applied(self, day: datetime) -> int:
+        """某天的日志已经补写到持久数据库的序号（只读查找，进度保存在当天所在的文件中）"""
+        source = self.durable.partition_for(day)
+        return source._get_watermark(WATERMARK_PREFIX + day.date().isoformat()) if source is not None else 0
+
+    def _replay(self) -> int:
+        """把日志中序号大于补写进度的记录写入持久数据库"""
+        day, records = self.log.read()
+        if day is None or not records:
+            return 0
+
+        return self._apply(records, datetime.fromisoformat(day))
+
+    def _apply(self, records: List[Tuple[int, str, Dict[str, Any]]], day: datetime) -> int:
+        """
+        把一批记录写入持久数据库，每个文件的补写进度与写入它的记录在同一个事务中提交
+        按月分区时一批记录可能落到多个文件（跨月的会话、上个月最后一小时的输入计数），
+        每个文件只写入序号大于自己进度的部分，任意时刻崩溃后重放都不会重复或遗漏；
+        当天所在的文件最后提交，它的进度是重启后序号的起点
+        :return: 实际写入的记录数
+        """
+        if not records:
+            return 0
+        name = WATERMARK_PREFIX + day.date().isoformat()
+        home = self.durable.partition_for_insert(day)
+        writes: Dict[Database, List[Tuple[int, str, Dict[str, Any]]]] = {home: []}
+        for sequence, method, arguments in records:
+            for target, piece in self.durable.route(method, arguments):
+                writes.setdefault(target, []).append((sequence, method, piece))
+
+        applied = set()
+        for target in sorted(writes, key=lambda db: db is home):
+            watermark = target._get_watermark(name)
+            for sequence, method, piece in writes[target]:
+                if sequence > watermark:
+                    getattr(target, method)(**piece, commit=False)
+                    applied.add(sequence)
+            target._set_watermark(name, max(watermark, records[-1][0]))
+            target.commit()
+        return len(applied)
+
+    def _seed(self):
+        """从持久数据库载入当天已有的记录（启动和轮换时），内存中的自增id从持久数据库的序号继续"""
+        source = self.durable.partition_for(self.day_start)
+        if source is None:
+            # 按月分区且本月还没有数据：没有可载入的记录，自增id从本月分区的起点开始（不为此创建文件）
+            self.connection.executemany("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)",
+                                        [(table, month_id_base(month_of(self.day_start)))
+                                         for table in AUTOINCREMENT_TABLES])
+            self.connection.commit()
+            return
+
+        source.commit()
+        self.connection.execute("ATTACH DATABASE ? AS durable", (source.db_path,))
+        try:
+            filters = {table: source._overlap_filter(table, self.day_start, None)
+                       for table in ('window_activities', 'browser_activities')}
+            filters['state_changes'] = (
+                # 当天之前的最后一条状态决定零点时是否空闲
+                " AND (timestamp >= ? OR id = (SELECT id FROM durable.state_changes"
+                " WHERE timestamp < ? ORDER BY timestamp DESC LIMIT 1))", [self.day_start, self.day_start])
+            for table, condition in SEED_TABLES.items():
+                filters[table] = (" AND " + condition, [self.day_start])
+
+            for table, (where, params) in filters.items():
+                columns = ", ".join(row['name'] for row in
+                                    self.connection.execute(f"PRAGMA main.table_info({table})").fetchall())
+                self.connection.execute(f'''
+                    INSERT INTO main.{table} ({columns})
+                    SELECT {columns} FROM durable.{table} WHERE 1=1{where}
+                ''', params)
+
+            self.connection.execute("DELETE FROM main.sqlite_sequence")
+            self.connection.execute(f'''
+                INSERT INTO main.sqlite_sequence (name, seq)
+                SELECT name, seq FROM durable.sqlite_sequence
+                WHERE name IN ({", ".join("?" for _ in AUTOINCREMENT_TABLES)})
+            ''', AUTOINCREMENT_TABLES)
+            self.connection.commit()
+        finally:
+            self.connection.execute("DETACH DATABASE durable")
+
+    # ---- 写入：进入内存数据库和重做日志 ----
+
+    def _record(self, moment: datetime, method: str, arguments: Dict[str, Any]):
+        """记录属于新日期时先轮换，然后记入重做日志和待刷写列表"""
+        if moment >= self.day_start + timedelta(days=1):
+            self.rotate(day_start_of(moment))
+        self.sequence += 1
+        self.log.append(self.sequence, method, arguments)
+        self.pending.append((self.sequence, method, arguments))
+
+    def insert_window_activity(self, process_name: str, window_title: str,
+                               start_time: datetime, end_time: datetime, duration: float,
+                               keystrokes: int = 0, clicks: int = 0, commit: bool = True):
+        """插入窗口活动记录"""
+        arguments = dict(process_name=process_name, window_title=window_title, start_time=start_time,
+                         end_time=end_time, duration=duration, keystrokes=keystrokes, clicks=clicks)
+        self._record(end_time, 'insert_window_activity', arguments)
+        super().insert_window_activity(**arguments, commit=False)
+        if commit:
+            self.commit()
+
+    def insert_browser_activity(self, browser_name: str, page_title: str, page_url: str,
+                                start_time: datetime, end_time: Optional[datetime] = None,
+                                duration: Optional[float] = None, commit: bool = True):
+        """插入浏览器活动记录"""
+        arguments = dict(browser_name=browser_name, page_title=page_title, page_url=page_url,
+                         start_time=start_time, end_time=end_time, duration=duration)
+        self._record(end_time or start_time, 'insert_browser_activity', arguments)
+        super().insert_browser_activity(**arguments, commit=False)
+        if commit:
+            self.commit()
+
+    def insert_input_activity(self, activity_type: str, event_count: int, frequency: float,
+                              window_start: datetime, window_end: datetime):
+        """插入输入活动记录（直接写入持久数据库，没有提交参数）"""
+        self.durable.insert_input_activity(activity_type, event_count, frequency, window_start, window_end)
+
+    def upsert_input_minutes(self, hour_start: datetime, activity_type: str, counts,
+                             commit: bool = True):
+        """写入一小时的分钟计数（日志中记录本次增量，刷写时与持久数据库中的计数相加）"""
+        arguments = dict(hour_start=hour_start, activity_type=activity_type, counts=list(counts))
+        self._record(hour_start, 'upsert_input_minutes', arguments)
+        super().upsert_input_minutes(**arguments, commit=False)
+        if commit:
+            self.commit()
+
+    def insert_state_change(self, state_type: str, timestamp: datetime, idle_duration: Optional[float] = None,
+                            commit: bool = True):
+        """插入状态变化记录"""
+        arguments = dict(state_type=state_type, timestamp=timestamp, idle_duration=idle_duration)
+        self._record(timestamp, 'insert_state_change', arguments)
+        super().insert_state_change(**arguments, commit=False)
+        if commit:
+            self.commit()
+
+    def commit(self):
+        """提交内存数据库；重做日志和持久数据库分别在各自的间隔到期时写入"""
+        self.connection.commit()
+        now = self.now()
+        self.log.sync(now)
+        if len(self.pending) >= self.max_pending or \
+                (now - self.last_flush).total_seconds() >= self.flush_interval:
+            self.flush()
+
+    def flush_if_due(self):
+        """长时间没有写入时由监控循环定期调用，使查看器读到的持久数据库不落后超过刷写间隔"""
+        if self.pending and (self.now() - self.last_flush).total_seconds() >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """把待刷写的记录一次写入持久数据库，然后清空重做日志"""
+        self.last_flush = self.now()
+        if not self.pending:
+            return
+        self._apply(self.pending, self.day_start)
+        self.flushes += 1
+        self.records_flushed += len(self.pending)
+        self.pending = []
+        self.log.reset(self.day_start)
+
+    def rotate(self, day_start: datetime):
+        """零点轮换：刷写后重建内存数据库，载入新一天已有的记录"""
+        self.flush()
+        self.connection.close()
+        self.day_start = day_start
+        self.sequence = max(self.sequence, self._applied(self.day_start))
+        self.init_database()
+        self._seed()
+        self.log.reset(self.day_start)
+        self.rotations += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """热层统计"""
+        return {
+            'pending': len(self.pending),
+            'flushes': self.flushes,
+            'records_flushed': self.records_flushed,
+            'rotations': self.rotations,
+            'log_bytes': self.log.bytes_written,
+            'log_syncs': self.log.syncs,
+            'hot_reads': self.hot_reads,
+            'durable_reads': self.durable_reads,
+        }
+
+    # ---- 查询：今天由内存数据库回答，其余由持久数据库回答 ----
+
+    get_window_activities = _today_or_durable(Database.get_window_activities)
+    get_window_activities_page = _today_or_durable(Database.get_window_activities_page)
+    count_window_activities = _today_or_durable(Database.count_window_activities)
+    get_process_names = _today_or_durable(Database.get_process_names)
+    get_browser_activities = _today_or_durable(Database.get_browser_activities)
+    get_input_minutes = _today_or_durable(Database.get_input_minutes)
+    read_columns = _today_or_durable(Database.read_columns)
+    get_range_watermark = _today_or_durable(Database.get_range_watermark)
+    search_activities = _today_or_durable(Database.search_activities)
+    get_active_time_by_app = _today_or_durable(Database.get_active_time_by_app)
+    get_app_input_intensity = _today_or_durable(Database.get_app_input_intensity)
+    get_hourly_buckets = _today_or_durable(Database.get_hourly_buckets)
+    get_range_report = _today_or_durable(Database.get_range_report)
+    get_daily_summary = _today_or_durable(Database.get_daily_summary)
+    get_active_segments = _today_or_durable(Database.get_active_segments)
+    get_idle_periods = _today_or_durable(Database.get_idle_periods)
+
+    def get_max_id(self, table: str) -> int:
+        """最大id（内存中的自增序号从持久数据库继续）"""
+        return max(super().get_max_id(table), self.durable.get_max_id(table))
+
+    def get_app_statistics(self, limit: int = 10) -> List[Dict]:
+        """应用统计包含全部历史，由持久数据库回答"""
+        self.flush()
+        return self.durable.get_app_statistics(limit)
+
+    def rebuild_app_statistics(self):
+        self.flush()
+        self.durable.rebuild_app_statistics()
+
+    def rebuild_hourly_buckets(self):
+        self.flush()
+        self.durable.rebuild_hourly_buckets()
+
+    def partition_for(self, moment: datetime) -> Optional[Database]:
+        """今天的数据在内存数据库中，更早的在持久数据库中"""
+        if moment >= self.day_start:
+            return self
+        return self.durable.partition_for(moment)
+
+    def partition_for_insert(self, moment: datetime) -> Database:
+        if moment >= self.day_start:
+            return self
+        return self.durable.partition_for_insert(moment)
+
+    def partitions(self) -> List[Database]:
+        return [self] + self.durable.partitions()
+
+    def close(self):
+        """刷写全部记录后关闭内存数据库、日志和持久数据库"""
+        if getattr(self, 'log', None) is None:
+            return
+        self.flush()
+        self.log.close()
+        self.log = None
+        super().close()
+        self.durable.close()
+
+
+# 测试代码
+if __name__ == "__main__":
+    import tempfile
+
+    work_dir = tempfile.mkdtemp()
+    db_path = os.path.join(work_dir, "focus_insight.db")
+    log_path = os.path.join(work_dir, "hot_tier.log")
+    durable = Database(db_path)
+    db = HotTierDatabase(durable, log_path)
+    now = datetime.now().replace(microsecond=0)
+    db.insert_window_activity("code.exe", "hot_tier.py", now - timedelta(minutes=5), now, 300.0, keystrokes=120)
+    print(f"今天: {db.count_window_activities(db.day_start)} 条（持久数据库 {durable.count_window_activities()} 条）")
+    db.flush()
+    print(f"刷写后持久数据库 {durable.count_window_activities()} 条, {db.metrics()}")
+    db.close()
+
+    # 同一天重启后写入一条记录，未刷写就崩溃：下次启动时应从日志补写
+    durable = Database(db_path)
+    db = HotTierDatabase(durable, log_path)
+    db.insert_window_activity("code.exe", "重启后", now, now + timedelta(minutes=1), 60.0)
+    db.log.sync(db.now(), force=True)
+    db.log.close()
+    db.log = None
+    durable.close()
+
+    durable = Database(db_path)
+    db = HotTierDatabase(durable, log_path)
+    print(f"重启后崩溃再启动，持久数据库 {durable.count_window_activities()} 条（应为2条）")
+    db.close()
@@ -0,0 +1,152 @@
+"""
+时间区间运算模块
+把窗口会话与空闲区间合并为真实的活跃时间线，计算空闲间隔和专注连续段
+所有函数都要求输入按开始时间排序，只做一次线性扫描
+"""
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+
+
+def to_datetime(value) -> Optional[datetime]:
+    """把数据库中读出的时间值转换为datetime"""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def merge_intervals(intervals: Iterable[Tuple[datetime, datetime]]) -> List[Tuple[datetime, datetime]]:
+    """合并重叠或相接的区间（输入需按开始时间排序）"""
+    merged = []
+    for start, end in intervals:
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def build_idle_intervals(state_rows: List[Dict[str, Any]],
+                         until: Optional[datetime] = None) -> List[Tuple[datetime, datetime]]:
+    """
+    根据状态变化记录构造空闲区间
+    idle记录的时间戳是阈值触发的时刻，真正的空闲起点是 timestamp - idle_duration；
+    空闲区间在下一条状态记录处结束，没有后续记录时截止到 until
+    :param state_rows: 按时间排序的状态变化记录
+    :param until: 未结束空闲区间的截止时间
+    """
+    intervals = []
+    open_start = None
+
+    for row in state_rows:
+        timestamp = to_datetime(row['timestamp'])
+        if open_start is not None:
+            intervals.append((open_start, timestamp))
+            open_start = None
+
+        if row['state_type'] == 'idle':
+            open_start = timestamp - timedelta(seconds=row['idle_duration'] or 0)
+
+    if open_start is not None and until is not None and until > open_start:
+        intervals.append((open_start, until))
+
+    return merge_intervals(sorted(intervals))
+
+
+def sweep_active_segments(sessions: List[Dict[str, Any]],
+                          idle_intervals: List[Tuple[datetime, datetime]]) -> List[Dict[str, Any]]:
+    """
+    从窗口会话中扣除空闲区间，得到真实的活跃片段
+    会话和空闲区间都按开始时间排序，两个指针同步前进
+    :param sessions: 窗口会话（需包含 id、process_name、start_time、end_time）
+    :param idle_intervals: 已合并的空闲区间
+    :return: 活跃片段列表
+    """
+    segments = []
+    first_idle = 0
+
+    for session in sessions:
+        start = to_datetime(session['start_time'])
+        end = to_datetime(session['end_time'])
+
+        # 跳过已经完全在当前会话之前结束的空闲区间
+        while first_idle < len(idle_intervals) and idle_intervals[first_idle][1] <= start:
+            first_idle += 1
+
+        cursor = start
+        index = first_idle
+        while index < len(idle_intervals) and idle_intervals[index][0] < end:
+            idle_start, idle_end = idle_intervals[index]
+            if idle_start > cursor:
+                segments.append(_segment(session, cursor, idle_start))
+            cursor = max(cursor, idle_end)
+            index += 1
+
+        if cursor < end:
+            segments.append(_segment(session, cursor, end))
+
+    return segments
+
+
+def _segment(session: Dict[str, Any], start: datetime, end: datetime) -> Dict[str, Any]:
+    """构造一个活跃片段"""
+    return {
+        'window_id': session.get('id'),
+        'process_name': session['process_name'],
+        'start_time': start,
+        'end_time': end,
+        'duration': (end - start).total_seconds(),
+    }
+
+
+def find_focus_streaks(segments: List[Dict[str, Any]], gap_tolerance: float = 60.0,
+                       min_duration: float = 300.0) -> List[Dict[str, Any]]:
+    """
+    查找专注连续段：同一应用的活跃片段之间间隔不超过 gap_tolerance 秒即视为连续
+    :param segments: 按开始时间排序的活跃片段
+    :param gap_tolerance: 允许的最大间隔（秒），短暂切到其他应用不打断连续段
+    :param min_duration: 连续段的最短活跃时长（秒）
+    """
+    streaks = []
+    current = None
+
+    for segment in segments:
+        start = to_datetime(segment['start_time'])
+        end = to_datetime(segment['end_time'])
+
+        if (current is not None and segment['process_name'] == current['process_name']
+                and (start - current['end_time']).total_seconds() <= gap_tolerance):
+            current['end_time'] = max(current['end_time'], end)
+            current['active_time'] += segment['duration']
+            continue
+
+        if current is not None and (start - current['end_time']).total_seconds() <= gap_tolerance:
+            # 短暂切换到其他应用：只要间隔仍在容忍范围内，等待原应用回来
+            if segment['duration'] <= gap_tolerance:
+                continue
+
+        if current is not None and current['active_time'] >= min_duration:
+            streaks.append(current)
+        current = {
+            'process_name': segment['process_name'],
+            'start_time': start,
+            'end_time': end,
+            'active_time': segment['duration'],
+        }
+
+    if current is not None and current['active_time'] >= min_duration:
+        streaks.append(current)
+
+    return streaks
+
+
+def clip_interval(start: datetime, end: datetime, range_start: datetime,
+                  range_end: datetime) -> Optional[Tuple[datetime, datetime]]:
+    """把区间裁剪到 [range_start, range_end)，没有交集时返回None"""
+    start = max(start, range_start)
+    end = min(end, range_end)
+    if end <= start:
+        return None
+    return start, end
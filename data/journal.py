@@ -0,0 +1,151 @@
+"""
+会话日志模块
+用内存映射的小文件记录当前未结束的窗口会话，进程被杀或断电后可在下次启动时恢复
+"""
+import os
+import mmap
+import struct
+import zlib
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+
+JOURNAL_MAGIC = b'FIJ1'
+HEADER = struct.Struct('<4sI')            # 魔数, 槽位数量
+SLOT_SIZE = 512
+RECORD = struct.Struct('<QBddHH')         # 序号, 类型, 会话开始, 心跳时间, 进程名长度, 标题长度
+CRC = struct.Struct('<I')
+MAX_TEXT = SLOT_SIZE - RECORD.size - CRC.size
+
+KIND_OPEN = 1      # 会话进行中（心跳）
+KIND_CLOSED = 2    # 会话已写入数据库
+
+
+class SessionJournal:
+    def __init__(self, path: str, slot_count: int = 64):
+        """
+        初始化会话日志
+        :param path: 日志文件路径
+        :param slot_count: 环形槽位数量，新记录依次覆盖最旧的槽位
+        """
+        self.path = path
+        self.slot_count = slot_count
+        self.sequence = 0
+
+        size = HEADER.size + slot_count * SLOT_SIZE
+        exists = os.path.exists(path) and os.path.getsize(path) == size
+
+        self.file = open(path, 'r+b' if exists else 'w+b')
+        if not exists:
+            self.file.truncate(size)
+        self.mm = mmap.mmap(self.file.fileno(), size)
+
+        if exists and self.mm[:4] == JOURNAL_MAGIC:
+            latest = self._read_latest()
+            self.sequence = latest['sequence'] if latest else 0
+        else:
+            self.mm[:HEADER.size] = HEADER.pack(JOURNAL_MAGIC, slot_count)
+            self.mm.flush()
+
+    def _write(self, kind: int, process_name: str, window_title: str,
+               start_time: datetime, heartbeat: datetime):
+        """追加一条记录到下一个槽位"""
+        process_bytes = process_name.encode('utf-8')[:MAX_TEXT // 4]
+        title_bytes = window_title.encode('utf-8')[:MAX_TEXT - len(process_bytes)]
+
+        self.sequence += 1
+        body = RECORD.pack(self.sequence, kind, start_time.timestamp(), heartbeat.timestamp(),
+                           len(process_bytes), len(title_bytes)) + process_bytes + title_bytes
+        record = body + CRC.pack(zlib.crc32(body))
+
+        offset = HEADER.size + (self.sequence % self.slot_count) * SLOT_SIZE
+        self.mm[offset:offset + len(record)] = record
+        self.mm.flush()
+
+    def checkpoint(self, process_name: str, window_title: str, start_time: datetime,
+                   now: Optional[datetime] = None):
+        """记录当前会话的心跳"""
+        self._write(KIND_OPEN, process_name, window_title, start_time, now or datetime.now())
+
+    def mark_closed(self, process_name: str = "", window_title: str = "",
+                    start_time: Optional[datetime] = None):
+        """标记会话已经写入数据库，恢复时不再处理"""
+        now = datetime.now()
+        self._write(KIND_CLOSED, process_name, window_title, start_time or now, now)
+
+    def _read_slot(self, index: int) -> Optional[Dict[str, Any]]:
+        """读取并校验一个槽位，损坏或为空时返回None"""
+        offset = HEADER.size + index * SLOT_SIZE
+        sequence, kind, start_ts, heartbeat_ts, process_len, title_len = \
+            RECORD.unpack_from(self.mm, offset)
+        if sequence == 0 or kind not in (KIND_OPEN, KIND_CLOSED):
+            return None
+
+        body_len = RECORD.size + process_len + title_len
+        if body_len > SLOT_SIZE - CRC.size:
+            return None
+
+        body = self.mm[offset:offset + body_len]
+        (crc,) = CRC.unpack_from(self.mm, offset + body_len)
+        if zlib.crc32(body) != crc:
+            return None
+
+        text = body[RECORD.size:]
+        return {
+            'sequence': sequence,
+            'kind': kind,
+            'process_name': text[:process_len].decode('utf-8', errors='replace'),
+            'window_title': text[process_len:].decode('utf-8', errors='replace'),
+            'start_time': datetime.fromtimestamp(start_ts),
+            'end_time': datetime.fromtimestamp(heartbeat_ts),
+        }
+
+    def _read_latest(self) -> Optional[Dict[str, Any]]:
+        """找到序号最大的有效记录"""
+        latest = None
+        for index in range(self.slot_count):
+            record = self._read_slot(index)
+            if record and (latest is None or record['sequence'] > latest['sequence']):
+                latest = record
+        return latest
+
+    def recover(self) -> Optional[Dict[str, Any]]:
+        """
+        查找上次运行时未正常结束的会话
+        :return: 会话信息（end_time为最后一次心跳），没有悬空会话时返回None
+        """
+        latest = self._read_latest()
+        if latest is None or latest['kind'] != KIND_OPEN:
+            return None
+        if latest['end_time'] <= latest['start_time']:
+            return None
+        return latest
+
+    def recover_all(self) -> List[Dict[str, Any]]:
+        """
+        查找环形日志中所有在最后一次关闭标记之后出现过心跳的会话
+        不只是最新的会话：已结束会话的记录可能还排在事件总线里没写入数据库，
+        日志里却已经是下一个会话的心跳（调用方需要按数据库去重）
+        :return: 按开始时间排序的会话（end_time为各自最后一次心跳）
+        """
+        records = [record for record in map(self._read_slot, range(self.slot_count)) if record]
+        records.sort(key=lambda record: record['sequence'])
+
+        sessions: Dict[Any, Dict[str, Any]] = {}
+        for record in records:
+            if record['kind'] == KIND_CLOSED:
+                sessions.clear()
+            else:
+                sessions[(record['process_name'], record['start_time'])] = record
+
+        return sorted((session for session in sessions.values() if session['end_time'] > session['start_time']),
+                      key=lambda session: session['start_time'])
+
+    def close(self):
+        """关闭日志文件"""
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
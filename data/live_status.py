@@ -0,0 +1,234 @@
+"""
+实时状态模块
+监控程序把当前状态（前台应用和标题、会话开始时间、实时输入频率、是否空闲）写入一个固定布局的内存映射文件，
+查看器每次刷新直接读取，不需要查询数据库
+单写多读，用顺序锁（seqlock）保证读到的是完整的一次写入：写入前后各把序号加1，
+读者看到奇数序号或前后序号不一致时重读
+"""
+import os
+import mmap
+import struct
+import time
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+
+STATUS_MAGIC = b'FIS1'
+HEADER = struct.Struct('<4sI')            # 魔数, 文件大小
+SEQUENCE = struct.Struct('<Q')            # 顺序锁序号，奇数表示正在写入
+BODY = struct.Struct('<dddffIBHH')        # 会话开始, 更新时间, 最后输入时间, 键盘频率, 鼠标频率, 进程ID, 标志, 进程名长度, 标题长度
+STATUS_SIZE = 1024
+SEQUENCE_OFFSET = HEADER.size
+BODY_OFFSET = SEQUENCE_OFFSET + SEQUENCE.size
+MAX_TEXT = STATUS_SIZE - BODY_OFFSET - BODY.size
+
+FLAG_RUNNING = 1     # 监控程序正在运行
+FLAG_SESSION = 2     # 有进行中的窗口会话
+FLAG_IDLE = 4        # 用户空闲
+FLAG_COUNTING = 8    # 安装了键鼠钩子，输入频率有效
+
+# 读者连续遇到正在写入的次数上限（写入只需几微秒，超过说明写入方中途退出）
+MAX_READ_RETRIES = 100
+
+
+class LiveStatusWriter:
+    def __init__(self, path: str):
+        """
+        初始化实时状态写入方（监控程序）
+        :param path: 状态文件路径
+        """
+        self.path = path
+        self.sequence = 0
+
+        exists = os.path.exists(path) and os.path.getsize(path) == STATUS_SIZE
+        self.file = open(path, 'r+b' if exists else 'w+b')
+        if not exists:
+            self.file.truncate(STATUS_SIZE)
+        self.mm = mmap.mmap(self.file.fileno(), STATUS_SIZE)
+
+        if exists and self.mm[:4] == STATUS_MAGIC:
+            (sequence,) = SEQUENCE.unpack_from(self.mm, SEQUENCE_OFFSET)
+            # 上次写入方中途退出时序号停在奇数，从下一个偶数继续
+            self.sequence = sequence + (sequence & 1)
+        else:
+            self.mm[:HEADER.size] = HEADER.pack(STATUS_MAGIC, STATUS_SIZE)
+
+    def publish(self, process_name: Optional[str], window_title: Optional[str],
+                session_start: Optional[datetime], keyboard_rate: float = 0.0, mouse_rate: float = 0.0,
+                is_idle: bool = False, last_activity: Optional[datetime] = None,
+                counting: bool = True, now: Optional[datetime] = None):
+        """
+        写入当前状态（只写共享内存页，不刷盘）
+        :param process_name: 前台进程名，没有前台窗口时为None
+        :param session_start: 当前窗口会话的开始时间
+        :param keyboard_rate: 每分钟按键次数
+        :param mouse_rate: 每分钟点击次数
+        :param last_activity: 最后一次输入的时间
+        :param counting: 输入频率是否有效（不使用钩子时没有计数）
+        """
+        now = now or datetime.now()
+        flags = FLAG_RUNNING
+        if process_name is not None and session_start is not None:
+            flags |= FLAG_SESSION
+        if is_idle:
+            flags |= FLAG_IDLE
+        if counting:
+            flags |= FLAG_COUNTING
+
+        process_bytes = (process_name or "").encode('utf-8')[:MAX_TEXT // 4]
+        title_bytes = (window_title or "").encode('utf-8')[:MAX_TEXT - len(process_bytes)]
+        body = BODY.pack(session_start.timestamp() if session_start else 0.0, now.timestamp(),
+                         last_activity.timestamp() if last_activity else 0.0,
+                         keyboard_rate, mouse_rate, os.getpid(), flags,
+                         len(process_bytes), len(title_bytes)) + process_bytes + title_bytes
+        self._write(body)
+
+    def _write(self, body: bytes):
+        """顺序锁写入：序号变为奇数 -> 写内容 -> 序号变为偶数"""
+        self.sequence += 1
+        SEQUENCE.pack_into(self.mm, SEQUENCE_OFFSET, self.sequence)
+        self.mm[BODY_OFFSET:BODY_OFFSET + len(body)] = body
+        self.sequence += 1
+        SEQUENCE.pack_into(self.mm, SEQUENCE_OFFSET, self.sequence)
+
+    def close(self):
+        """标记监控程序已停止并关闭状态文件"""
+        if self.mm is not None:
+            self._write(BODY.pack(0.0, time.time(), 0.0, 0.0, 0.0, os.getpid(), 0, 0, 0))
+            self.mm.close()
+            self.mm = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class LiveStatusReader:
+    def __init__(self, path: str, stale_after: float = 10.0):
+        """
+        初始化实时状态读取方（查看器）
+        :param path: 状态文件路径，监控程序还没启动时文件可能不存在，读取时再打开
+        :param stale_after: 超过该秒数没有更新视为监控程序已退出
+        """
+        self.path = path
+        self.stale_after = stale_after
+        self.file = None
+        self.mm = None
+
+        # 统计数据
+        self.reads = 0
+        self.retries = 0
+
+    def _open(self) -> bool:
+        """打开并映射状态文件（只读）"""
+        if self.mm is not None:
+            return True
+        if not os.path.exists(self.path) or os.path.getsize(self.path) != STATUS_SIZE:
+            return False
+        self.file = open(self.path, 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), STATUS_SIZE, access=mmap.ACCESS_READ)
+        if self.mm[:4] != STATUS_MAGIC:
+            self.close()
+            return False
+        return True
+
+    def read_raw(self) -> Optional[Dict[str, Any]]:
+        """
+        读取一次完整的状态（不判断是否过期）
+        :return: 状态字典，文件不存在或写入方一直处于写入中时返回None
+        """
+        if not self._open():
+            return None
+
+        mm = self.mm
+        for _ in range(MAX_READ_RETRIES):
+            (before,) = SEQUENCE.unpack_from(mm, SEQUENCE_OFFSET)
+            if not before & 1:
+                data = mm[BODY_OFFSET:STATUS_SIZE]
+                (after,) = SEQUENCE.unpack_from(mm, SEQUENCE_OFFSET)
+                if before == after:
+                    self.reads += 1
+                    return self._parse(data, before)
+            # 写入方正在写：让出时间片后重读
+            self.retries += 1
+            time.sleep(0)
+        return None
+
+    @staticmethod
+    def _parse(data: bytes, sequence: int) -> Dict[str, Any]:
+        """解析状态内容"""
+        (session_ts, updated_ts, activity_ts, keyboard_rate, mouse_rate, pid, flags,
+         process_len, title_len) = BODY.unpack_from(data)
+        text = data[BODY.size:BODY.size + process_len + title_len]
+        has_session = bool(flags & FLAG_SESSION)
+        return {
+            'sequence': sequence,
+            'running': bool(flags & FLAG_RUNNING),
+            'pid': pid,
+            'process_name': text[:process_len].decode('utf-8', errors='replace') if has_session else None,
+            'window_title': text[process_len:].decode('utf-8', errors='replace') if has_session else None,
+            'session_start': datetime.fromtimestamp(session_ts) if has_session else None,
+            'updated_at': datetime.fromtimestamp(updated_ts) if updated_ts else None,
+            'last_activity': datetime.fromtimestamp(activity_ts) if activity_ts else None,
+            'keyboard_rate': keyboard_rate,
+            'mouse_rate': mouse_rate,
+            'is_idle': bool(flags & FLAG_IDLE),
+            'counting': bool(flags & FLAG_COUNTING),
+        }
+
+    def read(self, now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """
+        读取监控程序的实时状态
+        :return: 状态字典；监控程序没有运行或状态已过期时返回None
+        """
+        status = self.read_raw()
+        if status is None or not status['running'] or status['updated_at'] is None:
+            return None
+        now = now or datetime.now()
+        if (now - status['updated_at']).total_seconds() > self.stale_after:
+            return None
+        return status
+
+    def close(self):
+        """关闭状态文件"""
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def open_session_record(status: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    把实时状态中进行中的窗口会话转换为与数据库记录相同字段的字典（结束时间为最后更新时间），用于绘制时间轴
+    没有进行中的会话时返回None
+    """
+    if status is None or status['session_start'] is None:
+        return None
+    end_time = max(status['updated_at'], status['session_start'])
+    return {
+        'process_name': status['process_name'],
+        'window_title': status['window_title'],
+        'start_time': status['session_start'],
+        'end_time': end_time,
+        'duration': (end_time - status['session_start']).total_seconds(),
+    }
+
+
+# 测试代码
+if __name__ == "__main__":
+    import tempfile
+    from datetime import timedelta
+
+    status_path = os.path.join(tempfile.mkdtemp(), "live.status")
+    writer = LiveStatusWriter(status_path)
+    reader = LiveStatusReader(status_path)
+
+    writer.publish("code.exe", "live_status.py - Focus-Insight", datetime.now() - timedelta(minutes=5),
+                   keyboard_rate=42.0, mouse_rate=6.0)
+    print(reader.read())
+    print(open_session_record(reader.read()))
+
+    writer.close()
+    print(f"停止后: {reader.read()}")
+    reader.close()
@@ -0,0 +1,282 @@
+"""
+数据库维护模块
+在用户空闲时分片执行重量级维护：清理空的聚合行、增量回收空闲页、更新查询规划统计、WAL检查点。
+每个任务拆成小步执行并有单次时间预算，用户恢复活动后立即停下（正在执行的语句通过进度回调中断并回滚），
+下次空闲时从中断处继续，维护不会与交互使用争抢数据库
+"""
+import time
+import sqlite3
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional
+
+
+# PRAGMA auto_vacuum 的取值
+AUTO_VACUUM_INCREMENTAL = 2
+
+# 进度回调的调用间隔（SQLite虚拟机指令数）
+PROGRESS_STEPS = 1000
+
+
+class MaintenanceJob:
+    """维护任务基类：step() 每次执行一小步，返回本轮是否完成"""
+    name = 'job'
+
+    def __init__(self, period: float, budget: float):
+        """
+        初始化维护任务
+        :param period: 两轮之间的最短间隔（秒）
+        :param budget: 每次空闲分片中本任务最多执行的秒数
+        """
+        self.period = period
+        self.budget = budget
+        self.last_completed = None
+
+        # 统计数据
+        self.rounds = 0
+        self.steps = 0
+        self.seconds = 0.0
+        self.interrupted = 0
+
+    def due(self, now) -> bool:
+        """本轮是否需要执行"""
+        return self.last_completed is None or (now - self.last_completed).total_seconds() >= self.period
+
+    def step(self, connection: sqlite3.Connection) -> bool:
+        """执行一小步，返回本轮是否完成"""
+        raise NotImplementedError
+
+    def step_budget(self, connection: sqlite3.Connection) -> float:
+        """本次分片的时间预算"""
+        return self.budget
+
+    def reset(self):
+        """本轮完成后清除进度"""
+
+    def metrics(self) -> Dict[str, Any]:
+        """任务统计"""
+        return {
+            'rounds': self.rounds,
+            'steps': self.steps,
+            'seconds': self.seconds,
+            'interrupted': self.interrupted,
+            'last_completed': self.last_completed,
+        }
+
+
+class CompactRollupsJob(MaintenanceJob):
+    """删除聚合表中没有内容的行（时长和输入计数都为0的小时桶、全为0的每分钟计数）"""
+    name = 'compact_rollups'
+
+    def __init__(self, period: float = 3600, budget: float = 0.5, chunk_rows: int = 500):
+        super().__init__(period, budget)
+        self.chunk_rows = chunk_rows
+
+    def step(self, connection: sqlite3.Connection) -> bool:
+        cursor = connection.cursor()
+        cursor.execute('''
+            DELETE FROM hourly_buckets WHERE rowid IN (
+                SELECT rowid FROM hourly_buckets
+                WHERE seconds <= 0 AND keystrokes = 0 AND clicks = 0 LIMIT ?)
+        ''', (self.chunk_rows,))
+        deleted = cursor.rowcount
+        cursor.execute('''
+            DELETE FROM input_minutes WHERE rowid IN (
+                SELECT rowid FROM input_minutes WHERE counts = zeroblob(120) LIMIT ?)
+        ''', (self.chunk_rows,))
+        deleted += cursor.rowcount
+        connection.commit()
+        return deleted == 0
+
+
+class IncrementalVacuumJob(MaintenanceJob):
+    """
+    分块回收空闲页，数据库文件随删除的数据缩小
+    旧数据库没有开启增量回收时，空闲页足够多才做一次完整 VACUUM 转换（预算更长，用户回来时中断）
+    """
+    name = 'incremental_vacuum'
+
+    def __init__(self, period: float = 3600, budget: float = 0.5, chunk_pages: int = 256,
+                 convert_budget: float = 30.0, convert_free_ratio: float = 0.1):
+        """
+        :param chunk_pages: 每步回收的页数
+        :param convert_budget: 转换为增量回收模式（完整VACUUM）的时间预算
+        :param convert_free_ratio: 空闲页占比超过该值时才转换
+        """
+        super().__init__(period, budget)
+        self.chunk_pages = chunk_pages
+        self.convert_budget = convert_budget
+        self.convert_free_ratio = convert_free_ratio
+
+    @staticmethod
+    def _pragma(connection: sqlite3.Connection, name: str) -> int:
+        return connection.execute(f"PRAGMA {name}").fetchone()[0]
+
+    def step(self, connection: sqlite3.Connection) -> bool:
+        free_pages = self._pragma(connection, 'freelist_count')
+        if free_pages == 0:
+            return True
+
+        if self._pragma(connection, 'auto_vacuum') != AUTO_VACUUM_INCREMENTAL:
+            if free_pages < self._pragma(connection, 'page_count') * self.convert_free_ratio:
+                return True
+            # VACUUM 之后 auto_vacuum 设置才生效，同时回收全部空闲页
+            connection.execute(f"PRAGMA auto_vacuum={AUTO_VACUUM_INCREMENTAL}")
+            connection.execute("VACUUM")
+            return True
+
+        connection.execute(f"PRAGMA incremental_vacuum({self.chunk_pages})").fetchall()
+        return self._pragma(connection, 'freelist_count') == 0
+
+    def step_budget(self, connection: sqlite3.Connection) -> float:
+        """转换模式需要完整VACUUM，使用更长的预算"""
+        if self._pragma(connection, 'auto_vacuum') != AUTO_VACUUM_INCREMENTAL:
+            return max(self.budget, self.convert_budget)
+        return self.budget
+
+
+class OptimizeJob(MaintenanceJob):
+    """逐表更新查询规划统计（ANALYZE 有采样上限），最后执行 PRAGMA optimize"""
+    name = 'optimize'
+
+    def __init__(self, period: float = 86400, budget: float = 1.0, analysis_limit: int = 1000):
+        """
+        :param analysis_limit: ANALYZE 每个索引最多采样的行数，使耗时不随表增长
+        """
+        super().__init__(period, budget)
+        self.analysis_limit = analysis_limit
+        self.remaining: Optional[List[str]] = None
+
+    def step(self, connection: sqlite3.Connection) -> bool:
+        connection.execute(f"PRAGMA analysis_limit={self.analysis_limit}")
+        if self.remaining is None:
+            cursor = connection.execute('''
+                SELECT name FROM sqlite_master
+                WHERE type = 'table' AND name NOT LIKE 'sqlite_%' AND sql NOT LIKE 'CREATE VIRTUAL%'
+                ORDER BY name
+            ''')
+            self.remaining = [row[0] for row in cursor.fetchall()]
+
+        if self.remaining:
+            connection.execute(f'ANALYZE "{self.remaining[0]}"')
+            connection.commit()
+            self.remaining.pop(0)
+            return False
+
+        connection.execute("PRAGMA optimize")
+        return True
+
+    def reset(self):
+        self.remaining = None
+
+
+class CheckpointJob(MaintenanceJob):
+    """把WAL中的页写回数据库文件（PASSIVE 模式，不等待查看器的读事务）"""
+    name = 'wal_checkpoint'
+
+    def __init__(self, period: float = 300, budget: float = 0.5):
+        super().__init__(period, budget)
+        self.last_result = None
+
+    def step(self, connection: sqlite3.Connection) -> bool:
+        # 返回 (是否忙, WAL总帧数, 已写回帧数)
+        self.last_result = tuple(connection.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone())
+        return True
+
+
+class MaintenanceScheduler:
+    def __init__(self, db, jobs: Optional[List[MaintenanceJob]] = None, clock=None):
+        """
+        初始化维护调度器
+        :param db: Database实例，只能在使用该连接的线程中调用 run_slice
+        :param jobs: 维护任务，按顺序执行；默认依次为清理聚合表、增量回收、更新统计、WAL检查点
+        :param clock: 时钟对象，用于判断任务是否到期，默认使用系统时间
+        """
+        self.db = db
+        self.now = clock.now if clock is not None else datetime.now
+        self.jobs = jobs if jobs is not None else [
+            CompactRollupsJob(), IncrementalVacuumJob(), OptimizeJob(), CheckpointJob(),
+        ]
+
+    def pending(self) -> bool:
+        """是否有到期的任务"""
+        now = self.now()
+        return any(job.due(now) for job in self.jobs)
+
+    def run_slice(self, keep_going: Callable[[], bool] = lambda: True) -> bool:
+        """
+        执行一个空闲分片：依次执行到期的任务，每个任务不超过自己的预算
+        :param keep_going: 是否继续（例如用户仍然空闲），每步之前和语句执行中都会检查
+        :return: 所有到期任务是否都已完成
+        """
+        # 按月分区时只维护当前月份的文件（更早的月份不再写入），本月还没有数据时没有需要维护的内容
+        db = self.db.partition_for(self.now())
+        if db is None:
+            return True
+        connection = db.connection
+        # 维护语句不能在未提交的事务中执行
+        connection.commit()
+
+        for job in self.jobs:
+            if not job.due(self.now()):
+                continue
+            if not keep_going():
+                return False
+
+            deadline = time.monotonic() + job.step_budget(connection)
+            finished = self._run_job(job, connection, deadline, keep_going)
+            if not finished:
+                return False
+        return True
+
+    def _run_job(self, job: MaintenanceJob, connection: sqlite3.Connection, deadline: float,
+                 keep_going: Callable[[], bool]) -> bool:
+        """在预算内执行任务的若干步，返回本轮是否完成"""
+        def progress():
+            # 非0返回值使SQLite中断当前语句并回滚
+            return 0 if keep_going() and time.monotonic() < deadline else 1
+
+        connection.set_progress_handler(progress, PROGRESS_STEPS)
+        try:
+            while keep_going() and time.monotonic() < deadline:
+                begin = time.monotonic()
+                try:
+                    done = job.step(connection)
+                except sqlite3.OperationalError as e:
+                    if 'interrupt' not in str(e):
+                        print(f"维护任务 {job.name} 出错: {e}")
+                    connection.rollback()
+                    job.interrupted += 1
+                    return False
+                finally:
+                    job.steps += 1
+                    job.seconds += time.monotonic() - begin
+
+                if done:
+                    job.rounds += 1
+                    job.last_completed = self.now()
+                    job.reset()
+                    return True
+            job.interrupted += 1
+            return False
+        finally:
+            connection.set_progress_handler(None, 0)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """各任务的执行统计"""
+        return {job.name: job.metrics() for job in self.jobs}
+
+
+# 测试代码
+if __name__ == "__main__":
+    import os
+    import sys
+    import tempfile
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from data.database import Database
+
+    db = Database(os.path.join(tempfile.mkdtemp(), "maintenance.db"))
+    scheduler = MaintenanceScheduler(db)
+    print(f"全部完成: {scheduler.run_slice()}")
+    for name, values in scheduler.metrics().items():
+        print(f"{name}: {values}")
+    db.close()
@@ -0,0 +1,696 @@
+"""
+按月分区存储模块
+每个月一个SQLite文件（表结构与单文件数据库完全相同），写入按记录时间进入对应月份的文件；
+区间查询只 ATTACH 与范围重叠的月份，在临时视图中 UNION ALL 后执行与单文件相同的查询。
+删除或归档一个月只是文件操作，不需要大范围 DELETE 和 VACUUM
+"""
+import os
+import re
+import shutil
+import sqlite3
+import inspect
+import functools
+import threading
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple, Callable
+
+from .database import Database
+from .intervals import to_datetime
+
+
+# 每个分区的自增id从 月份序号 × ID_STRIDE 开始，各月份的id全局唯一且按时间递增
+# （实时模式的增量查询 after_id 和最大id跨月份仍然有效）
+ID_STRIDE = 10 ** 9
+AUTOINCREMENT_TABLES = ('window_activities', 'browser_activities', 'input_activities', 'state_changes')
+
+# 导入单文件数据库时逐月复制的表及其时间列（统计、聚合和派生表在分区中重建）
+IMPORT_TABLES = {
+    'window_activities': 'start_time',
+    'browser_activities': 'start_time',
+    'input_activities': 'window_start',
+    'state_changes': 'timestamp',
+    'input_minutes': 'hour_start',
+}
+
+# 各写入方法按哪个时间参数进入对应月份（窗口会话按月份切分，见 PartitionedDatabase.route）
+ROUTE_ARGUMENTS = {
+    'insert_browser_activity': 'start_time',
+    'insert_input_activity': 'window_start',
+    'upsert_input_minutes': 'hour_start',
+    'insert_state_change': 'timestamp',
+}
+
+PARTITION_PATTERN = re.compile(r'^(?P<prefix>.+)_(?P<year>\d{4})_(?P<month>\d{2})\.db$')
+
+Month = Tuple[int, int]
+
+
+def month_of(moment: datetime) -> Month:
+    """时间所在的月份"""
+    return moment.year, moment.month
+
+
+def month_start(month: Month) -> datetime:
+    """月份的第一天零点"""
+    return datetime(month[0], month[1], 1)
+
+
+def next_month(month: Month) -> Month:
+    """下一个月份"""
+    year, number = month
+    return (year + 1, 1) if number == 12 else (year, number + 1)
+
+
+def previous_month(month: Month) -> Month:
+    """上一个月份"""
+    year, number = month
+    return (year - 1, 12) if number == 1 else (year, number - 1)
+
+
+def month_id_base(month: Month) -> int:
+    """月份分区自增id的起点"""
+    return (month[0] * 12 + month[1] - 1) * ID_STRIDE
+
+
+def split_by_month(start_time: datetime, end_time: datetime) -> List[Tuple[datetime, datetime]]:
+    """
+    按月份边界切分时间区间
+    :return: [(片段起点, 片段终点), ...]，不跨月的区间原样返回
+    """
+    pieces = []
+    current = start_time
+    while True:
+        boundary = month_start(next_month(month_of(current)))
+        if end_time <= boundary:
+            pieces.append((current, end_time))
+            return pieces
+        pieces.append((current, boundary))
+        current = boundary
+
+
+def _over_range(tables):
+    """
+    区间查询方法的包装：按参数中的 start_date/end_date 挂载重叠的月份并建立临时视图，
+    然后在路由连接上执行 Database 中原有的查询
+    :param tables: 查询用到的表名，或根据参数计算表名的函数
+    """
+    def decorate(method: Callable) -> Callable:
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            arguments = signature.bind(self, *args, **kwargs).arguments
+            names = tables(arguments) if callable(tables) else tables
+            with self.lock:
+                self._prepare(arguments.get('start_date'), arguments.get('end_date'), tuple(names))
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class MonthPartition(Database):
+    """
+    一个月份的分区文件
+    空闲区间可能跨越月份边界：本文件中某天之前（之后）没有状态记录时，
+    从相邻月份的分区补上之前的最后一条（之后的第一条）
+    """
+
+    def __init__(self, db_path: str, router: 'PartitionedDatabase', month: Month, **kwargs):
+        """
+        初始化月份分区
+        :param router: 所属的分区数据库，通过它挂载相邻月份
+        :param month: 分区的月份
+        """
+        self.router = router
+        self.month = month
+        super().__init__(db_path, **kwargs)
+
+    def _states_around(self, day_start: datetime, next_day: datetime) -> List[sqlite3.Row]:
+        rows = super()._states_around(day_start, next_day)
+        if not any(to_datetime(row['timestamp']) < day_start for row in rows):
+            rows = self.router.boundary_state(previous_month(self.month), day_start, before=True) + rows
+        if not any(to_datetime(row['timestamp']) >= next_day for row in rows):
+            rows = rows + self.router.boundary_state(next_month(self.month), next_day, before=False)
+        return rows
+
+    def refresh_activity_timeline(self):
+        """
+        增量更新派生时间线
+        本分区的第一批状态记录可能结束了上个月末开始的空闲区间，这时重算该区间覆盖的日期：
+        上个月分区中的最后几天，以及本月第一条状态记录之前的几天
+        """
+        first_states = self._get_watermark('state_changes') == 0 and self.get_max_id('state_changes') > 0
+        super().refresh_activity_timeline()
+        if not first_states:
+            return
+
+        carried = self.router.boundary_state(previous_month(self.month), month_start(self.month), before=True)
+        if not carried or carried[0]['state_type'] != 'idle':
+            return
+
+        previous = self.router.partition_for(month_start(previous_month(self.month)))
+        idle_start = to_datetime(carried[0]['timestamp']) - timedelta(seconds=carried[0]['idle_duration'] or 0)
+        previous.rebuild_days(idle_start, month_start(self.month))
+
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT MIN(timestamp) AS first_time FROM state_changes")
+        self.rebuild_days(month_start(self.month), to_datetime(cursor.fetchone()['first_time']))
+
+    def rebuild_days(self, start: datetime, end: datetime):
+        """重算本分区中 [start, end) 覆盖的日期的时间线，并清除这些天的摘要缓存"""
+        cursor = self.connection.cursor()
+        day = max(start, month_start(self.month)).replace(hour=0, minute=0, second=0, microsecond=0)
+        while day < end:
+            self._rebuild_timeline_day(day, end)
+            cursor.execute("DELETE FROM summary_cache WHERE day = ?", (day.date(),))
+            day += timedelta(days=1)
+        self.commit()
+
+
+class PartitionedDatabase(Database):
+    """
+    按月分区的数据库，接口与 Database 相同
+    自身的连接是一个内存数据库（路由连接）：其中的空表保证没有分区时查询返回空结果，
+    查询前把重叠月份的文件以只读方式 ATTACH，并用同名的临时视图遮蔽空表
+    按天的方法（摘要、活跃片段、空闲区间）直接交给当天所在月份的分区执行，
+    跨月的空闲区间由分区通过路由连接读取相邻月份的边界状态
+    """
+
+    def __init__(self, directory: str, title_normalizer=None, keep_raw_title: bool = True,
+                 prefix: str = "focus_insight", read_only: bool = False):
+        """
+        初始化分区数据库
+        :param directory: 分区文件所在目录
+        :param prefix: 分区文件名前缀，文件名为 前缀_年_月.db
+        :param read_only: 以只读方式打开各分区（查看器、报告）
+        """
+        self.directory = directory
+        self.prefix = prefix
+        os.makedirs(directory, exist_ok=True)
+
+        # 已打开的分区（写入和按天查询使用），键为 (年, 月)
+        self.open_partitions: Dict[Month, Database] = {}
+
+        # 路由连接当前挂载的分区和建立的临时对象
+        self.lock = threading.RLock()
+        self.attached: Dict[Month, str] = {}
+        self.temp_objects: List[Tuple[str, str]] = []
+        self.prepared = None
+
+        super().__init__(":memory:", title_normalizer, keep_raw_title, read_only)
+        self.db_path = directory
+
+    def init_database(self):
+        """创建路由连接：内存数据库，表结构与分区相同但没有数据"""
+        self.connection = sqlite3.connect("file::memory:", uri=True, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.create_tables()
+        self.search_enabled = False
+        self.attach_limit = self.connection.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+
+    # ---- 分区文件 ----
+
+    def partition_path(self, month: Month) -> str:
+        """月份对应的分区文件路径"""
+        return os.path.join(self.directory, f"{self.prefix}_{month[0]:04d}_{month[1]:02d}.db")
+
+    def list_months(self) -> List[Month]:
+        """目录中已有的分区月份（升序）"""
+        months = []
+        for name in os.listdir(self.directory):
+            match = PARTITION_PATTERN.match(name)
+            if match and match.group('prefix') == self.prefix:
+                months.append((int(match.group('year')), int(match.group('month'))))
+        return sorted(months)
+
+    def months_between(self, start_date: Optional[datetime], end_date: Optional[datetime]) -> List[Month]:
+        """与时间范围重叠的已有分区（分区裁剪），范围为None表示不限制"""
+        first = month_of(start_date) if start_date else None
+        last = month_of(end_date) if end_date else None
+        return [month for month in self.list_months()
+                if (first is None or month >= first) and (last is None or month <= last)]
+
+    def partition_for(self, moment: datetime) -> Optional[Database]:
+        """时间所在月份的已有分区（只查找，不创建文件），该月份还没有数据时返回None"""
+        month = month_of(moment)
+        with self.lock:
+            db = self.open_partitions.get(month)
+            if db is None and os.path.exists(self.partition_path(month)):
+                db = self._open(month)
+            return db
+
+    def partition_for_insert(self, moment: datetime) -> Database:
+        """写入时使用：时间所在月份的分区，不存在时创建"""
+        month = month_of(moment)
+        with self.lock:
+            db = self.open_partitions.get(month)
+            if db is None:
+                created = not os.path.exists(self.partition_path(month))
+                db = self._open(month)
+                if created:
+                    self._seed_ids(db, month)
+            return db
+
+    def _open(self, month: Month) -> Database:
+        """打开（或创建）月份的分区文件并缓存连接"""
+        db = MonthPartition(self.partition_path(month), self, month, title_normalizer=self.title_normalizer,
+                            keep_raw_title=self.keep_raw_title, read_only=self.read_only)
+        self.open_partitions[month] = db
+        return db
+
+    def partitions(self) -> List[Database]:
+        """全部已有分区（按月份升序打开）"""
+        return [db for db in map(self.partition_for, map(month_start, self.list_months())) if db is not None]
+
+    @staticmethod
+    def _seed_ids(db: Database, month: Month):
+        """新分区的自增id从月份对应的起点开始"""
+        base = month_id_base(month)
+        db.connection.executemany("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)",
+                                  [(table, base) for table in AUTOINCREMENT_TABLES])
+        db.commit()
+
+    def _release(self, month: Month):
+        """关闭一个月份的连接（删除或归档前）"""
+        with self.lock:
+            self._reset_router()
+            db = self.open_partitions.pop(month, None)
+            if db is not None:
+                db.commit()
+                db.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                db.close()
+
+    def drop_month(self, year: int, month: int):
+        """删除一个月的全部数据（删除分区文件）"""
+        if (year, month) == month_of(datetime.now()):
+            raise ValueError("不能删除当前月份的分区")
+        self._release((year, month))
+        path = self.partition_path((year, month))
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        print(f"已删除分区: {os.path.basename(path)}")
+
+    def archive_month(self, year: int, month: int, archive_dir: str) -> str:
+        """
+        归档一个月的数据：把分区文件移动到归档目录，查询不再包含该月份
+        :return: 归档后的文件路径
+        """
+        if (year, month) == month_of(datetime.now()):
+            raise ValueError("不能归档当前月份的分区")
+        self._release((year, month))
+        os.makedirs(archive_dir, exist_ok=True)
+        path = self.partition_path((year, month))
+        target = os.path.join(archive_dir, os.path.basename(path))
+        shutil.move(path, target)
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        print(f"已归档分区: {target}")
+        return target
+
+    def import_database(self, path: str) -> Dict[str, int]:
+        """
+        把单文件数据库的数据按月份导入分区（启用分区时迁移旧数据，原文件以只读方式挂载，保持不变）
+        逐月在分区连接上挂载旧文件，用 INSERT ... SELECT 复制带时间的表，不把整表读入内存；
+        跨月的窗口会话经过与写入相同的路径切分，应用统计和小时聚合在导入后按各分区的数据重建，
+        全文索引由触发器同时建立，派生时间线由监控程序之后刷新
+        :return: 各表导入的行数
+        """
+        uri = Path(path).absolute().as_uri() + "?mode=ro"
+        legacy = sqlite3.connect(uri, uri=True)
+        legacy.row_factory = sqlite3.Row
+        existing = {row['name'] for row in legacy.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        tables = {table: column for table, column in IMPORT_TABLES.items() if table in existing}
+
+        # 旧数据涉及的月份（时间按文本存储，前7个字符为年月）
+        months = set()
+        for table, column in tables.items():
+            for row in legacy.execute(f"SELECT DISTINCT substr({column}, 1, 7) AS month FROM {table}"):
+                if row['month']:
+                    months.add((int(row['month'][:4]), int(row['month'][5:7])))
+        legacy.close()
+
+        counts = {table: 0 for table in tables}
+        crossing = []
+        for month in sorted(months):
+            db = self.partition_for_insert(month_start(month))
+            db.commit()
+            db.connection.execute("ATTACH DATABASE ? AS legacy", (uri,))
+            try:
+                month_bounds = [month_start(month), month_start(next_month(month))]
+                for table, column in tables.items():
+                    names = ", ".join(self._import_columns(db, table))
+                    where = f" WHERE {column} >= ? AND {column} < ?"
+                    params = list(month_bounds)
+                    if table == 'window_activities':
+                        # 跨月的会话（数量很少）稍后按写入路径切分
+                        where += " AND end_time <= ?"
+                        params.append(month_bounds[1])
+                        crossing.extend(db.connection.execute(
+                            "SELECT * FROM legacy.window_activities"
+                            " WHERE start_time >= ? AND start_time < ? AND end_time > ? ORDER BY start_time, id",
+                            month_bounds + [month_bounds[1]]).fetchall())
+
+                    if table == 'input_minutes':
+                        sql = f"INSERT OR REPLACE INTO main.{table} ({names}) SELECT {names} FROM legacy.{table}{where}"
+                    else:
+                        order = "id" if table == 'state_changes' else f"{column}, id"
+                        sql = (f"INSERT INTO main.{table} ({names}) SELECT {names} FROM legacy.{table}{where}"
+                               f" ORDER BY {order}")
+                    counts[table] += db.connection.execute(sql, params).rowcount
+                # 事务中的数据库不能卸载
+                db.commit()
+            finally:
+                db.connection.execute("DETACH DATABASE legacy")
+
+        for row in crossing:
+            values = dict(row)
+            self.insert_window_activity(values['process_name'], values['window_title'], values['start_time'],
+                                        values['end_time'], values['duration'], values.get('keystrokes') or 0,
+                                        values.get('clicks') or 0, commit=False)
+        if crossing:
+            counts['window_activities'] += len(crossing)
+        self.commit()
+
+        # 应用统计和小时聚合按各分区导入后的窗口会话重建
+        for db in self.partitions():
+            db.rebuild_app_statistics()
+            db.rebuild_hourly_buckets()
+            db.commit()
+        return counts
+
+    @staticmethod
+    def _import_columns(db: Database, table: str) -> List[str]:
+        """分区表与旧文件表共有的列（不含自增id；旧版本的表可能缺少后来增加的列）"""
+        def names(schema: str) -> List[str]:
+            return [row['name'] for row in db.connection.execute(f"PRAGMA {schema}.table_info({table})")]
+        available = set(names('legacy'))
+        return [name for name in names('main') if name in available and name != 'id']
+
+    # ---- 路由连接：挂载分区并建立临时视图 ----
+
+    def _reset_router(self):
+        """删除临时视图/表并卸载全部分区"""
+        for kind, name in self.temp_objects:
+            self.connection.execute(f"DROP {kind} IF EXISTS temp.{name}")
+        self.temp_objects = []
+        for alias in self.attached.values():
+            self.connection.execute(f"DETACH DATABASE {alias}")
+        self.attached = {}
+        self.prepared = None
+
+    def _attach(self, month: Month) -> str:
+        """以只读方式挂载分区，返回别名"""
+        alias = f"p{month[0]:04d}_{month[1]:02d}"
+        uri = Path(self.partition_path(month)).absolute().as_uri() + "?mode=ro"
+        self.connection.execute("ATTACH DATABASE ? AS " + alias, (uri,))
+        self.attached[month] = alias
+        return alias
+
+    def _columns(self, table: str) -> str:
+        """表的列名（按路由连接中空表的顺序，各分区的列顺序可能因升级而不同）"""
+        cursor = self.connection.execute(f"PRAGMA main.table_info({table})")
+        return ", ".join(row['name'] for row in cursor.fetchall())
+
+    def _prepare(self, start_date: Optional[datetime], end_date: Optional[datetime], tables: Tuple[str, ...]):
+        """
+        挂载与范围重叠的分区，并为用到的表建立 UNION ALL 临时视图（与上次相同时直接复用）
+        重叠的月份超过 ATTACH 上限时，分批把各月份的数据复制到同名临时表
+        """
+        months = tuple(self.months_between(start_date, end_date))
+        key = (months, tables)
+        if key == self.prepared:
+            return
+
+        self._reset_router()
+        if not months:
+            # 没有分区：查询落到路由连接中的空表
+            self.prepared = key
+            return
+
+        if len(months) <= self.attach_limit:
+            aliases = [self._attach(month) for month in months]
+            for table in tables:
+                columns = self._columns(table)
+                union = " UNION ALL ".join(f"SELECT {columns} FROM {alias}.{table}" for alias in aliases)
+                self.connection.execute(f"CREATE TEMP VIEW {table} AS {union}")
+                self.temp_objects.append(('VIEW', table))
+            self.prepared = key
+            return
+
+        # 复制后的数据不随写入更新，不缓存
+        for table in tables:
+            columns = self._columns(table)
+            self.connection.execute(f"CREATE TEMP TABLE {table} AS SELECT {columns} FROM main.{table} WHERE 0")
+            self.temp_objects.append(('TABLE', table))
+        for offset in range(0, len(months), self.attach_limit):
+            batch = months[offset:offset + self.attach_limit]
+            aliases = [self._attach(month) for month in batch]
+            for table in tables:
+                columns = self._columns(table)
+                for alias in aliases:
+                    self.connection.execute(f"INSERT INTO temp.{table} SELECT {columns} FROM {alias}.{table}")
+            # 事务中的数据库不能卸载
+            self.connection.commit()
+            for month in batch:
+                self.connection.execute(f"DETACH DATABASE {self.attached.pop(month)}")
+
+    def boundary_state(self, month: Month, moment: datetime, before: bool) -> List[sqlite3.Row]:
+        """
+        相邻月份中时间之前的最后一条（或之后的第一条）状态记录，在挂载该月份的临时视图上查询
+        :param month: 相邻的月份，没有分区文件时返回空列表
+        :param before: True 查找之前的最后一条，False 查找之后的第一条
+        """
+        if not os.path.exists(self.partition_path(month)):
+            return []
+        condition = "timestamp < ? ORDER BY timestamp DESC" if before else "timestamp >= ? ORDER BY timestamp"
+        with self.lock:
+            self._prepare(month_start(month), month_start(next_month(month)) - timedelta(microseconds=1),
+                          ('state_changes',))
+            cursor = self.connection.execute(
+                f"SELECT state_type, timestamp, idle_duration FROM state_changes WHERE {condition} LIMIT 1",
+                (moment,))
+            return cursor.fetchall()
+
+    def _overlap_filter(self, table: str, start_date: Optional[datetime],
+                        end_date: Optional[datetime]) -> Tuple[str, list]:
+        """最长会话时长在各分区中分别走 duration 索引查询（视图上的 MAX 需要扫描全部行）"""
+        if not start_date or not self.attached:
+            return super()._overlap_filter(table, start_date, end_date)
+
+        longest = 0
+        for alias in self.attached.values():
+            cursor = self.connection.execute(f"SELECT MAX(duration) AS longest FROM {alias}.{table}")
+            longest = max(longest, cursor.fetchone()['longest'] or 0)
+        where = " AND start_time >= ? AND (COALESCE(end_time, start_time) > ? OR start_time >= ?)"
+        params = [start_date - timedelta(seconds=longest + 1), start_date, start_date]
+        if end_date:
+            where += " AND start_time <= ?"
+            params.append(end_date)
+        return where, params
+
+    # ---- 写入：按记录时间进入对应月份 ----
+
+    def insert_window_activity(self, process_name: str, window_title: str,
+                               start_time: datetime, end_time: datetime, duration: float,
+                               keystrokes: int = 0, clicks: int = 0, commit: bool = True):
+        """插入窗口活动记录，跨月的会话在月份边界切分，时长和输入计数按比例分摊"""
+        for piece in self._window_pieces(process_name, window_title, start_time, end_time, duration,
+                                         keystrokes, clicks):
+            self.partition_for_insert(piece['start_time']).insert_window_activity(**piece, commit=commit)
+
+    def _window_pieces(self, process_name: str, window_title: str, start_time: datetime, end_time: datetime,
+                       duration: float, keystrokes: int = 0, clicks: int = 0) -> List[Dict[str, Any]]:
+        """窗口会话在各月份中的片段（不跨月时为原会话）"""
+        start_time = self._as_datetime(start_time)
+        end_time = self._as_datetime(end_time)
+        pieces = split_by_month(start_time, end_time) if end_time > start_time else [(start_time, end_time)]
+        if len(pieces) == 1:
+            return [dict(process_name=process_name, window_title=window_title, start_time=start_time,
+                         end_time=end_time, duration=duration, keystrokes=keystrokes, clicks=clicks)]
+
+        total = (end_time - start_time).total_seconds()
+        elapsed = 0.0
+        keys_given = clicks_given = 0
+        results = []
+        for piece_start, piece_end in pieces:
+            seconds = (piece_end - piece_start).total_seconds()
+            elapsed += seconds
+            share = elapsed / total
+            keys_share = round(keystrokes * share) - keys_given
+            clicks_share = round(clicks * share) - clicks_given
+            keys_given += keys_share
+            clicks_given += clicks_share
+            results.append(dict(process_name=process_name, window_title=window_title, start_time=piece_start,
+                                end_time=piece_end, duration=duration * seconds / total,
+                                keystrokes=keys_share, clicks=clicks_share))
+        return results
+
+    def route(self, method: str, arguments: Dict[str, Any]) -> List[Tuple[Database, Dict[str, Any]]]:
+        """一次写入落到的分区和各分区上的参数（跨月的窗口会话切分为多段）"""
+        if method == 'insert_window_activity':
+            return [(self.partition_for_insert(piece['start_time']), piece)
+                    for piece in self._window_pieces(**arguments)]
+        moment = self._as_datetime(arguments[ROUTE_ARGUMENTS[method]])
+        return [(self.partition_for_insert(moment), arguments)]
+
+    def insert_browser_activity(self, browser_name: str, page_title: str, page_url: str,
+                                start_time: datetime, end_time: Optional[datetime] = None,
+                                duration: Optional[float] = None, commit: bool = True):
+        """插入浏览器活动记录（按开始时间所在月份）"""
+        self.partition_for_insert(self._as_datetime(start_time)).insert_browser_activity(
+            browser_name, page_title, page_url, start_time, end_time, duration, commit=commit)
+
+    def insert_input_activity(self, activity_type: str, event_count: int, frequency: float,
+                              window_start: datetime, window_end: datetime):
+        """插入输入活动记录"""
+        self.partition_for_insert(self._as_datetime(window_start)).insert_input_activity(
+            activity_type, event_count, frequency, window_start, window_end)
+
+    def upsert_input_minutes(self, hour_start: datetime, activity_type: str, counts,
+                             commit: bool = True):
+        """写入一小时的分钟计数（整点小时不会跨月）"""
+        self.partition_for_insert(self._as_datetime(hour_start)).upsert_input_minutes(
+            hour_start, activity_type, counts, commit=commit)
+
+    def insert_state_change(self, state_type: str, timestamp: datetime, idle_duration: Optional[float] = None,
+                            commit: bool = True):
+        """插入状态变化记录"""
+        self.partition_for_insert(self._as_datetime(timestamp)).insert_state_change(
+            state_type, timestamp, idle_duration, commit=commit)
+
+    def commit(self):
+        """提交所有打开的分区"""
+        with self.lock:
+            for db in self.open_partitions.values():
+                db.commit()
+
+    @staticmethod
+    def _as_datetime(value) -> datetime:
+        """导入旧数据时时间可能是字符串"""
+        return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+    # ---- 全部分区上执行的维护 ----
+
+    def rebuild_app_statistics(self):
+        for db in self.partitions():
+            db.rebuild_app_statistics()
+
+    def rebuild_hourly_buckets(self):
+        for db in self.partitions():
+            db.rebuild_hourly_buckets()
+
+    def refresh_activity_timeline(self):
+        for db in self.partitions():
+            db.refresh_activity_timeline()
+
+    # ---- 区间查询：挂载重叠的分区后执行 Database 中的查询 ----
+
+    get_window_activities = _over_range(('window_activities',))(Database.get_window_activities)
+    get_window_activities_page = _over_range(('window_activities',))(Database.get_window_activities_page)
+    count_window_activities = _over_range(('window_activities',))(Database.count_window_activities)
+    get_process_names = _over_range(('window_activities',))(Database.get_process_names)
+    get_browser_activities = _over_range(('browser_activities',))(Database.get_browser_activities)
+    get_input_minutes = _over_range(('input_minutes',))(Database.get_input_minutes)
+    read_columns = _over_range(lambda arguments: (arguments['table'],))(Database.read_columns)
+    get_range_watermark = _over_range(('window_activities', 'state_changes', 'input_minutes'))(
+        Database.get_range_watermark)
+    get_active_time_by_app = _over_range(('active_segments',))(Database.get_active_time_by_app)
+    get_app_input_intensity = _over_range(('hourly_buckets',))(Database.get_app_input_intensity)
+    get_hourly_buckets = _over_range(('hourly_buckets',))(Database.get_hourly_buckets)
+    get_range_report = _over_range(('hourly_buckets',))(Database.get_range_report)
+
+    def search_activities(self, query: str, start_date: Optional[datetime] = None,
+                          end_date: Optional[datetime] = None, limit: int = 50,
+                          use_index: bool = True) -> List[Dict]:
+        """在每个重叠的分区中用各自的全文索引搜索，再合并相同标题的结果"""
+        merged: Dict[Tuple[str, str, str], Dict] = {}
+        for month in self.months_between(start_date, end_date):
+            db = self.partition_for(month_start(month))
+            if db is None:
+                continue
+            for item in db.search_activities(query, start_date, end_date, limit, use_index):
+                key = (item['source'], item['app'], item['title'])
+                existing = merged.get(key)
+                if existing is None:
+                    merged[key] = item
+                    continue
+                existing['url'] = max(existing['url'], item['url'])
+                existing['total_duration'] += item['total_duration']
+                existing['session_count'] += item['session_count']
+                existing['first_seen'] = min(existing['first_seen'], item['first_seen'])
+                existing['last_seen'] = max(existing['last_seen'], item['last_seen'])
+                existing['score'] = min(existing['score'], item['score'])
+        results = sorted(merged.values(), key=lambda item: (item['score'], -item['total_duration']))
+        return results[:limit]
+
+    def get_max_id(self, table: str) -> int:
+        """id按月份递增，最大id在最新的非空分区中"""
+        for db in reversed(self.partitions()):
+            max_id = db.get_max_id(table)
+            if max_id:
+                return max_id
+        return 0
+
+    def get_app_statistics(self, limit: int = 10) -> List[Dict]:
+        """合并各分区的应用统计"""
+        totals: Dict[Tuple[str, str], Dict] = {}
+        for db in self.partitions():
+            for item in db.get_app_statistics(-1):
+                key = (item['process_name'], item['window_title'])
+                existing = totals.get(key)
+                if existing is None:
+                    totals[key] = item
+                    continue
+                existing['total_duration'] += item['total_duration']
+                existing['session_count'] += item['session_count']
+                existing['last_used'] = max(existing['last_used'], item['last_used'])
+        return sorted(totals.values(), key=lambda item: item['total_duration'], reverse=True)[:limit]
+
+    # ---- 按天查询：交给当天所在的分区，该月份没有数据时返回空结果 ----
+
+    def get_daily_summary(self, date: datetime) -> Dict:
+        db = self.partition_for(date)
+        if db is None:
+            return self.make_daily_summary(date, 0, 0, 0, 0, [])
+        return db.get_daily_summary(date)
+
+    def get_active_segments(self, date: datetime) -> List[Dict]:
+        db = self.partition_for(date)
+        return db.get_active_segments(date) if db is not None else []
+
+    def get_idle_periods(self, date: datetime) -> List[Dict]:
+        db = self.partition_for(date)
+        return db.get_idle_periods(date) if db is not None else []
+
+    def close(self):
+        """关闭路由连接和所有分区"""
+        with self.lock:
+            for db in self.open_partitions.values():
+                db.close()
+            self.open_partitions = {}
+            super().close()
+
+
+def open_database(path: str, **kwargs) -> Database:
+    """按路径打开数据库：目录为按月分区的数据库，文件为单文件数据库"""
+    if os.path.isdir(path):
+        return PartitionedDatabase(path, **kwargs)
+    return Database(path, **kwargs)
+
+
+# 测试代码
+if __name__ == "__main__":
+    import tempfile
+
+    db = PartitionedDatabase(os.path.join(tempfile.mkdtemp(), "partitions"))
+    db.insert_window_activity("code.exe", "跨月会话", datetime(2025, 1, 31, 23, 30), datetime(2025, 2, 1, 0, 30),
+                              3600.0, keystrokes=100, clicks=10)
+    db.insert_window_activity("chrome.exe", "二月", datetime(2025, 2, 3, 9), datetime(2025, 2, 3, 10), 3600.0)
+    print(f"分区: {db.list_months()}")
+    for record in db.get_window_activities(datetime(2025, 1, 31), datetime(2025, 2, 28)):
+        print(record)
+    print(db.get_range_report(datetime(2025, 1, 31), datetime(2025, 2, 3))['app_totals'])
+    db.close()
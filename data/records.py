@@ -0,0 +1,209 @@
+"""
+记录类型模块
+监控器发布的记录和数据库读出的会话使用带 __slots__ 的记录类，
+不再为每条记录分配一个字典；同时保留按键访问的接口，旧代码的 record['x'] 和 record.get('x') 不需要修改
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from operator import itemgetter
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+class Record:
+    """
+    记录基类，只提供兼容字典的接口
+    子类用 @dataclass(slots=True) 声明字段（默认值均为None），__slots__ 即按顺序排列的字段名；
+    __init__、__eq__ 和 __repr__ 由 dataclass 生成，记录可以修改，因此 __hash__ 为None（不可哈希）
+    """
+    __slots__ = ()
+
+    # 兼容字典的接口
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value: Any):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.__slots__
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__slots__)
+
+    def __len__(self) -> int:
+        return len(self.__slots__)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """与 dict.get 相同"""
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def keys(self) -> Tuple[str, ...]:
+        """字段名"""
+        return self.__slots__
+
+    def values(self) -> list:
+        """字段值"""
+        return [getattr(self, name) for name in self.__slots__]
+
+    def items(self) -> list:
+        """(字段名, 字段值) 列表"""
+        return [(name, getattr(self, name)) for name in self.__slots__]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为普通字典（导出JSON时使用）"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+
+@dataclass(slots=True)
+class WindowRecord(Record):
+    """窗口监控器发布的一个窗口会话"""
+    process_name: Optional[str] = None
+    window_title: Optional[str] = None
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    duration: Optional[float] = None
+    keystrokes: Optional[int] = None
+    clicks: Optional[int] = None
+
+
+@dataclass(slots=True)
+class TabRecord(Record):
+    """浏览器监控器探测到的标签页（也是发布的记录）"""
+    browser: Optional[str] = None
+    title: Optional[str] = None
+    url: Optional[str] = None
+    timestamp: Optional[datetime] = None
+
+
+@dataclass(slots=True)
+class StateRecord(Record):
+    """输入监控器发布的空闲/活跃状态变化"""
+    type: Optional[str] = None
+    state: Optional[str] = None
+    timestamp: Optional[datetime] = None
+    idle_duration: Any = None
+
+
+@dataclass(slots=True)
+class WindowActivity(Record):
+    """window_activities 表的一行（时间列是数据库中的文本）"""
+    id: Optional[int] = None
+    process_name: Optional[str] = None
+    window_title: Optional[str] = None
+    start_time: Any = None
+    end_time: Any = None
+    duration: Optional[float] = None
+    normalized_title: Optional[str] = None
+    keystrokes: Optional[int] = None
+    clicks: Optional[int] = None
+    created_at: Any = None
+
+
+@dataclass(slots=True)
+class BrowserActivity(Record):
+    """browser_activities 表的一行（时间列是数据库中的文本）"""
+    id: Optional[int] = None
+    browser_name: Optional[str] = None
+    page_title: Optional[str] = None
+    page_url: Optional[str] = None
+    start_time: Any = None
+    end_time: Any = None
+    duration: Optional[float] = None
+    created_at: Any = None
+
+
+class RecordFactory:
+    """
+    sqlite3 行工厂：直接把查询结果构造为记录对象，不经过 sqlite3.Row 和字典
+    列到字段的映射按查询结果的列名计算一次，同一次查询的后续行复用
+    """
+
+    def __init__(self, record_type: type, aliases: Optional[Dict[str, str]] = None,
+                 shared: Tuple[str, ...] = ()):
+        """
+        初始化行工厂
+        :param record_type: 记录类
+        :param aliases: 列别名到字段名的映射；同一字段出现多次时以后面的列为准
+        :param shared: 重复值很多的文本字段（如进程名），同一次查询中相同的值共用一个字符串对象
+        """
+        self.record_type = record_type
+        self.aliases = aliases or {}
+        self.shared = shared
+        self.description = None
+        self.getter = None
+        self.pad = False
+        self.shared_indexes = ()
+        self.strings = {}
+
+    def _prepare(self, description):
+        """根据查询结果的列计算字段取值方式"""
+        positions = {}
+        for index, column in enumerate(description):
+            positions[self.aliases.get(column[0], column[0])] = index
+
+        fields = self.record_type.__slots__
+        missing = len(description)
+        indexes = [positions.get(name, missing) for name in fields]
+        # 查询中没有的字段从追加在行尾的None取值
+        self.pad = missing in indexes
+        self.getter = itemgetter(*indexes) if len(indexes) > 1 else (lambda row: (row[indexes[0]],))
+        self.shared_indexes = tuple(fields.index(name) for name in self.shared
+                                    if positions.get(name) is not None)
+        self.strings = {}
+        self.description = description
+
+    def __call__(self, cursor, row: tuple) -> Record:
+        if cursor.description is not self.description:
+            self._prepare(cursor.description)
+        if self.pad:
+            row = row + (None,)
+        values = self.getter(row)
+        if self.shared_indexes:
+            values = list(values)
+            strings = self.strings
+            for index in self.shared_indexes:
+                value = values[index]
+                values[index] = strings.setdefault(value, value)
+        return self.record_type(*values)
+
+
+def columns_to_dicts(columns: Dict[str, Any]) -> list:
+    """把 Database.read_columns 的结果转换回字典列表（导出使用），时间列转换为 datetime"""
+    dictionaries = columns['dictionaries']
+    time_columns = columns['time_columns']
+    names = [name for name in columns if name not in ('dictionaries', 'time_columns')]
+
+    values = []
+    for name in names:
+        column = columns[name]
+        if name in dictionaries:
+            labels = dictionaries[name]
+            values.append([labels[code] for code in column.tolist()])
+        elif name in time_columns:
+            # NaT 转换为 None
+            values.append(column.view('datetime64[us]').astype(object).tolist())
+        else:
+            values.append(column.tolist())
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+
+# 测试代码
+if __name__ == "__main__":
+    import sqlite3
+
+    record = WindowRecord('code.exe', '测试窗口', None, None, 12.5, keystrokes=3, clicks=1)
+    print(record)
+    print(record['duration'], record.get('keystrokes', 0), record.get('missing', '默认值'), dict(record))
+
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE t (id INTEGER, process_name TEXT, duration REAL)")
+    connection.execute("INSERT INTO t VALUES (1, 'code.exe', 5.0)")
+    cursor = connection.cursor()
+    cursor.row_factory = RecordFactory(WindowActivity)
+    print(cursor.execute("SELECT * FROM t").fetchall())
@@ -3,28 +3,98 @@
 负责管理所有监控数据的存储
 """
 import os
-from datetime import datetime
-from typing import Dict, Any, Optional
+import json
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List
 from .database import Database
+from .partitions import PartitionedDatabase
+from .hot_tier import HotTierDatabase
+from .journal import SessionJournal
+from .title_normalizer import TitleNormalizer
+from .intervals import to_datetime
+from .records import columns_to_dicts
 
 
 class DataStorage:
-    def __init__(self, data_dir: str = "data"):
+    def __init__(self, data_dir: str = "data", normalize_titles: bool = True,
+                 keep_raw_title: bool = True, partition_by_month: Optional[bool] = None,
+                 hot_tier: bool = False, flush_interval: float = 60.0, read_only: bool = False):
         """
         初始化数据存储
         :param data_dir: 数据目录
+        :param normalize_titles: 是否规范化窗口标题后再做应用统计
+        :param keep_raw_title: 是否保留原始窗口标题
+        :param partition_by_month: 是否按月分区保存（data_dir/partitions 下每月一个文件），
+                                   为None时数据目录中已有分区目录则使用分区
+        :param hot_tier: 是否把今天的数据保存在内存中、定期批量刷写到数据库（只用于监控程序，
+                         重做日志在下次以热层启动时补写）
+        :param flush_interval: 热层刷写到数据库的间隔（秒）
+        :param read_only: 只读取数据（查看器、报告），摘要缓存只保存在进程内存中，不写数据库
         """
         self.data_dir = data_dir
+        self.read_only = read_only
         os.makedirs(data_dir, exist_ok=True)
 
+        # 标题规范化规则：数据目录下有 title_rules.json 时使用自定义规则
+        self.title_normalizer = self.load_title_normalizer() if normalize_titles else None
+
         # 初始化数据库
         db_path = os.path.join(data_dir, "focus_insight.db")
-        self.db = Database(db_path)
+        partitions_dir = os.path.join(data_dir, "partitions")
+        if partition_by_month is None:
+            partition_by_month = os.path.isdir(partitions_dir)
+
+        if partition_by_month:
+            first_use = not os.path.isdir(partitions_dir)
+            self.db = PartitionedDatabase(partitions_dir, title_normalizer=self.title_normalizer,
+                                          keep_raw_title=keep_raw_title, read_only=read_only)
+            # 首次启用分区时把单文件数据库中的数据按月份导入（原文件保持不变）
+            if first_use and not read_only and os.path.exists(db_path):
+                counts = self.db.import_database(db_path)
+                print(f"已将 {db_path} 导入按月分区: {counts}")
+        else:
+            self.db = Database(db_path, title_normalizer=self.title_normalizer,
+                               keep_raw_title=keep_raw_title, read_only=read_only)
+
+        # 持久数据库（维护任务使用）；启用热层时今天的读写由内存数据库承担
+        self.durable_db = self.db
+        self.hot_tier = None
+        if hot_tier:
+            self.hot_tier = HotTierDatabase(self.durable_db, os.path.join(data_dir, "hot_tier.log"),
+                                            flush_interval=flush_interval)
+            self.db = self.hot_tier
 
         # 当前会话的临时数据
         self.current_window_session = None
         self.current_browser_session = None
 
+        # 会话日志：定期记录进行中的窗口会话，异常退出后用于恢复
+        # 只有监控程序会用到，第一次心跳或恢复时才打开（查看器和报告不映射该文件）
+        self._journal = None
+
+        # 只读方式下的摘要缓存：日期 -> (数据版本, 摘要)
+        self.summary_memo: Dict[Any, Any] = {}
+
+        # 实时状态文件：监控程序写入当前状态，查看器直接读取（见 LiveStatusWriter/LiveStatusReader）
+        self.live_status_path = os.path.join(data_dir, "live.status")
+
+    @property
+    def journal(self) -> SessionJournal:
+        """会话日志（第一次使用时打开）"""
+        if self._journal is None:
+            self._journal = SessionJournal(os.path.join(self.data_dir, "session.journal"))
+        return self._journal
+
+    def load_title_normalizer(self) -> TitleNormalizer:
+        """加载标题规范化规则，配置文件无效时回退到默认规则"""
+        rules_path = os.path.join(self.data_dir, "title_rules.json")
+        if os.path.exists(rules_path):
+            try:
+                return TitleNormalizer.from_file(rules_path)
+            except Exception as e:
+                print(f"加载标题规范化规则失败，使用默认规则: {e}")
+        return TitleNormalizer()
+
     def start_window_session(self, process_name: str, window_title: str):
         """开始窗口会话"""
         self.current_window_session = {
@@ -32,6 +102,8 @@ class DataStorage:
             'window_title': window_title,
             'start_time': datetime.now()
         }
+        self.checkpoint_window_session(process_name, window_title,
+                                       self.current_window_session['start_time'])
 
     def end_window_session(self):
         """结束窗口会话并保存到数据库"""
@@ -50,10 +122,56 @@ class DataStorage:
             end_time=end_time,
             duration=duration
         )
+        self.journal.mark_closed()
 
         print(f"保存窗口记录: {self.current_window_session['process_name']} - {duration:.1f}秒")
         self.current_window_session = None
 
+    def checkpoint_window_session(self, process_name: str, window_title: str, start_time: datetime):
+        """把进行中的窗口会话写入会话日志（心跳）"""
+        self.journal.checkpoint(process_name, window_title, start_time)
+
+    def mark_window_session_saved(self):
+        """窗口会话已写入数据库，清除会话日志中的进行中状态"""
+        self.journal.mark_closed()
+
+    def recover_window_session(self) -> List[Dict[str, Any]]:
+        """
+        恢复上次异常退出时未保存的窗口会话，以各自最后一次心跳作为结束时间
+        除了进行中的会话，已结束但记录还在事件总线队列中没写入数据库的会话也一并恢复
+        :return: 恢复的会话列表
+        """
+        sessions = self.journal.recover_all()
+        recovered = []
+        tolerance = timedelta(milliseconds=1)
+        for session in sessions:
+            # 会话可能已经写入数据库，只是关闭标记没来得及写入
+            db = self.db.partition_for(session['start_time'])
+            if db is not None:
+                cursor = db.connection.cursor()
+                cursor.execute('''
+                    SELECT 1 FROM window_activities
+                    WHERE process_name = ? AND start_time >= ? AND start_time <= ?
+                ''', (session['process_name'], session['start_time'] - tolerance,
+                      session['start_time'] + tolerance))
+                if cursor.fetchone() is not None:
+                    continue
+
+            duration = (session['end_time'] - session['start_time']).total_seconds()
+            self.db.insert_window_activity(
+                process_name=session['process_name'],
+                window_title=session['window_title'],
+                start_time=session['start_time'],
+                end_time=session['end_time'],
+                duration=duration
+            )
+            print(f"恢复未保存的窗口记录: {session['process_name']} - {duration:.1f}秒")
+            recovered.append(session)
+
+        if sessions:
+            self.journal.mark_closed()
+        return recovered
+
     def start_browser_session(self, browser_name: str, page_title: str, page_url: str):
         """开始浏览器会话"""
         self.current_browser_session = {
@@ -98,6 +216,13 @@ class DataStorage:
             window_end=window_end
         )
 
+    def save_input_minutes(self, hour_start: datetime, keyboard_counts, mouse_counts):
+        """保存一小时的每分钟输入计数"""
+        if any(keyboard_counts):
+            self.db.upsert_input_minutes(hour_start, 'keyboard', keyboard_counts)
+        if any(mouse_counts):
+            self.db.upsert_input_minutes(hour_start, 'mouse', mouse_counts)
+
     def save_state_change(self, state_type: str, idle_duration: Optional[float] = None):
         """保存状态变化记录"""
         self.db.insert_state_change(
@@ -108,7 +233,74 @@ class DataStorage:
 
     def get_today_summary(self) -> Dict[str, Any]:
         """获取今日使用摘要"""
-        return self.db.get_daily_summary(datetime.now())
+        return self.get_daily_summary(datetime.now())
+
+    def _summary_watermark(self, db: Database) -> str:
+        """摘要依赖的数据版本：窗口会话和状态变化的最大id（两次主键查询）"""
+        cursor = db.connection.cursor()
+        cursor.execute('''
+            SELECT (SELECT MAX(id) FROM window_activities) AS window_id,
+                   (SELECT MAX(id) FROM state_changes) AS state_id
+        ''')
+        row = cursor.fetchone()
+        return f"{row['window_id'] or 0}:{row['state_id'] or 0}"
+
+    def get_daily_summary(self, date: datetime) -> Dict[str, Any]:
+        """
+        获取某天的使用摘要（带缓存）
+        在当天结束之后计算的摘要永久有效（迟到的写入由数据库触发器清除缓存），
+        其余的摘要在数据版本变化时重新计算；
+        只读方式下仍然使用监控程序写入的缓存，自己算出的摘要只按数据版本缓存在内存中
+        """
+        day = date.date() if isinstance(date, datetime) else date
+        day_end = datetime.combine(day + timedelta(days=1), datetime.min.time())
+        # 摘要缓存保存在当天所在的数据库文件中；按月分区且该月份没有数据时不为它创建文件
+        db = self.db.partition_for(day_end - timedelta(days=1))
+        if db is None:
+            return self.db.get_daily_summary(datetime.combine(day, datetime.min.time()))
+        watermark = self._summary_watermark(db)
+
+        cursor = db.connection.cursor()
+        cursor.execute("SELECT summary, watermark, computed_at FROM summary_cache WHERE day = ?", (day,))
+        row = cursor.fetchone()
+        if row and (to_datetime(row['computed_at']) >= day_end or row['watermark'] == watermark):
+            summary = json.loads(row['summary'])
+            summary['date'] = day
+            return summary
+
+        if self.read_only:
+            memo = self.summary_memo.get(day)
+            if memo and memo[0] == watermark:
+                return dict(memo[1])
+            summary = self.db.get_daily_summary(datetime.combine(day, datetime.min.time()))
+            self.summary_memo[day] = (watermark, dict(summary))
+            return summary
+
+        computed_at = datetime.now()
+        summary = self.db.get_daily_summary(datetime.combine(day, datetime.min.time()))
+        cached = {key: value for key, value in summary.items() if key != 'date'}
+        cursor.execute('''
+            INSERT INTO summary_cache (day, summary, watermark, computed_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(day) DO UPDATE SET
+                summary = excluded.summary,
+                watermark = excluded.watermark,
+                computed_at = excluded.computed_at
+        ''', (day, json.dumps(cached), watermark, computed_at))
+        db.commit()
+        return summary
+
+    def clear_summary_cache(self):
+        """清空摘要缓存（修改统计规则后使用）"""
+        self.summary_memo.clear()
+        if self.read_only:
+            return
+        for db in self.db.partitions():
+            db.connection.execute("DELETE FROM summary_cache")
+            db.commit()
+
+    def get_range_report(self, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
+        """获取日期范围报告（周/月视图）"""
+        return self.db.get_range_report(start_date, end_date)
 
     def get_top_apps(self, limit: int = 10) -> list:
         """获取使用时间最长的应用"""
@@ -116,10 +308,10 @@ class DataStorage:
 
     def export_data(self, start_date: Optional[datetime] = None,
                    end_date: Optional[datetime] = None) -> Dict[str, Any]:
-        """导出数据"""
+        """导出数据（按列读取后转换为字典列表，便于序列化为JSON）"""
         return {
-            'window_activities': self.db.get_window_activities(start_date, end_date),
-            'browser_activities': self.db.get_browser_activities(start_date, end_date),
+            'window_activities': columns_to_dicts(self.db.read_columns('window_activities', start_date, end_date)),
+            'browser_activities': columns_to_dicts(self.db.read_columns('browser_activities', start_date, end_date)),
             'app_statistics': self.db.get_app_statistics(),
             'daily_summary': self.get_today_summary()
         }
@@ -136,8 +328,11 @@ class DataStorage:
         self.end_window_session()
         self.end_browser_session()
 
-        # 关闭数据库
+        # 关闭数据库和会话日志
         self.db.close()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
 
 
 # 测试代码
@@ -0,0 +1,74 @@
+"""
+窗口标题规范化模块
+去掉标题中的易变片段（未保存标记、未读计数、时间、文件路径等），
+使同一文档/页面的不同标题聚合到同一条应用统计中
+"""
+import re
+import json
+from functools import lru_cache
+from typing import List, Tuple, Optional
+
+
+# 默认规则：(正则表达式, 替换文本)，按顺序执行
+DEFAULT_RULES = [
+    (r'^\s*[*●•]\s*', ''),                                   # 开头的未保存标记："● main.py"
+    (r'\s*[*●•]\s*$', ''),                                   # 结尾的未保存标记："main.py *"
+    (r'\s*[*●•](?=\s+-\s)', ''),                             # 标题中段的未保存标记："main.py* - Editor"
+    (r'^\s*[(\[]\d+[)\]]\s*', ''),                           # 未读计数："(3) Inbox"
+    (r'\b\d{4}[-/.]\d{1,2}[-/.]\d{1,2}\b', '<date>'),        # 日期
+    (r'\b\d{1,2}:\d{2}(?::\d{2})?\b', '<time>'),             # 时间
+    (r'\b[A-Za-z]:\\(?:[^\\/:*?"<>|\r\n]+\\)*', ''),         # Windows路径中的目录部分
+    (r'(?<![\w:])/(?:[^/\s]+/)+', ''),                       # Unix路径中的目录部分
+    (r'\s{2,}', ' '),                                        # 多余空白
+]
+
+
+class TitleNormalizer:
+    def __init__(self, rules: Optional[List[Tuple[str, str]]] = None, cache_size: int = 4096):
+        """
+        初始化标题规范化器
+        :param rules: 规则列表 [(正则表达式, 替换文本), ...]，默认使用 DEFAULT_RULES
+        :param cache_size: 原始标题 → 规范化标题的LRU缓存大小
+        """
+        self.rules = [(re.compile(pattern), replacement)
+                      for pattern, replacement in (rules if rules is not None else DEFAULT_RULES)]
+        self.normalize = lru_cache(maxsize=cache_size)(self._normalize)
+
+    @classmethod
+    def from_file(cls, path: str, cache_size: int = 4096) -> 'TitleNormalizer':
+        """
+        从JSON文件加载规则
+        文件格式: {"use_defaults": true, "rules": [["正则表达式", "替换文本"], ...]}
+        """
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+
+        rules = list(DEFAULT_RULES) if config.get('use_defaults', True) else []
+        rules += [(pattern, replacement) for pattern, replacement in config.get('rules', [])]
+        return cls(rules, cache_size)
+
+    def _normalize(self, title: str) -> str:
+        """依次执行所有规则"""
+        normalized = title
+        for pattern, replacement in self.rules:
+            normalized = pattern.sub(replacement, normalized)
+        normalized = normalized.strip()
+        return normalized or title
+
+    def cache_info(self):
+        """获取缓存命中统计"""
+        return self.normalize.cache_info()
+
+
+# 测试代码
+if __name__ == "__main__":
+    normalizer = TitleNormalizer()
+    samples = [
+        "● main.py - focus_insight - Visual Studio Code",
+        "(3) Inbox - Gmail - Google Chrome",
+        "report.docx* - Word",
+        "C:\\Users\\me\\Documents\\plan.xlsx - Excel",
+        "会议纪要 2025-01-06 10:30 - 记事本",
+    ]
+    for sample in samples:
+        print(f"{sample!r} -> {normalizer.normalize(sample)!r}")
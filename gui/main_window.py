@@ -11,10 +11,12 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
 
 from gui.timeline_widget import TimelineWidget
+from gui.session_table import SessionTable
+from gui.range_loader import TimelineRangeLoader
 from data.storage import DataStorage
+from data.live_status import LiveStatusReader, open_session_record
 
 
 
@@ -32,8 +34,20 @@ class MainWindow:
         except:
             pass
 
-        # 初始化数据存储
-        self.storage = DataStorage()
+        # 初始化数据存储（查看器只读，摘要缓存由监控程序写入）
+        self.storage = DataStorage(read_only=True)
+
+        # 实时模式：定期只查询新增的记录
+        self.live_var = tk.BooleanVar(value=False)
+        self.live_interval = 5000  # 毫秒
+        self.live_job = None
+        self.current_date = None
+        self.last_seen_id = 0
+
+        # 监控程序的实时状态（内存映射文件，读取不查询数据库），每秒刷新进行中的会话
+        self.live_status = LiveStatusReader(self.storage.live_status_path)
+        self.live_status_interval = 1000  # 毫秒
+        self.live_status_job = None
 
         # 创建界面
         self.create_menu()
@@ -42,6 +56,7 @@ class MainWindow:
 
         # 加载今日数据
         self.load_today_data()
+        self.live_status_job = self.root.after(self.live_status_interval, self.poll_live_status)
 
         # 绑定窗口关闭事件
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
@@ -66,6 +81,12 @@ class MainWindow:
         view_menu.add_command(label="今日视图", command=lambda: self.change_date("today"))
         view_menu.add_command(label="昨日视图", command=lambda: self.change_date("yesterday"))
         view_menu.add_command(label="选择日期", command=self.select_date)
+        view_menu.add_separator()
+        view_menu.add_command(label="本周报告", command=lambda: self.change_range("week"))
+        view_menu.add_command(label="本月报告", command=lambda: self.change_range("month"))
+        view_menu.add_command(label="选择日期范围", command=self.select_range)
+        view_menu.add_separator()
+        view_menu.add_checkbutton(label="实时模式", variable=self.live_var, command=self.toggle_live_mode)
 
         # 帮助菜单
         help_menu = tk.Menu(menubar, tearoff=0)
@@ -82,14 +103,84 @@ class MainWindow:
         # 创建顶部信息面板
         self.create_info_panel(main_frame)
 
+        # 图表和会话列表分两个标签页
+        self.notebook = ttk.Notebook(main_frame)
+        self.notebook.pack(fill=tk.BOTH, expand=True)
+
         # 创建时间轴组件
-        self.timeline = TimelineWidget(main_frame, width=900, height=400)
-        self.timeline.pack(fill=tk.BOTH, expand=True)
+        chart_tab = ttk.Frame(self.notebook)
+        self.notebook.add(chart_tab, text="图表")
+        self.timeline = TimelineWidget(chart_tab, width=900, height=400)
+        self.timeline.set_range_loader(TimelineRangeLoader(self.storage.db))
+
+        # 创建会话列表组件
+        self.session_table = SessionTable(self.notebook, self.storage.db)
+        self.notebook.add(self.session_table, text="会话列表")
+
+        # 创建搜索页
+        self.create_search_tab(self.notebook)
 
         # 绑定回调函数
         self.timeline.refresh_callback = self.refresh_data
         self.timeline.on_view_change_callback = self.on_view_change
 
+    def create_search_tab(self, notebook):
+        """创建搜索页：按标题/网址搜索窗口会话和浏览器页面"""
+        search_tab = ttk.Frame(notebook, padding=5)
+        notebook.add(search_tab, text="搜索")
+
+        toolbar = ttk.Frame(search_tab)
+        toolbar.pack(fill=tk.X, pady=(0, 5))
+
+        ttk.Label(toolbar, text="搜索:").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(toolbar, textvariable=self.search_var, width=40)
+        search_entry.pack(side=tk.LEFT, padx=5)
+        search_entry.bind('<Return>', lambda e: self.run_search())
+
+        ttk.Label(toolbar, text="范围:").pack(side=tk.LEFT, padx=(10, 0))
+        self.search_range_var = tk.StringVar(value="最近30天")
+        range_combo = ttk.Combobox(toolbar, textvariable=self.search_range_var, width=10, state='readonly',
+                                   values=["今天", "最近7天", "最近30天", "全部"])
+        range_combo.pack(side=tk.LEFT, padx=5)
+        range_combo.bind('<<ComboboxSelected>>', lambda e: self.run_search())
+
+        ttk.Button(toolbar, text="搜索", command=self.run_search).pack(side=tk.LEFT, padx=5)
+
+        columns = [('source', '来源', 60), ('app', '应用', 120), ('title', '标题', 380),
+                   ('total_duration', '总时长', 80), ('session_count', '次数', 50), ('last_seen', '最后出现', 150)]
+        self.search_tree = ttk.Treeview(search_tab, columns=[name for name, _, _ in columns], show='headings')
+        for name, heading, width in columns:
+            self.search_tree.heading(name, text=heading)
+            self.search_tree.column(name, width=width, stretch=(name == 'title'))
+        self.search_tree.pack(fill=tk.BOTH, expand=True)
+
+    def run_search(self):
+        """执行搜索并显示结果"""
+        query = self.search_var.get().strip()
+        self.search_tree.delete(*self.search_tree.get_children())
+        if not query:
+            return
+
+        days = {"今天": 0, "最近7天": 6, "最近30天": 29}.get(self.search_range_var.get())
+        start_time = None
+        if days is not None:
+            start_time = datetime.combine(datetime.now().date() - timedelta(days=days), datetime.min.time())
+
+        try:
+            results = self.storage.db.search_activities(query, start_time, None, limit=200)
+        except Exception as e:
+            messagebox.showerror("错误", f"搜索时出错: {e}")
+            return
+
+        for result in results:
+            source = "窗口" if result['source'] == 'window' else "浏览器"
+            minutes = (result['total_duration'] or 0) / 60
+            self.search_tree.insert('', tk.END, values=(source, result['app'], result['title'],
+                                                        f"{minutes:.1f}分钟", result['session_count'],
+                                                        str(result['last_seen'])[:19]))
+        self.update_status(f"找到 {len(results)} 条与“{query}”相关的结果")
+
     def create_info_panel(self, parent):
         """创建信息面板"""
         info_frame = ttk.LabelFrame(parent, text="今日统计", padding=10)
@@ -115,6 +206,10 @@ class MainWindow:
         self.update_time_label = ttk.Label(stats_frame, text="最后更新: --", font=("Arial", 9))
         self.update_time_label.pack(side=tk.RIGHT)
 
+        # 监控程序的实时状态
+        self.live_status_label = ttk.Label(info_frame, text="当前: 监控程序未运行", font=("Arial", 9))
+        self.live_status_label.pack(fill=tk.X, pady=(5, 0))
+
     def create_status_bar(self):
         """创建状态栏"""
         self.status_bar = ttk.Label(self.root, text="就绪", relief=tk.SUNKEN, anchor=tk.W)
@@ -131,14 +226,26 @@ class MainWindow:
 
             print(f"查询时间范围: {start_time} 到 {end_time}")
 
-            # 从数据库获取数据
-            window_data = self.storage.db.get_window_activities(start_time, end_time)
+            # 从数据库获取数据（先记录最大id，之后的增量查询从这里或返回记录的最大id开始）
+            max_id = self.storage.db.get_max_id('window_activities')
+            window_data = self.storage.db.get_window_activities(start_time, end_time, clip=True)
+            self.advance_last_seen(max_id, window_data)
+            self.current_date = today
 
             print(f"从数据库获取到 {len(window_data)} 条记录")
 
+            # 进行中的会话随时间轴一起绘制
+            self.update_live_status(redraw=False)
+
+            # 每分钟输入强度
+            self.timeline.set_input_series(self.storage.db.get_input_minutes(start_time, end_time))
+
             # 更新时间轴
             self.timeline.set_data(window_data)
 
+            # 更新会话列表
+            self.session_table.set_range(start_time, end_time)
+
             # 更新统计信息
             self.update_statistics()
 
@@ -153,11 +260,14 @@ class MainWindow:
             messagebox.showerror("错误", f"加载数据时出错: {e}")
             self.update_status(f"错误: {e}")
 
-    def update_statistics(self):
-        """更新统计信息"""
+    def update_statistics(self, target_date=None):
+        """
+        更新统计信息
+        :param target_date: 日期，默认今天（摘要有缓存，切换日期只需一次索引查询）
+        """
         try:
-            # 获取今日摘要
-            summary = self.storage.get_today_summary()
+            # 获取摘要
+            summary = self.storage.get_daily_summary(target_date or datetime.now().date())
 
             # 更新标签
             active_hours = summary['total_active_time'] / 3600
@@ -210,14 +320,27 @@ class MainWindow:
             end_time = datetime.combine(target_date, datetime.max.time())
 
             # 获取数据
-            window_data = self.storage.db.get_window_activities(start_time, end_time)
+            max_id = self.storage.db.get_max_id('window_activities')
+            window_data = self.storage.db.get_window_activities(start_time, end_time, clip=True)
+            self.advance_last_seen(max_id, window_data)
+            self.current_date = target_date
+            self.update_live_status(redraw=False)
+
+            # 每分钟输入强度
+            self.timeline.set_input_series(self.storage.db.get_input_minutes(start_time, end_time))
 
             # 更新时间轴
             self.timeline.set_data(window_data)
 
+            # 更新会话列表
+            self.session_table.set_range(start_time, end_time)
+
             # 更新日期输入框
             self.timeline.date_var.set(target_date.strftime("%Y-%m-%d"))
 
+            # 更新统计信息
+            self.update_statistics(target_date)
+
             # 更新状态
             self.update_status(f"已加载 {target_date} 的数据")
             self.update_last_update_time()
@@ -225,6 +348,143 @@ class MainWindow:
         except Exception as e:
             messagebox.showerror("错误", f"加载指定日期数据时出错: {e}")
 
+    def advance_last_seen(self, max_id: int, records):
+        """
+        更新增量查询的起点：取查询前的最大id和返回记录中的最大id中较大者
+        （两次查询之间写入的记录已包含在结果中，下次轮询不会再追加一遍）
+        """
+        self.last_seen_id = max([max_id] + [record['id'] for record in records])
+
+    def toggle_live_mode(self):
+        """开启/关闭实时模式"""
+        if self.live_job is not None:
+            self.root.after_cancel(self.live_job)
+            self.live_job = None
+
+        if self.live_var.get():
+            self.update_status(f"实时模式：每 {self.live_interval // 1000} 秒检查新记录")
+            self.live_job = self.root.after(self.live_interval, self.poll_live)
+        else:
+            self.update_status("实时模式已关闭")
+
+    def poll_live(self):
+        """实时模式轮询：只查询 id 大于上次所见的记录并追加到当前视图"""
+        self.live_job = None
+        try:
+            today = datetime.now().date()
+            if self.current_date == today - timedelta(days=1):
+                # 跨过零点：切换到新的一天
+                self.load_today_data()
+            elif self.current_date == today:
+                start_time = datetime.combine(today, datetime.min.time())
+                end_time = datetime.combine(today, datetime.max.time())
+
+                max_id = self.storage.db.get_max_id('window_activities')
+                if max_id > self.last_seen_id:
+                    records = self.storage.db.get_window_activities(start_time, end_time, clip=True,
+                                                                    after_id=self.last_seen_id)
+                    self.advance_last_seen(max_id, records)
+                    self.timeline.append_data(records)
+                    self.update_status(f"实时模式：新增 {len(records)} 条记录")
+                    self.update_last_update_time()
+
+                # 摘要缓存按数据版本失效，没有新数据时只有一次索引查询
+                self.update_statistics(today)
+        except Exception as e:
+            print(f"实时刷新时出错: {e}")
+        finally:
+            if self.live_var.get():
+                self.live_job = self.root.after(self.live_interval, self.poll_live)
+
+    def update_live_status(self, redraw: bool = True):
+        """
+        读取监控程序的实时状态：更新状态标签，查看今天时在时间轴上显示进行中的会话
+        :param redraw: 是否立即更新时间轴（加载数据时由随后的完整绘制显示）
+        """
+        status = self.live_status.read()
+        if status is None:
+            self.live_status_label.config(text="当前: 监控程序未运行")
+        elif status['is_idle']:
+            self.live_status_label.config(text="当前: 💤 空闲")
+        elif status['session_start'] is None:
+            self.live_status_label.config(text="当前: --")
+        else:
+            minutes = (status['updated_at'] - status['session_start']).total_seconds() / 60
+            text = f"当前: {status['process_name']} - {status['window_title'][:40]} ({minutes:.1f}分钟)"
+            if status['counting']:
+                text += f"  ⌨️ {status['keyboard_rate']:.0f}/分钟  🖱️ {status['mouse_rate']:.0f}/分钟"
+            self.live_status_label.config(text=text)
+
+        record = open_session_record(status) if self.current_date == datetime.now().date() else None
+        if redraw:
+            self.timeline.set_live_session(record)
+        else:
+            self.timeline.live_session = record
+
+    def poll_live_status(self):
+        """每秒读取一次实时状态（只读共享内存，不查询数据库）"""
+        self.live_status_job = None
+        try:
+            self.update_live_status()
+        except Exception as e:
+            print(f"读取实时状态时出错: {e}")
+        finally:
+            self.live_status_job = self.root.after(self.live_status_interval, self.poll_live_status)
+
+    def change_range(self, range_type):
+        """切换到周/月范围报告"""
+        today = datetime.now().date()
+        if range_type == "week":
+            start_date = today - timedelta(days=today.weekday())
+            end_date = start_date + timedelta(days=6)
+        elif range_type == "month":
+            start_date = today.replace(day=1)
+            next_month = (start_date + timedelta(days=32)).replace(day=1)
+            end_date = next_month - timedelta(days=1)
+        else:
+            return
+
+        self.load_range_report(start_date, end_date)
+
+    def select_range(self):
+        """选择日期范围"""
+        from tkinter import simpledialog
+        range_str = simpledialog.askstring("选择日期范围", "请输入日期范围 (YYYY-MM-DD YYYY-MM-DD):")
+        if range_str:
+            try:
+                start_str, end_str = range_str.split()
+                start_date = datetime.strptime(start_str, "%Y-%m-%d").date()
+                end_date = datetime.strptime(end_str, "%Y-%m-%d").date()
+                if end_date < start_date:
+                    start_date, end_date = end_date, start_date
+                self.load_range_report(start_date, end_date)
+            except ValueError:
+                messagebox.showerror("错误", "日期范围格式不正确，请使用 YYYY-MM-DD YYYY-MM-DD 格式")
+
+    def load_range_report(self, start_date, end_date):
+        """加载日期范围报告（基于小时聚合表，不读取原始记录）"""
+        try:
+            report = self.storage.get_range_report(
+                datetime.combine(start_date, datetime.min.time()),
+                datetime.combine(end_date, datetime.min.time())
+            )
+
+            self.timeline.draw_range_report(report)
+            self.current_date = None
+
+            # 更新统计标签
+            active_hours = report['total_time'] / 3600
+            active_days = sum(1 for item in report['daily_trend'] if item['seconds'] > 0)
+            self.active_time_label.config(text=f"活跃时间: {active_hours:.2f}小时")
+            self.app_count_label.config(text=f"应用数量: {len(report['app_totals'])}")
+            self.efficiency_label.config(text=f"活跃天数: {active_days}")
+
+            self.update_status(f"已加载 {start_date} 到 {end_date} 的范围报告")
+            self.update_last_update_time()
+
+        except Exception as e:
+            messagebox.showerror("错误", f"加载范围报告时出错: {e}")
+
     def export_data(self):
         """导出数据"""
         try:
@@ -257,10 +517,15 @@ class MainWindow:
 1. 时间轴视图：显示一天中应用使用的时间分布
 2. 饼图视图：显示各应用使用时间占比
 3. 条形图视图：显示应用使用时间排行
+4. 周/月报告：显示应用总计、每日趋势和星期×小时热力图
+5. 会话列表：逐条查看窗口会话，可按应用或标题筛选，点击列标题排序
+6. 搜索：按窗口标题或网页标题/网址搜索，结果按相关度和总时长排序
 
 操作说明：
 • 将鼠标悬停在时间轴上查看详细信息
+• 滚轮缩放、按住左键拖动平移时间轴，或选择15分钟到7天的预设范围
 • 使用日期选择器查看不同日期的数据
+• 开启“视图 → 实时模式”后，新记录会自动追加到今日视图
 • 可以导出数据为JSON格式
 
 快捷键：
@@ -312,6 +577,11 @@ class MainWindow:
     def on_closing(self):
         """窗口关闭事件"""
         if messagebox.askokcancel("退出", "确定要退出 Focus-Insight 吗？"):
+            if self.live_job is not None:
+                self.root.after_cancel(self.live_job)
+            if self.live_status_job is not None:
+                self.root.after_cancel(self.live_status_job)
+            self.live_status.close()
             self.storage.close()
             self.root.destroy()
 
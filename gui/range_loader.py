@@ -0,0 +1,124 @@
+"""
+时间轴按需加载模块
+按可见范围分块读取数据并只缓存最近使用的若干块，无论向前翻看多久内存都保持稳定；
+缩放级别决定读取原始会话（放大时）还是小时聚合（缩小到多天时）
+"""
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Tuple, Optional
+
+from data.intervals import to_datetime
+
+
+# 可见跨度不超过该值时显示原始会话，否则显示小时聚合
+RAW_MAX_SPAN = timedelta(days=2)
+
+# 每个缓存块覆盖的时长
+CHUNK_SPANS = {
+    'raw': timedelta(days=1),
+    'hourly': timedelta(days=7),
+}
+
+
+class TimelineRangeLoader:
+    def __init__(self, db, max_chunks: int = 16):
+        """
+        初始化按需加载器
+        :param db: Database实例
+        :param max_chunks: 最多缓存的数据块数量（最近最少使用的块先被丢弃）
+        """
+        self.db = db
+        self.max_chunks = max_chunks
+        self.chunks: 'OrderedDict[Tuple[str, datetime], List[Dict[str, Any]]]' = OrderedDict()
+
+    @staticmethod
+    def choose_lod(span: timedelta) -> str:
+        """根据可见跨度选择细节级别：'raw' 或 'hourly'"""
+        return 'raw' if span <= RAW_MAX_SPAN else 'hourly'
+
+    @staticmethod
+    def _chunk_start(moment: datetime, lod: str) -> datetime:
+        """时间点所在块的起点：原始会话按天分块，小时聚合按周（周一）分块"""
+        day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        if lod == 'hourly':
+            day -= timedelta(days=day.weekday())
+        return day
+
+    def _chunk_keys(self, start: datetime, end: datetime, lod: str) -> List[Tuple[str, datetime]]:
+        """覆盖 [start, end] 的所有块"""
+        keys = []
+        chunk = self._chunk_start(start, lod)
+        while chunk <= end:
+            keys.append((lod, chunk))
+            chunk += CHUNK_SPANS[lod]
+        return keys
+
+    def _load_chunk(self, lod: str, chunk_start: datetime) -> List[Dict[str, Any]]:
+        """从数据库读取一个块"""
+        chunk_end = chunk_start + CHUNK_SPANS[lod]
+        if lod == 'raw':
+            records = self.db.get_window_activities(chunk_start, chunk_end - timedelta(microseconds=1), clip=True)
+            for record in records:
+                record['start_time'] = to_datetime(record['start_time'])
+                record['end_time'] = to_datetime(record['end_time'])
+            return records
+
+        # 小时聚合：每小时内按应用时长依次排开，宽度即该应用在这一小时的使用时长
+        records = []
+        cursor_time = None
+        current_hour = None
+        for bucket in self.db.get_hourly_buckets(chunk_start, chunk_end):
+            hour = to_datetime(bucket['bucket_start'])
+            if hour != current_hour:
+                current_hour = hour
+                cursor_time = hour
+            end_time = cursor_time + timedelta(seconds=bucket['seconds'])
+            records.append({
+                'process_name': bucket['process_name'],
+                'window_title': f"{hour:%m-%d %H}时汇总",
+                'start_time': cursor_time,
+                'end_time': end_time,
+                'duration': bucket['seconds'],
+            })
+            cursor_time = end_time
+        return records
+
+    def _get_chunk(self, key: Tuple[str, datetime]) -> List[Dict[str, Any]]:
+        """读取一个块，优先使用缓存"""
+        if key in self.chunks:
+            self.chunks.move_to_end(key)
+            return self.chunks[key]
+
+        records = self._load_chunk(*key)
+        self.chunks[key] = records
+        while len(self.chunks) > self.max_chunks:
+            self.chunks.popitem(last=False)
+        return records
+
+    def get(self, start: datetime, end: datetime, lod: Optional[str] = None) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        获取与可见范围重叠的记录
+        :param lod: 细节级别，默认按跨度自动选择
+        :return: (细节级别, 记录列表)
+        """
+        lod = lod or self.choose_lod(end - start)
+        records = []
+        for key in self._chunk_keys(start, end, lod):
+            for record in self._get_chunk(key):
+                if record['start_time'] <= end and record['end_time'] >= start:
+                    records.append(record)
+        return lod, records
+
+    def prefetch(self, start: datetime, end: datetime, lod: Optional[str] = None):
+        """预先加载可见范围前后各一个跨度的数据，平移时不必等待查询"""
+        lod = lod or self.choose_lod(end - start)
+        span = end - start
+        for key in self._chunk_keys(start - span, start, lod) + self._chunk_keys(end, end + span, lod):
+            if key not in self.chunks:
+                self._get_chunk(key)
+
+    def invalidate(self, start: datetime, end: datetime):
+        """丢弃与时间范围重叠的缓存块（有新数据写入时调用）"""
+        for lod in CHUNK_SPANS:
+            for key in self._chunk_keys(start, end, lod):
+                self.chunks.pop(key, None)
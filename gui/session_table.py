@@ -0,0 +1,225 @@
+"""
+会话列表组件
+用 ttk.Treeview 分页显示窗口活动记录：按键集分页从数据库读取，
+滚动时在两端加载/丢弃整页，控件中始终只保留少量几页，十万条记录的一天也能流畅滚动
+"""
+import tkinter as tk
+from tkinter import ttk
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+
+# 列定义：(列名, 标题, 宽度)
+COLUMNS = [
+    ('start_time', '开始时间', 150),
+    ('end_time', '结束时间', 150),
+    ('duration', '时长', 80),
+    ('process_name', '应用', 140),
+    ('window_title', '窗口标题', 420),
+]
+
+ALL_APPS = '全部应用'
+
+
+class SessionTable(ttk.Frame):
+    def __init__(self, parent, db, page_size: int = 200, max_pages: int = 3, **kwargs):
+        """
+        初始化会话列表
+        :param db: Database实例
+        :param page_size: 每页条数
+        :param max_pages: 控件中最多同时保留的页数
+        """
+        super().__init__(parent, **kwargs)
+        self.db = db
+        self.page_size = page_size
+        self.max_pages = max_pages
+
+        # 查询条件
+        self.start_date = None
+        self.end_date = None
+        self.sort = 'start_time'
+        self.descending = True
+
+        # 第 i 页的起始游标：page_cursors[i] 是第 i-1 页最后一条的 (排序值, id)
+        self.page_cursors: List[Optional[Tuple[Any, int]]] = [None]
+        # 已加载的页：[(页号, [条目id, ...]), ...]，按页号递增
+        self.loaded_pages: List[Tuple[int, List[str]]] = []
+        self.total_count = 0
+        self.loading = False
+
+        self.create_toolbar()
+        self.create_tree()
+
+    def create_toolbar(self):
+        """创建筛选工具栏"""
+        toolbar = ttk.Frame(self)
+        toolbar.pack(fill=tk.X, pady=(0, 5))
+
+        ttk.Label(toolbar, text="应用:").pack(side=tk.LEFT)
+        self.app_var = tk.StringVar(value=ALL_APPS)
+        self.app_combo = ttk.Combobox(toolbar, textvariable=self.app_var, width=20, state='readonly')
+        self.app_combo.pack(side=tk.LEFT, padx=(5, 15))
+        self.app_combo.bind('<<ComboboxSelected>>', lambda e: self.reload())
+
+        ttk.Label(toolbar, text="标题包含:").pack(side=tk.LEFT)
+        self.title_var = tk.StringVar()
+        title_entry = ttk.Entry(toolbar, textvariable=self.title_var, width=30)
+        title_entry.pack(side=tk.LEFT, padx=5)
+        title_entry.bind('<Return>', lambda e: self.reload())
+        ttk.Button(toolbar, text="筛选", command=self.reload).pack(side=tk.LEFT, padx=5)
+
+        self.count_label = ttk.Label(toolbar, text="共 0 条")
+        self.count_label.pack(side=tk.RIGHT)
+
+    def create_tree(self):
+        """创建表格和滚动条"""
+        frame = ttk.Frame(self)
+        frame.pack(fill=tk.BOTH, expand=True)
+
+        self.tree = ttk.Treeview(frame, columns=[name for name, _, _ in COLUMNS], show='headings')
+        for name, heading, width in COLUMNS:
+            self.tree.heading(name, text=heading, command=lambda column=name: self.sort_by(column))
+            self.tree.column(name, width=width, stretch=(name == 'window_title'),
+                             anchor=tk.E if name == 'duration' else tk.W)
+
+        self.scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.on_scroll)
+
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+    def set_range(self, start_date: datetime, end_date: datetime):
+        """设置时间范围并重新加载"""
+        self.start_date = start_date
+        self.end_date = end_date
+
+        apps = self.db.get_process_names(start_date, end_date)
+        self.app_combo['values'] = [ALL_APPS] + apps
+        if self.app_var.get() not in apps:
+            self.app_var.set(ALL_APPS)
+
+        self.reload()
+
+    def sort_by(self, column: str):
+        """点击列标题排序，再次点击同一列切换升降序"""
+        if column not in self.db.PAGE_SORT_COLUMNS:
+            return
+        if column == self.sort:
+            self.descending = not self.descending
+        else:
+            self.sort = column
+            self.descending = column != 'process_name'
+
+        for name, heading, _ in COLUMNS:
+            arrow = (' ▼' if self.descending else ' ▲') if name == self.sort else ''
+            self.tree.heading(name, text=heading + arrow)
+
+        self.reload()
+
+    def _filters(self) -> Dict[str, Any]:
+        """当前的筛选条件"""
+        app = self.app_var.get()
+        return {
+            'process_name': None if app == ALL_APPS else app,
+            'title_filter': self.title_var.get().strip() or None,
+        }
+
+    def reload(self):
+        """按当前条件从第一页重新加载"""
+        self.tree.delete(*self.tree.get_children())
+        self.page_cursors = [None]
+        self.loaded_pages = []
+
+        if self.start_date is None:
+            return
+
+        self.total_count = self.db.count_window_activities(self.start_date, self.end_date, **self._filters())
+        self.load_page(0, at_end=True)
+        self.update_count_label()
+
+    def load_page(self, index: int, at_end: bool):
+        """
+        加载一页并插入到表格的一端
+        :param index: 页号
+        :param at_end: True 插入到底部，False 插入到顶部
+        """
+        rows = self.db.get_window_activities_page(
+            self.start_date, self.end_date, after=self.page_cursors[index], limit=self.page_size,
+            sort=self.sort, descending=self.descending, **self._filters()
+        )
+
+        if not rows:
+            # 上一页恰好是最后一页，撤销为它记录的游标
+            if index > 0:
+                del self.page_cursors[index:]
+            return
+
+        # 整页读满时才可能还有下一页，记录下一页的起始游标
+        if len(rows) == self.page_size and len(self.page_cursors) == index + 1:
+            last = rows[-1]
+            self.page_cursors.append((last[self.sort], last['id']))
+
+        position = tk.END if at_end else 0
+        rows_to_insert = rows if at_end else reversed(rows)
+        item_ids = [self.tree.insert('', position, values=self.format_row(row)) for row in rows_to_insert]
+        if not at_end:
+            item_ids.reverse()
+
+        if at_end:
+            self.loaded_pages.append((index, item_ids))
+        else:
+            self.loaded_pages.insert(0, (index, item_ids))
+
+    def format_row(self, row: Dict[str, Any]) -> tuple:
+        """把记录转换为表格行"""
+        duration = row['duration'] or 0
+        minutes, seconds = divmod(int(duration), 60)
+        hours, minutes = divmod(minutes, 60)
+        duration_text = f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+        return (str(row['start_time'])[:19], str(row['end_time'])[:19], duration_text,
+                row['process_name'], row['window_title'])
+
+    def on_scroll(self, first: str, last: str):
+        """滚动回调：接近底部时加载下一页，接近顶部时加载上一页"""
+        self.scrollbar.set(first, last)
+        if self.loading or not self.loaded_pages:
+            return
+
+        first, last = float(first), float(last)
+        self.loading = True
+        try:
+            if last > 0.9 and self.loaded_pages[-1][0] + 1 < len(self.page_cursors):
+                anchor = self.tree.get_children()[int(len(self.tree.get_children()) * first)]
+                self.load_page(self.loaded_pages[-1][0] + 1, at_end=True)
+                if len(self.loaded_pages) > self.max_pages:
+                    self.drop_page(at_end=False)
+                self.restore_anchor(anchor)
+            elif first < 0.1 and self.loaded_pages[0][0] > 0:
+                anchor = self.tree.get_children()[int(len(self.tree.get_children()) * first)]
+                self.load_page(self.loaded_pages[0][0] - 1, at_end=False)
+                if len(self.loaded_pages) > self.max_pages:
+                    self.drop_page(at_end=True)
+                self.restore_anchor(anchor)
+        finally:
+            self.loading = False
+        self.update_count_label()
+
+    def drop_page(self, at_end: bool):
+        """丢弃一端的整页，保持控件中的行数不变"""
+        index, item_ids = self.loaded_pages.pop() if at_end else self.loaded_pages.pop(0)
+        self.tree.delete(*item_ids)
+
+    def restore_anchor(self, anchor: str):
+        """加载/丢弃页之后把视图滚回到原来的首行"""
+        if self.tree.exists(anchor):
+            children = self.tree.get_children()
+            self.tree.yview_moveto(children.index(anchor) / max(len(children), 1))
+
+    def update_count_label(self):
+        """显示当前加载的记录范围"""
+        if not self.loaded_pages:
+            self.count_label.config(text="共 0 条")
+            return
+        first_row = self.loaded_pages[0][0] * self.page_size + 1
+        last_row = first_row + sum(len(ids) for _, ids in self.loaded_pages) - 1
+        self.count_label.config(text=f"第 {first_row}-{last_row} 条 / 共 {self.total_count} 条")
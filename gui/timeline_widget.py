@@ -2,20 +2,29 @@
 时间轴组件
 负责显示时间轴视图，类似RescueTime的风格
 """
+import bisect
 import tkinter as tk
 from tkinter import ttk
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.patches import Rectangle
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Tuple
-import matplotlib.patches as mpatches
-from matplotlib.dates import DateFormatter, HourLocator, date2num
-import matplotlib.font_manager as fm
+from typing import List, Dict, Any, Tuple, Optional
+from matplotlib.dates import num2date
 
-# 设置中文字体
-plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'SimSun', 'Arial Unicode MS']
-plt.rcParams['axes.unicode_minus'] = False
+from reporting import charts
+
+# 缩放预设范围
+ZOOM_PRESETS = {
+    "15分钟": timedelta(minutes=15),
+    "1小时": timedelta(hours=1),
+    "4小时": timedelta(hours=4),
+    "1天": timedelta(days=1),
+    "3天": timedelta(days=3),
+    "7天": timedelta(days=7),
+}
+MIN_SPAN = timedelta(minutes=15)
+MAX_SPAN = timedelta(days=7)
 
 
 class TimelineWidget:
@@ -30,18 +39,43 @@ class TimelineWidget:
         self.width = width
         self.height = height
 
-        # 应用颜色映射
-        self.app_colors = {
-            'chrome.exe': '#4285F4',      # Google蓝
-            'firefox.exe': '#FF6611',     # Firefox橙
-            'msedge.exe': '#0078D4',      # Edge蓝
-            'explorer.exe': '#00BCF2',    # Windows蓝
-            'cmd.exe': '#000000',         # 黑色
-            'python.exe': '#3776AB',      # Python蓝
-            'zed.exe': '#FFA500',         # 橙色
-            'code.exe': '#007ACC',        # VS Code蓝
-            'default': '#888888'          # 默认灰色
-        }
+        # 应用颜色映射（与无界面报告共用）
+        self.app_colors = charts.APP_COLORS
+
+        # 每分钟输入计数（用于在时间轴上方绘制活动强度）
+        self.input_series = None
+
+        # 范围报告使用的多个子图（为空表示单坐标轴模式）
+        self.range_axes = []
+
+        # 当前数据及按应用累计的时长（实时模式下增量更新）
+        self.data = []
+        self.app_usage = {}
+
+        # 时间块高度和当前数据的时间范围
+        self.bar_height = charts.BAR_HEIGHT
+        self.time_limits = None
+
+        # 悬停：按开始时间排序的会话索引（用二分查找命中），以及缓存的静态背景
+        self.sessions = []
+        self.session_starts = []
+        self.sessions_sorted = True
+        self.background = None
+        self.overlay = None
+        self.hovered_record = None
+        self.layout_key = None
+
+        # 进行中的会话（来自监控程序的实时状态，不在数据库中）及其时间块
+        self.live_session = None
+        self.live_patch = None
+
+        # 缩放/平移：按需加载器、当前可见范围（None表示显示整天）、细节级别和拖动状态
+        self.range_loader = None
+        self.view_start = None
+        self.view_end = None
+        self.lod = 'raw'
+        self.drag_start = None
+        self.reload_job = None
 
         # 创建主框架
         self.main_frame = ttk.Frame(parent)
@@ -78,6 +112,14 @@ class TimelineWidget:
         view_combo.pack(side=tk.LEFT)
         view_combo.bind("<<ComboboxSelected>>", self.on_view_changed)
 
+        # 缩放预设
+        ttk.Label(control_frame, text="范围:").pack(side=tk.LEFT, padx=(10, 5))
+        self.zoom_var = tk.StringVar(value="1天")
+        zoom_combo = ttk.Combobox(control_frame, textvariable=self.zoom_var,
+                                  values=list(ZOOM_PRESETS), width=8, state="readonly")
+        zoom_combo.pack(side=tk.LEFT)
+        zoom_combo.bind("<<ComboboxSelected>>", self.on_zoom_preset)
+
     def create_chart_area(self):
         """创建图表区域"""
         # 创建matplotlib图形
@@ -90,6 +132,16 @@ class TimelineWidget:
 
         # 绑定鼠标事件
         self.canvas.mpl_connect('motion_notify_event', self.on_mouse_hover)
+        self.canvas.mpl_connect('axes_leave_event', lambda event: self.hide_hover())
+
+        # 每次完整重绘后缓存背景，悬停时只重绘覆盖层
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        self.canvas.mpl_connect('resize_event', self.on_resize)
+
+        # 滚轮缩放、拖动平移
+        self.canvas.mpl_connect('scroll_event', self.on_scroll)
+        self.canvas.mpl_connect('button_press_event', self.on_button_press)
+        self.canvas.mpl_connect('button_release_event', self.on_button_release)
 
     def create_detail_area(self):
         """创建详细信息区域"""
@@ -104,236 +156,317 @@ class TimelineWidget:
 
     def get_app_color(self, process_name: str) -> str:
         """获取应用颜色"""
-        return self.app_colors.get(process_name.lower(), self.app_colors['default'])
+        return charts.get_app_color(process_name)
 
-    def draw_timeline(self, data: List[Dict[str, Any]]):
-        """绘制时间轴"""
+    def _use_single_axes(self):
+        """确保图表区域只有一个坐标轴（范围报告会把它替换为多个子图）"""
+        if self.range_axes:
+            self.fig.clear()
+            self.ax = self.fig.add_subplot(111)
+            self.range_axes = []
+
+    def draw_timeline(self, data: List[Dict[str, Any]],
+                      limits: Optional[Tuple[datetime, datetime]] = None):
+        """
+        绘制时间轴
+        :param limits: 固定的可见范围（缩放/平移时），默认按数据范围自动设置
+        """
+        self._use_single_axes()
         self.ax.clear()
+        self.time_limits = None
+        self.reset_hover()
 
         print(f"开始绘制时间轴，数据条数: {len(data)}")
 
-        if not data:
-            self.ax.text(0.5, 0.5, '暂无数据\n请先运行监控程序收集数据', ha='center', va='center',
-                        transform=self.ax.transAxes, fontsize=14)
+        if not data and limits is None and self.live_session is None:
+            charts.draw_no_data(self.ax)
             self.canvas.draw()
             return
 
-        # 计算时间范围
-        times = []
-        colors = []
-        labels = []
-        durations = []
-
-        for record in data:
-            start_time = record['start_time']
-            if isinstance(start_time, str):
-                start_time = datetime.fromisoformat(start_time)
-
-            end_time = record['end_time']
-            if isinstance(end_time, str):
-                end_time = datetime.fromisoformat(end_time)
-
-            times.append((start_time, end_time))
-            colors.append(self.get_app_color(record['process_name']))
-            labels.append(f"{record['process_name']}\n{record['window_title'][:30]}...")
-            durations.append(record['duration'])
-
-        print(f"处理了 {len(times)} 个时间块")
-
-        # 绘制时间轴块
-        y_pos = 0
-        bar_height = 0.8
-
-        for i, ((start_time, end_time), color, label) in enumerate(zip(times, colors, labels)):
-            # 转换为matplotlib时间格式
-            start_num = date2num(start_time)
-            end_num = date2num(end_time)
-            width = end_num - start_num
+        # 按数据范围显示时记录时间范围（实时追加时扩展），进行中的会话也计入范围
+        if limits is None:
+            bounds = data + [self.live_session] if self.live_session is not None else data
+            self.time_limits = (min(self._parse_time(record['start_time']) for record in bounds),
+                                max(self._parse_time(record['end_time']) for record in bounds))
+            limits = charts.padded_limits(*self.time_limits)
 
-            # 绘制矩形块
-            rect = Rectangle((start_num, y_pos), width, bar_height,
-                           facecolor=color, edgecolor='white', linewidth=1,
-                           picker=True)
-            self.ax.add_patch(rect)
+        # 绘制时间块、输入强度、坐标轴和图例，返回的时间块登记到悬停索引
+        self.sessions = charts.draw_timeline(self.ax, data, self.app_usage, self.input_series,
+                                             limits=limits, bar_height=self.bar_height)
+        self.sessions_sorted = False
 
-            # 存储矩形信息用于鼠标悬停
-            rect.record = data[i]
+        print(f"处理了 {len(data)} 个时间块")
 
-        # 设置坐标轴
-        if times:
-            all_times = [t for time_pair in times for t in time_pair]
-            min_time = min(all_times)
-            max_time = max(all_times)
+        # 悬停用的高亮框、十字线和提示框，以及进行中会话的时间块
+        self.create_overlay()
+        if self.live_session is not None:
+            self.live_patch = charts.add_live_session_patch(self.ax, self.live_session, self.bar_height)
 
-            # 扩展时间范围
-            time_range = max_time - min_time
-            if time_range.total_seconds() == 0:
-                time_range = timedelta(hours=1)  # 至少显示1小时
+        # 调整布局（只在视图类型或窗口大小变化后重新计算）
+        self.apply_layout('timeline')
 
-            min_time = min_time - time_range * 0.05
-            max_time = max_time + time_range * 0.05
-
-            self.ax.set_xlim(min_time, max_time)
-            self.ax.set_ylim(-0.5, 1.5)
-
-            # 设置x轴格式
-            self.ax.xaxis.set_major_formatter(DateFormatter('%H:%M'))
-            self.ax.xaxis.set_major_locator(HourLocator(interval=2))
-
-            # 旋转x轴标签
-            plt.setp(self.ax.get_xticklabels(), rotation=45, ha='right')
-
-        # 隐藏y轴
-        self.ax.set_yticks([])
-        self.ax.set_ylabel('')
+        # 刷新画布
+        self.canvas.draw()
+        print("时间轴绘制完成")
 
-        # 设置标题
-        self.ax.set_title('Timeline - Application Usage', fontsize=16, fontweight='bold', pad=20)
+    @staticmethod
+    def _parse_time(value) -> datetime:
+        """数据库中的时间可能是字符串"""
+        return charts.parse_time(value)
 
-        # 添加网格
-        self.ax.grid(True, axis='x', alpha=0.3)
+    def _add_session_patch(self, record: Dict[str, Any]):
+        """为一条会话添加时间块"""
+        start_num, end_num = charts.add_session_patch(self.ax, record, self.bar_height)
 
-        # 添加图例
-        self.add_legend(data)
+        # 登记到悬停索引，查找前再排序
+        self.sessions.append((start_num, end_num, record))
+        self.sessions_sorted = False
 
-        # 调整布局
-        self.fig.tight_layout()
+    def _set_time_limits(self, min_time: datetime, max_time: datetime):
+        """设置时间范围，两侧各留5%的空白"""
+        self.time_limits = (min_time, max_time)
+        self.ax.set_xlim(*charts.padded_limits(min_time, max_time))
 
-        # 刷新画布
-        self.canvas.draw()
-        print("时间轴绘制完成")
+    def set_input_series(self, series):
+        """设置每分钟输入计数，下次绘制时间轴时生效"""
+        self.input_series = series
 
-    def add_legend(self, data: List[Dict[str, Any]]):
+    def add_legend(self):
         """添加图例"""
-        # 统计应用使用时间
-        app_usage = {}
-        for record in data:
-            app = record['process_name']
-            duration = record['duration']
-            if app in app_usage:
-                app_usage[app] += duration
-            else:
-                app_usage[app] = duration
-
-        # 创建图例项
-        legend_items = []
-        for app, duration in sorted(app_usage.items(), key=lambda x: x[1], reverse=True)[:8]:
-            color = self.get_app_color(app)
-            label = f"{app} ({duration/60:.1f}分钟)"
-            legend_items.append(mpatches.Patch(color=color, label=label))
-
-        if legend_items:
-            self.ax.legend(handles=legend_items, loc='upper right', fontsize=8)
+        charts.add_legend(self.ax, self.app_usage)
 
     def draw_pie_chart(self, data: List[Dict[str, Any]]):
         """绘制饼图"""
+        self._use_single_axes()
         self.ax.clear()
+        self.reset_hover()
 
         print(f"开始绘制饼图，数据条数: {len(data)}")
 
         if not data:
-            self.ax.text(0.5, 0.5, '暂无数据\n请先运行监控程序收集数据', ha='center', va='center',
-                        transform=self.ax.transAxes, fontsize=14)
+            charts.draw_no_data(self.ax)
             self.canvas.draw()
             return
 
-        # 统计应用使用时间
-        app_usage = {}
-        for record in data:
-            app = record['process_name']
-            duration = record['duration']
-            if app in app_usage:
-                app_usage[app] += duration
-            else:
-                app_usage[app] = duration
-
-        # 准备数据
-        apps = list(app_usage.keys())
-        durations = list(app_usage.values())
-        colors = [self.get_app_color(app) for app in apps]
-
-        print(f"饼图应用数: {len(apps)}")
+        print(f"饼图应用数: {len(self.app_usage)}")
 
         # 绘制饼图
-        wedges, texts, autotexts = self.ax.pie(durations, labels=apps, colors=colors,
-                                               autopct='%1.1f%%', startangle=90)
-
-        # 设置标题
-        self.ax.set_title('Application Usage Distribution', fontsize=16, fontweight='bold')
+        charts.draw_pie_chart(self.ax, self.app_usage)
 
         # 调整布局
-        self.fig.tight_layout()
+        self.apply_layout('pie', force=True)
         self.canvas.draw()
         print("饼图绘制完成")
 
     def draw_bar_chart(self, data: List[Dict[str, Any]]):
         """绘制条形图"""
+        self._use_single_axes()
         self.ax.clear()
+        self.reset_hover()
 
         print(f"开始绘制条形图，数据条数: {len(data)}")
 
         if not data:
-            self.ax.text(0.5, 0.5, '暂无数据\n请先运行监控程序收集数据', ha='center', va='center',
-                        transform=self.ax.transAxes, fontsize=14)
-            self.canvas.draw()
-            return
-
-        # 统计应用使用时间
-        app_usage = {}
-        for record in data:
-            app = record['process_name']
-            duration = record['duration']
-            if app in app_usage:
-                app_usage[app] += duration
-            else:
-                app_usage[app] = duration
-
-        # 按使用时间排序
-        sorted_apps = sorted(app_usage.items(), key=lambda x: x[1], reverse=True)[:10]
-
-        if not sorted_apps:
-            self.ax.text(0.5, 0.5, '暂无数据\n请先运行监控程序收集数据', ha='center', va='center',
-                        transform=self.ax.transAxes, fontsize=14)
+            charts.draw_no_data(self.ax)
             self.canvas.draw()
             return
 
-        apps = [item[0] for item in sorted_apps]
-        durations = [item[1]/60 for item in sorted_apps]  # 转换为分钟
-        colors = [self.get_app_color(app) for app in apps]
-
-        print(f"条形图应用数: {len(apps)}")
+        print(f"条形图应用数: {min(len(self.app_usage), 10)}")
 
         # 绘制条形图
-        bars = self.ax.bar(range(len(apps)), durations, color=colors)
-
-        # 设置标签
-        self.ax.set_xticks(range(len(apps)))
-        self.ax.set_xticklabels(apps, rotation=45, ha='right')
-        self.ax.set_ylabel('Usage Time (minutes)')
-        self.ax.set_title('Top Applications by Usage Time', fontsize=16, fontweight='bold')
-
-        # 在条形图上显示数值
-        for bar, duration in zip(bars, durations):
-            height = bar.get_height()
-            self.ax.text(bar.get_x() + bar.get_width()/2., height,
-                        f'{duration:.1f}', ha='center', va='bottom')
+        charts.draw_bar_chart(self.ax, self.app_usage)
 
         # 调整布局
-        self.fig.tight_layout()
+        self.apply_layout('bar', force=True)
         self.canvas.draw()
         print("条形图绘制完成")
 
+    def draw_range_report(self, report: Dict[str, Any]):
+        """绘制日期范围报告：应用总计、每日趋势和星期×小时热力图"""
+        print(f"开始绘制范围报告: {report['start_date']} 到 {report['end_date']}")
+
+        self.range_axes = charts.draw_range_report(self.fig, report)
+        self.ax = self.range_axes[0]
+        self.reset_hover()
+
+        self.apply_layout('range', force=True)
+        self.canvas.draw()
+        print("范围报告绘制完成")
+
+    def apply_layout(self, key: str, force: bool = False):
+        """
+        tight_layout 开销较大，同一视图在窗口大小不变时只计算一次
+        :param force: 强制重新计算（刻度标签随数据变化的视图）
+        """
+        if force or self.layout_key != key:
+            self.fig.tight_layout()
+            self.layout_key = key
+
+    def on_resize(self, event):
+        """窗口大小变化后需要重新计算布局"""
+        self.layout_key = None
+
+    def reset_hover(self):
+        """清空悬停索引和覆盖层（坐标轴被清空时调用）"""
+        self.sessions = []
+        self.session_starts = []
+        self.sessions_sorted = True
+        self.background = None
+        self.overlay = None
+        self.hovered_record = None
+        self.live_patch = None
+
+    def create_overlay(self):
+        """创建悬停覆盖层：animated 的图元不参与完整重绘，只通过 blit 绘制"""
+        highlight = Rectangle((0, 0), 0, self.bar_height, facecolor='none', edgecolor='#FF3B30',
+                              linewidth=2, animated=True, visible=False)
+        self.ax.add_patch(highlight)
+        crosshair = self.ax.axvline(0, color='#555555', linewidth=0.8, linestyle='--',
+                                    animated=True, visible=False)
+        tooltip = self.ax.annotate('', xy=(0, self.bar_height), xytext=(10, 10),
+                                   textcoords='offset points', fontsize=8, animated=True, visible=False,
+                                   bbox=dict(boxstyle='round', facecolor='#FFFFE0', alpha=0.95))
+        self.overlay = {'highlight': highlight, 'crosshair': crosshair, 'tooltip': tooltip}
+
+    def on_draw(self, event):
+        """完整重绘后缓存不含覆盖层的背景"""
+        if self.overlay is not None and not self.range_axes:
+            self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+            if self.live_patch is not None:
+                self.ax.draw_artist(self.live_patch)
+        else:
+            self.background = None
+
+    def find_session(self, x: float):
+        """二分查找横坐标 x 所在的会话"""
+        if not self.sessions_sorted:
+            self.sessions.sort(key=lambda item: item[0])
+            self.session_starts = [item[0] for item in self.sessions]
+            self.sessions_sorted = True
+
+        index = bisect.bisect_right(self.session_starts, x) - 1
+        if index >= 0 and self.sessions[index][1] >= x:
+            return self.sessions[index]
+        return None
+
+    def blit_overlay(self):
+        """恢复缓存的背景并只绘制覆盖层"""
+        self.canvas.restore_region(self.background)
+        if self.live_patch is not None:
+            self.ax.draw_artist(self.live_patch)
+        for artist in self.overlay.values():
+            if artist.get_visible():
+                self.ax.draw_artist(artist)
+        self.canvas.blit(self.ax.bbox)
+
+    def invalidate_background(self):
+        """坐标轴范围即将改变：隐藏覆盖层并作废缓存的背景，下次完整重绘后重新缓存"""
+        if self.overlay is not None:
+            for artist in self.overlay.values():
+                artist.set_visible(False)
+        self.hovered_record = None
+        self.background = None
+
+    def hide_hover(self):
+        """鼠标离开时间轴时隐藏覆盖层"""
+        if self.overlay is None or self.background is None:
+            return
+        if not any(artist.get_visible() for artist in self.overlay.values()):
+            return
+        for artist in self.overlay.values():
+            artist.set_visible(False)
+        self.hovered_record = None
+        self.blit_overlay()
+
     def on_mouse_hover(self, event):
-        """处理鼠标悬停事件"""
-        if event.inaxes != self.ax:
+        """处理鼠标悬停事件：十字线跟随鼠标，命中的会话高亮并显示提示框"""
+        if self.drag_start is not None:
+            self.drag_pan(event)
+            return
+        if self.overlay is None or self.background is None:
+            return
+        if event.inaxes != self.ax or event.xdata is None:
+            self.hide_hover()
             return
 
-        # 查找鼠标下的矩形
-        for patch in self.ax.patches:
-            if isinstance(patch, Rectangle) and hasattr(patch, 'record'):
-                if patch.contains_point([event.x, event.y]):
-                    self.show_detail_info(patch.record)
-                    return
+        crosshair = self.overlay['crosshair']
+        crosshair.set_xdata([event.xdata, event.xdata])
+        crosshair.set_visible(True)
+
+        hit = self.find_session(event.xdata) if -0.1 <= event.ydata <= self.bar_height + 0.1 else None
+        record = hit[2] if hit else None
+        highlight = self.overlay['highlight']
+        tooltip = self.overlay['tooltip']
+
+        if record is not self.hovered_record:
+            self.hovered_record = record
+            if hit:
+                start_num, end_num, _ = hit
+                highlight.set_x(start_num)
+                highlight.set_width(end_num - start_num)
+
+                # 靠近右侧时提示框放在鼠标左边
+                x_min, x_max = self.ax.get_xlim()
+                on_right = (event.xdata - x_min) / (x_max - x_min) > 0.7
+                tooltip.set_position((-10, 10) if on_right else (10, 10))
+                tooltip.set_horizontalalignment('right' if on_right else 'left')
+                tooltip.set_text(f"{record['process_name']}\n{record['window_title'][:40]}\n"
+                                 f"{record['duration'] / 60:.1f}分钟")
+
+                # 详细信息面板只在命中的记录变化时更新
+                self.show_detail_info(record)
+            highlight.set_visible(hit is not None)
+            tooltip.set_visible(hit is not None)
+
+        if hit:
+            tooltip.xy = (event.xdata, self.bar_height)
+
+        self.blit_overlay()
+
+    def set_live_session(self, record: Optional[Dict[str, Any]]):
+        """
+        设置进行中的会话（open_session_record 的结果，None表示没有）
+        时间块只通过 blit 更新；会话延长到可见范围之外时才扩展范围并完整重绘
+        """
+        had_session = self.live_session is not None
+        self.live_session = record
+
+        if self.overlay is None:
+            # 当前不是时间轴视图；今天还没有已结束的会话时，出现进行中的会话后绘制时间轴
+            if record is not None and not had_session and not self.data and self.view_var.get() == "时间轴" \
+                    and not self.range_axes:
+                self.draw_timeline(self.data)
+            return
+
+        if record is None:
+            if self.live_patch is not None:
+                self.live_patch.remove()
+                self.live_patch = None
+                self._blit_or_draw()
+            return
+
+        if self.live_patch is None:
+            self.live_patch = charts.add_live_session_patch(self.ax, record, self.bar_height)
+        else:
+            charts.update_live_session_patch(self.live_patch, record)
+
+        # 整天视图下会话超出右侧留白时扩展时间范围
+        end_time = self._parse_time(record['end_time'])
+        if self.time_limits is not None and end_time > self._visible_range()[1]:
+            self.invalidate_background()
+            self._set_time_limits(min(self.time_limits[0], self._parse_time(record['start_time'])),
+                                  max(self.time_limits[1], end_time))
+            self.canvas.draw_idle()
+            return
+
+        self._blit_or_draw()
+
+    def _blit_or_draw(self):
+        """有缓存的背景时只重绘动态图元，否则等待下次完整重绘"""
+        if self.background is not None:
+            self.blit_overlay()
+        else:
+            self.canvas.draw_idle()
 
     def show_detail_info(self, record: Dict[str, Any]):
         """显示详细信息"""
@@ -360,6 +493,94 @@ class TimelineWidget:
         self.detail_text.insert('1.0', detail_text)
         self.detail_text.config(state=tk.DISABLED)
 
+    def set_range_loader(self, loader):
+        """设置按需加载器（TimelineRangeLoader），之后时间轴支持缩放和平移"""
+        self.range_loader = loader
+
+    def _zoom_enabled(self) -> bool:
+        """只有时间轴视图且设置了加载器时才能缩放"""
+        return self.range_loader is not None and self.view_var.get() == "时间轴" and not self.range_axes
+
+    def _visible_range(self) -> Tuple[datetime, datetime]:
+        """当前坐标轴的可见范围"""
+        x_min, x_max = self.ax.get_xlim()
+        return num2date(x_min).replace(tzinfo=None), num2date(x_max).replace(tzinfo=None)
+
+    def view_range(self, start: datetime, end: datetime):
+        """
+        显示指定的时间范围：从加载器读取可见范围的数据（跨度决定细节级别）并重绘，
+        空闲时预取前后相邻范围
+        """
+        span = min(max(end - start, MIN_SPAN), MAX_SPAN)
+        center = start + (end - start) / 2
+        start, end = center - span / 2, center + span / 2
+
+        self.view_start, self.view_end = start, end
+        self.lod, records = self.range_loader.get(start, end)
+        self.data = records
+        self.app_usage = {}
+        self._accumulate_usage(records)
+        self.draw_timeline(records, limits=(start, end))
+
+        self.canvas.get_tk_widget().after_idle(lambda: self.range_loader.prefetch(start, end, self.lod))
+
+    def schedule_reload(self, delay: int = 150):
+        """滚轮/拖动结束后稍等再加载，连续操作只查询一次"""
+        widget = self.canvas.get_tk_widget()
+        if self.reload_job is not None:
+            widget.after_cancel(self.reload_job)
+        self.reload_job = widget.after(delay, self.reload_visible)
+
+    def reload_visible(self):
+        """按当前可见范围重新加载数据"""
+        self.reload_job = None
+        if self._zoom_enabled():
+            self.view_range(*self._visible_range())
+
+    def on_zoom_preset(self, event=None):
+        """选择预设范围：以当前可见范围的中心为中心"""
+        if not self._zoom_enabled():
+            return
+        span = ZOOM_PRESETS[self.zoom_var.get()]
+        start, end = self._visible_range()
+        center = start + (end - start) / 2
+        self.view_range(center - span / 2, center + span / 2)
+
+    def on_scroll(self, event):
+        """滚轮缩放：以鼠标所在时间为中心，立即缩放坐标轴，稍后加载数据"""
+        if not self._zoom_enabled() or event.inaxes != self.ax or event.xdata is None:
+            return
+
+        factor = 1 / 1.25 if event.button == 'up' else 1.25
+        x_min, x_max = self.ax.get_xlim()
+        span = min(max((x_max - x_min) * factor, MIN_SPAN / timedelta(days=1)), MAX_SPAN / timedelta(days=1))
+        ratio = (event.xdata - x_min) / (x_max - x_min)
+        self.ax.set_xlim(event.xdata - span * ratio, event.xdata + span * (1 - ratio))
+        self.invalidate_background()
+        self.canvas.draw_idle()
+        self.schedule_reload()
+
+    def on_button_press(self, event):
+        """按下左键开始拖动"""
+        if self._zoom_enabled() and event.button == 1 and event.inaxes == self.ax:
+            self.drag_start = (event.x, self.ax.get_xlim())
+            self.invalidate_background()
+
+    def drag_pan(self, event):
+        """拖动平移：只移动坐标轴，松开后再加载数据"""
+        start_x, (x_min, x_max) = self.drag_start
+        shift = (event.x - start_x) * (x_max - x_min) / self.ax.bbox.width
+        self.ax.set_xlim(x_min - shift, x_max - shift)
+        self.canvas.draw_idle()
+
+    def on_button_release(self, event):
+        """松开左键结束拖动并加载新的可见范围"""
+        if self.drag_start is not None:
+            _, limits = self.drag_start
+            self.drag_start = None
+            if self.ax.get_xlim() != limits:
+                self.schedule_reload(delay=0)
+
     def on_view_changed(self, event):
         """处理视图切换"""
         view_type = self.view_var.get()
@@ -372,9 +593,17 @@ class TimelineWidget:
         if hasattr(self, 'refresh_callback'):
             self.refresh_callback()
 
+    def _accumulate_usage(self, records: List[Dict[str, Any]]):
+        """把记录的时长累加到按应用的统计中"""
+        charts.summarize_usage(records, self.app_usage)
+
     def set_data(self, data: List[Dict[str, Any]]):
-        """设置数据并更新视图"""
+        """设置数据并更新视图（显示整天，退出缩放状态）"""
+        self.view_start = None
+        self.view_end = None
         self.data = data
+        self.app_usage = {}
+        self._accumulate_usage(data)
         view_type = self.view_var.get()
 
         if view_type == "时间轴":
@@ -384,6 +613,41 @@ class TimelineWidget:
         elif view_type == "条形图":
             self.draw_bar_chart(data)
 
+    def append_data(self, records: List[Dict[str, Any]]):
+        """
+        追加新记录（实时模式）
+        时间轴视图只添加新的时间块并更新图例和时间范围，由 draw_idle 合并重绘；
+        其它视图基于累计统计重绘
+        """
+        if not records:
+            return
+
+        if self.range_loader is not None:
+            self.range_loader.invalidate(min(self._parse_time(record['start_time']) for record in records),
+                                         max(self._parse_time(record['end_time']) for record in records))
+        if self.view_start is not None:
+            # 缩放状态下重新读取可见范围
+            self.schedule_reload()
+            return
+
+        self.data = records + self.data
+        self._accumulate_usage(records)
+
+        if self.view_var.get() != "时间轴" or self.range_axes or self.time_limits is None:
+            self.set_data(self.data)
+            return
+
+        for record in records:
+            self._add_session_patch(record)
+
+        min_time = min([self.time_limits[0]] + [self._parse_time(record['start_time']) for record in records])
+        max_time = max([self.time_limits[1]] + [self._parse_time(record['end_time']) for record in records])
+        if (min_time, max_time) != self.time_limits:
+            self._set_time_limits(min_time, max_time)
+
+        self.add_legend()
+        self.canvas.draw_idle()
+
     def pack(self, **kwargs):
         """包装pack方法"""
         self.main_frame.pack(**kwargs)
\ No newline at end of file
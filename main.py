@@ -5,6 +5,10 @@
 import sys
 import os
 import time
+import asyncio
+import threading
+import argparse
+from datetime import datetime
 
 # 添加项目根目录到路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -12,10 +16,78 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from monitoring.window_monitor import WindowMonitor
 from monitoring.browser_monitor import BrowserMonitor
 from monitoring.input_monitor import InputMonitor
+from monitoring.runtime import AsyncMonitorRuntime, publish_live_status
+from monitoring.trace import TraceWriter, attach_recorder
 from data.storage import DataStorage
+from data.maintenance import MaintenanceScheduler
+from data.live_status import LiveStatusWriter
 
 
-def main():
+def print_today_summary(storage: DataStorage):
+    """显示今日统计和使用时间最长的应用"""
+    print("\n=== 今日使用统计 ===")
+    summary = storage.get_today_summary()
+    print(f"总活跃时间: {summary['total_active_time']:.1f} 秒 ({summary['total_active_time']/3600:.2f} 小时)")
+    print(f"总空闲时间: {summary['total_idle_time']:.1f} 秒")
+    print(f"使用应用数量: {summary['app_count']} 个")
+    print(f"专注效率: {summary['focus_efficiency']:.1f}%")
+    print(f"最长专注: {summary['longest_focus_streak']/60:.1f} 分钟 (共 {summary['focus_streak_count']} 段)")
+
+    print("\n=== 使用时间最长的应用 ===")
+    top_apps = storage.get_top_apps(5)
+    for i, app in enumerate(top_apps, 1):
+        hours = app['total_duration'] / 3600
+        print(f"{i}. {app['process_name']} - {hours:.2f} 小时")
+
+
+def print_event_metrics(*monitors):
+    """显示各事件订阅者的处理延迟和丢弃数"""
+    print("\n=== 事件处理统计 ===")
+    for monitor in monitors:
+        for name, values in monitor.events.metrics().items():
+            print(f"{name}: 处理 {values['delivered']} 条, 丢弃 {values['dropped']} 条, "
+                  f"平均延迟 {values['lag_avg_ms']:.1f} ms, 最大延迟 {values['lag_max_ms']:.1f} ms")
+
+
+def start_trace_recording(path, window_monitor, browser_monitor, input_monitor):
+    """录制监控轨迹（前台窗口变化、键鼠事件时间和空闲切换），之后可在任何平台回放"""
+    writer = TraceWriter(path, datetime.now(), input_monitor.idle_threshold)
+    attach_recorder(writer, window_monitor, browser_monitor, input_monitor)
+    print(f"正在录制监控轨迹: {path}")
+    return writer
+
+
+def run_async(record_trace=None, use_hooks=True, partition_by_month=None, hot_tier=False):
+    """异步运行时 - 每个监控器作为独立任务运行，由单一写入协程批量保存"""
+    print("=== Focus-Insight 完整版监控（异步模式） ===")
+    print("按 Ctrl+C 停止监控\n")
+
+    storage = DataStorage(partition_by_month=partition_by_month, hot_tier=hot_tier)
+    storage.recover_window_session()
+
+    input_monitor = InputMonitor(idle_threshold=30, use_hooks=use_hooks)  # 测试用30秒空闲阈值
+    window_monitor = WindowMonitor(input_monitor=input_monitor)
+    browser_monitor = BrowserMonitor()
+    runtime = AsyncMonitorRuntime(storage, window_monitor, browser_monitor, input_monitor)
+    trace_writer = None
+    if record_trace:
+        trace_writer = start_trace_recording(record_trace, window_monitor, browser_monitor, input_monitor)
+
+    input_monitor.start_monitoring()
+    try:
+        asyncio.run(runtime.run())
+    except KeyboardInterrupt:
+        pass
+
+    if trace_writer:
+        trace_writer.close()
+
+    print_today_summary(storage)
+    storage.close()
+    print("\n监控已停止，数据已保存")
+
+
+def main(record_trace=None, use_hooks=True, partition_by_month=None, hot_tier=False):
     """主函数 - 完整的监控和数据存储功能"""
     print("=== Focus-Insight 完整版监控 ===")
     print("监控已启动，所有数据将保存到本地数据库...")
@@ -23,12 +95,18 @@ def main():
     print("按 Ctrl+C 停止监控\n")
 
     # 创建数据存储
-    storage = DataStorage()
+    storage = DataStorage(partition_by_month=partition_by_month, hot_tier=hot_tier)
+
+    # 恢复上次异常退出时未保存的窗口会话
+    storage.recover_window_session()
 
     # 创建监控器
-    window_monitor = WindowMonitor()
+    input_monitor = InputMonitor(idle_threshold=30, use_hooks=use_hooks)  # 测试用30秒空闲阈值
+    window_monitor = WindowMonitor(input_monitor=input_monitor)
     browser_monitor = BrowserMonitor()
-    input_monitor = InputMonitor(idle_threshold=30)  # 测试用30秒空闲阈值
+
+    # 回调在各监控器事件总线的工作线程中执行，数据库写入需要串行
+    db_lock = threading.Lock()
 
     # 添加窗口监控回调 - 同时显示和保存数据
     def handle_window_record(record):
@@ -38,13 +116,16 @@ def main():
         print(f"📊 [{duration:6.1f}s] {process} - {title}")
 
         # 保存到数据库
-        storage.db.insert_window_activity(
-            process_name=process,
-            window_title=record['window_title'],
-            start_time=record['start_time'],
-            end_time=record['end_time'],
-            duration=duration
-        )
+        with db_lock:
+            storage.db.insert_window_activity(
+                process_name=process,
+                window_title=record['window_title'],
+                start_time=record['start_time'],
+                end_time=record['end_time'],
+                duration=duration,
+                keystrokes=record.get('keystrokes', 0),
+                clicks=record.get('clicks', 0)
+            )
 
     # 添加浏览器监控回调
     def handle_browser_record(record):
@@ -53,12 +134,13 @@ def main():
         print(f"🌐 [浏览器] {browser} - {title}")
 
         # 保存到数据库
-        storage.db.insert_browser_activity(
-            browser_name=browser,
-            page_title=record['title'],
-            page_url=record['url'],
-            start_time=record['timestamp']
-        )
+        with db_lock:
+            storage.db.insert_browser_activity(
+                browser_name=browser,
+                page_title=record['title'],
+                page_url=record['url'],
+                start_time=record['timestamp']
+            )
 
     # 添加输入监控回调
     def handle_input_record(record):
@@ -66,14 +148,27 @@ def main():
             if record['state'] == 'idle':
                 duration = record['idle_duration'].total_seconds() if record['idle_duration'] else 0
                 print(f"😴 [空闲状态] 用户已空闲 {duration:.1f}秒")
-                storage.save_state_change('idle', duration)
+                with db_lock:
+                    storage.save_state_change('idle', duration)
             else:
                 print(f"👆 [活跃状态] 用户恢复活动")
-                storage.save_state_change('active')
+                with db_lock:
+                    storage.save_state_change('active')
+
+    # 默认 block 策略：存储跟不上导致队列满时检测最多等待1秒，而不是直接丢记录
+    window_monitor.add_callback(handle_window_record, name='storage-window')
+    browser_monitor.add_callback(handle_browser_record, name='storage-browser')
+    input_monitor.add_callback(handle_input_record, name='storage-state')
+
+    trace_writer = None
+    if record_trace:
+        trace_writer = start_trace_recording(record_trace, window_monitor, browser_monitor, input_monitor)
+
+    # 用户空闲时执行数据库维护
+    maintenance = MaintenanceScheduler(storage.durable_db)
 
-    window_monitor.add_callback(handle_window_record)
-    browser_monitor.add_callback(handle_browser_record)
-    input_monitor.add_callback(handle_input_record)
+    # 当前状态写入实时状态文件，查看器不查询数据库就能显示进行中的会话
+    live_status = LiveStatusWriter(storage.live_status_path)
 
     try:
         # 开始输入监控
@@ -83,10 +178,24 @@ def main():
         print("开始监控所有活动...")
         last_summary_time = time.time()
         last_data_save_time = time.time()
+        last_checkpoint_time = 0
+        last_checkpoint_start = None
+        last_maintenance_time = 0
 
         while True:
             window_monitor.check_window_change()
 
+            # 每5秒（或窗口切换后立即）把进行中的会话写入会话日志
+            if window_monitor.start_time is not None and (
+                    window_monitor.start_time != last_checkpoint_start
+                    or time.time() - last_checkpoint_time >= 5):
+                with db_lock:
+                    storage.checkpoint_window_session(window_monitor.current_process,
+                                                      window_monitor.current_title,
+                                                      window_monitor.start_time)
+                last_checkpoint_time = time.time()
+                last_checkpoint_start = window_monitor.start_time
+
             # 如果当前窗口是浏览器，检查标签页变化
             window_info = window_monitor.get_active_window_info()
             if window_info:
@@ -95,6 +204,7 @@ def main():
 
             # 检查空闲状态
             input_monitor.check_idle_status()
+            publish_live_status(live_status, window_monitor, input_monitor)
 
             # 每5秒显示一次活动摘要
             current_time = time.time()
@@ -105,12 +215,27 @@ def main():
                       f"💤 空闲: {'是' if summary['is_idle'] else '否'}")
                 last_summary_time = current_time
 
-            # 每30秒保存一次输入活动数据
-            if current_time - last_data_save_time >= 30:
-                storage.save_input_activity('keyboard', summary['total_keyboard_events'], summary['keyboard_frequency'])
-                storage.save_input_activity('mouse', summary['total_mouse_events'], summary['mouse_frequency'])
+            # 每分钟把已结束小时的每分钟输入计数写入数据库（每小时一行）
+            if current_time - last_data_save_time >= 60:
+                for hour_start, keyboard_counts, mouse_counts in input_monitor.pop_completed_hours():
+                    with db_lock:
+                        storage.save_input_minutes(hour_start, keyboard_counts, mouse_counts)
+                # 派生时间线只在监控进程中刷新，查看器和报告只读数据库
+                with db_lock:
+                    storage.durable_db.refresh_activity_timeline()
                 last_data_save_time = current_time
 
+            # 空闲时每30秒检查一次到期的维护任务，用户回来后立即停下，下次空闲时继续
+            if current_time - last_maintenance_time >= 30 and input_monitor.is_away() and maintenance.pending():
+                with db_lock:
+                    maintenance.run_slice(input_monitor.is_away)
+                last_maintenance_time = current_time
+
+            # 启用热层时，长时间没有新记录也按间隔刷写到数据库
+            if storage.hot_tier is not None:
+                with db_lock:
+                    storage.hot_tier.flush_if_due()
+
             time.sleep(1.0)
 
     except KeyboardInterrupt:
@@ -118,20 +243,25 @@ def main():
         window_monitor.stop_monitoring()
         browser_monitor.stop_monitoring()
         input_monitor.stop_monitoring()
+        live_status.close()
+
+        # stop_monitoring 已等待回调写完最后的会话，会话日志中不再有进行中的会话
+        # （运行期间不逐条标记：回调异步执行，标记可能覆盖新会话的心跳；异常退出时
+        #   恢复会重建日志中所有未关闭的会话，包括还排在事件总线里的上一个会话，并按数据库去重）
+        storage.mark_window_session_saved()
+
+        # 写入尚未保存的输入计数（包括当前未结束的小时）
+        for hour_start, keyboard_counts, mouse_counts in input_monitor.pop_completed_hours():
+            storage.save_input_minutes(hour_start, keyboard_counts, mouse_counts)
+        storage.save_input_minutes(*input_monitor.pop_current_hour())
+        storage.durable_db.refresh_activity_timeline()
 
         # 显示今日统计
-        print("\n=== 今日使用统计 ===")
-        summary = storage.get_today_summary()
-        print(f"总活跃时间: {summary['total_active_time']:.1f} 秒 ({summary['total_active_time']/3600:.2f} 小时)")
-        print(f"总空闲时间: {summary['total_idle_time']:.1f} 秒")
-        print(f"使用应用数量: {summary['app_count']} 个")
-        print(f"专注效率: {summary['focus_efficiency']:.1f}%")
-
-        print("\n=== 使用时间最长的应用 ===")
-        top_apps = storage.get_top_apps(5)
-        for i, app in enumerate(top_apps, 1):
-            hours = app['total_duration'] / 3600
-            print(f"{i}. {app['process_name']} - {hours:.2f} 小时")
+        print_today_summary(storage)
+        print_event_metrics(window_monitor, browser_monitor, input_monitor)
+
+        if trace_writer:
+            trace_writer.close()
 
         # 关闭数据存储
         storage.close()
@@ -139,4 +269,18 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Focus-Insight 监控程序")
+    parser.add_argument('--async', dest='use_async', action='store_true', help="使用异步运行时")
+    parser.add_argument('--record-trace', default=None, help="同时录制监控轨迹到该文件（用于回放测试）")
+    parser.add_argument('--no-hooks', dest='use_hooks', action='store_false',
+                        help="不安装全局键鼠钩子，轮询最后输入时间检测空闲（不统计按键/点击次数）")
+    parser.add_argument('--partition-by-month', action='store_true', default=None,
+                        help="按月分区保存数据（首次启用时导入已有数据库，之后自动沿用）")
+    parser.add_argument('--hot-tier', action='store_true',
+                        help="今天的数据保存在内存中，每分钟批量写入数据库（记录同时写入重做日志）")
+    args = parser.parse_args()
+
+    if args.use_async:
+        run_async(args.record_trace, args.use_hooks, args.partition_by_month, args.hot_tier)
+    else:
+        main(args.record_trace, args.use_hooks, args.partition_by_month, args.hot_tier)
\ No newline at end of file
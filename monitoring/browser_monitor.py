@@ -2,13 +2,23 @@
 浏览器页面监控模块
 负责精确记录浏览器当前活动标签页的URL和标题
 """
-import time
-from typing import Optional, Dict, Any
-from datetime import datetime
+from typing import Optional
+
+from monitoring.clock import SystemClock
+from monitoring.event_bus import EventBus
+from monitoring.sources import Win32ForegroundSource
+from data.records import TabRecord
 
 
 class BrowserMonitor:
-    def __init__(self):
+    def __init__(self, clock=None, source=None):
+        """
+        初始化浏览器监控器
+        :param clock: 时钟对象，默认使用系统时钟
+        :param source: 前台窗口数据源，默认通过Windows API读取
+        """
+        self.clock = clock or SystemClock()
+        self.source = source or Win32ForegroundSource()
         self.browsers = {
             'chrome.exe': 'Chrome',
             'firefox.exe': 'Firefox',
@@ -17,11 +27,14 @@ class BrowserMonitor:
             'opera.exe': 'Opera'
         }
         self.current_tab_info = None
-        self.callbacks = []
+        self.events = EventBus("browser")
 
-    def add_callback(self, callback):
-        """添加数据回调函数"""
-        self.callbacks.append(callback)
+    def add_callback(self, callback, **options):
+        """
+        添加数据回调函数，回调在订阅者自己的线程中执行，不阻塞检测
+        :param options: 队列容量和溢出策略等，见 EventBus.subscribe
+        """
+        return self.events.subscribe(callback, **options)
 
     def is_browser_process(self, process_name: str) -> bool:
         """检查是否为浏览器进程"""
@@ -31,87 +44,44 @@ class BrowserMonitor:
         """获取浏览器名称"""
         return self.browsers.get(process_name.lower(), process_name)
 
-    def get_chrome_tab_info(self) -> Optional[Dict[str, Any]]:
-        """通过Chrome进程获取当前标签页信息（简化版本）"""
+    def _foreground_title(self) -> Optional[str]:
+        """前台窗口标题，浏览器的标题通常包含页面标题"""
+        info = self.source.get_foreground()
+        return info[1] if info else None
+
+    def _tab_from_title(self, suffix: str, browser: str, url: str) -> Optional[TabRecord]:
+        """从 "页面标题 - 浏览器名" 格式的窗口标题解析当前标签页（url 暂时使用占位符）"""
+        window_title = self._foreground_title()
+        if window_title and suffix in window_title:
+            return TabRecord(browser, window_title.replace(suffix, ""), url, self.clock.now())
+        return None
+
+    def get_chrome_tab_info(self) -> Optional[TabRecord]:
+        """通过Chrome窗口标题获取当前标签页信息（简化版本）"""
+        # 这里使用简化的方法，实际项目中可以使用Chrome DevTools Protocol
         try:
-            # 这里使用简化的方法，实际项目中可以使用Chrome DevTools Protocol
-            # 暂时返回模拟数据，后续可以扩展
-            import win32gui
-            import win32process
-
-            hwnd = win32gui.GetForegroundWindow()
-            _, pid = win32process.GetWindowThreadProcessId(hwnd)
-
-            # 获取窗口标题，Chrome的标题通常包含页面标题
-            window_title = win32gui.GetWindowText(hwnd)
-
-            if window_title:
-                # Chrome标题格式通常是: "页面标题 - Google Chrome"
-                if " - Google Chrome" in window_title:
-                    page_title = window_title.replace(" - Google Chrome", "")
-                    return {
-                        'browser': 'Chrome',
-                        'title': page_title,
-                        'url': 'chrome://detecting',  # 暂时使用占位符
-                        'timestamp': datetime.now()
-                    }
-
-            return None
+            return self._tab_from_title(" - Google Chrome", 'Chrome', 'chrome://detecting')
         except Exception as e:
             print(f"获取Chrome标签页信息时出错: {e}")
             return None
 
-    def get_edge_tab_info(self) -> Optional[Dict[str, Any]]:
-        """通过Edge进程获取当前标签页信息"""
+    def get_edge_tab_info(self) -> Optional[TabRecord]:
+        """通过Edge窗口标题获取当前标签页信息"""
         try:
-            import win32gui
-            import win32process
-
-            hwnd = win32gui.GetForegroundWindow()
-            _, pid = win32process.GetWindowThreadProcessId(hwnd)
-
-            window_title = win32gui.GetWindowText(hwnd)
-
-            if window_title and " - Microsoft Edge" in window_title:
-                page_title = window_title.replace(" - Microsoft Edge", "")
-                return {
-                    'browser': 'Edge',
-                    'title': page_title,
-                    'url': 'edge://detecting',  # 暂时使用占位符
-                    'timestamp': datetime.now()
-                }
-
-            return None
+            return self._tab_from_title(" - Microsoft Edge", 'Edge', 'edge://detecting')
         except Exception as e:
             print(f"获取Edge标签页信息时出错: {e}")
             return None
 
-    def get_firefox_tab_info(self) -> Optional[Dict[str, Any]]:
-        """通过Firefox进程获取当前标签页信息"""
+    def get_firefox_tab_info(self) -> Optional[TabRecord]:
+        """通过Firefox窗口标题获取当前标签页信息"""
         try:
-            import win32gui
-            import win32process
-
-            hwnd = win32gui.GetForegroundWindow()
-            _, pid = win32process.GetWindowThreadProcessId(hwnd)
-
-            window_title = win32gui.GetWindowText(hwnd)
-
-            if window_title and " - Mozilla Firefox" in window_title:
-                page_title = window_title.replace(" - Mozilla Firefox", "")
-                return {
-                    'browser': 'Firefox',
-                    'title': page_title,
-                    'url': 'about:blank',  # 暂时使用占位符
-                    'timestamp': datetime.now()
-                }
-
-            return None
+            return self._tab_from_title(" - Mozilla Firefox", 'Firefox', 'about:blank')
         except Exception as e:
             print(f"获取Firefox标签页信息时出错: {e}")
             return None
 
-    def get_current_tab_info(self, process_name: str) -> Optional[Dict[str, Any]]:
+    def get_current_tab_info(self, process_name: str) -> Optional[TabRecord]:
         """根据进程名获取当前标签页信息"""
         process_lower = process_name.lower()
 
@@ -136,8 +106,8 @@ class BrowserMonitor:
                 self._record_tab_end()
             return
 
-        # 检查是否发生了变化
-        if self.current_tab_info != tab_info:
+        # 检查是否发生了变化（时间戳每次探测都不同，只比较标签页本身）
+        if self._tab_key(self.current_tab_info) != self._tab_key(tab_info):
             # 记录上一个标签页的结束
             if self.current_tab_info is not None:
                 self._record_tab_end()
@@ -146,32 +116,27 @@ class BrowserMonitor:
             self.current_tab_info = tab_info
             print(f"浏览器标签页切换: {tab_info['browser']} - {tab_info['title']}")
 
+    @staticmethod
+    def _tab_key(tab_info: Optional[TabRecord]) -> Optional[tuple]:
+        """标签页的标识：浏览器、标题和URL"""
+        if tab_info is None:
+            return None
+        return tab_info['browser'], tab_info['title'], tab_info['url']
+
     def _record_tab_end(self):
         """记录标签页使用结束"""
         if self.current_tab_info is None:
             return
 
-        # 构造记录数据
-        record = {
-            'browser': self.current_tab_info['browser'],
-            'title': self.current_tab_info['title'],
-            'url': self.current_tab_info['url'],
-            'timestamp': self.current_tab_info['timestamp']
-        }
-
-        # 调用回调函数
-        for i, callback in enumerate(self.callbacks):
-            try:
-                callback(record)
-            except Exception as e:
-                print(f"浏览器监控回调函数 {i} 执行出错: {e}")
-                import traceback
-                traceback.print_exc()
+        # 标签页记录切换时整体替换、不会被修改，直接发布，订阅者各自处理
+        self.events.publish(self.current_tab_info)
 
     def stop_monitoring(self):
         """停止监控并记录最后一个标签页"""
         if self.current_tab_info is not None:
             self._record_tab_end()
+        # 等待订阅者处理完最后的记录
+        self.events.drain(timeout=5)
         print("浏览器监控已停止")
 
 
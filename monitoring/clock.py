@@ -0,0 +1,77 @@
+"""
+时钟模块
+监控器通过时钟对象获取当前时间，测试时可替换为虚拟时钟，几小时的监控不必等待真实时间流逝
+"""
+import time
+import heapq
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+
+
+class SystemClock:
+    """系统时钟，直接使用真实时间"""
+
+    def now(self) -> datetime:
+        """获取当前时间"""
+        return datetime.now()
+
+    def time(self) -> float:
+        """获取当前时间戳（秒）"""
+        return time.time()
+
+    async def sleep(self, seconds: float):
+        """异步等待"""
+        await asyncio.sleep(seconds)
+
+
+class FakeClock:
+    """虚拟时钟，时间只在 advance 或 run_until 推进时流逝"""
+
+    def __init__(self, start: Optional[datetime] = None):
+        """
+        初始化虚拟时钟
+        :param start: 起始时间，默认2025-01-06 09:00
+        """
+        self.current = start or datetime(2025, 1, 6, 9, 0, 0)
+        self._timers = []
+        self._sequence = 0
+
+    def now(self) -> datetime:
+        """获取当前虚拟时间"""
+        return self.current
+
+    def time(self) -> float:
+        """获取当前虚拟时间戳（秒）"""
+        return self.current.timestamp()
+
+    def advance(self, seconds: float):
+        """同步推进虚拟时间（不唤醒等待中的协程）"""
+        self.current += timedelta(seconds=seconds)
+
+    async def sleep(self, seconds: float):
+        """登记一个虚拟定时器，等到 run_until 把时间推进到唤醒点"""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._timers, (self.current + timedelta(seconds=seconds), self._sequence, future))
+        self._sequence += 1
+        await future
+
+    async def run_until(self, end: datetime):
+        """
+        按定时器顺序推进虚拟时间直到 end
+        每次推进前先让出一次控制权：被唤醒任务的回调排在本协程之前，会先运行到下一次等待
+        """
+        while True:
+            await asyncio.sleep(0)
+
+            if not self._timers or self._timers[0][0] > end:
+                self.current = max(self.current, end)
+                return
+
+            # 同一时刻到期的定时器一起唤醒
+            wake_time = self._timers[0][0]
+            self.current = max(self.current, wake_time)
+            while self._timers and self._timers[0][0] <= wake_time:
+                _, _, future = heapq.heappop(self._timers)
+                if not future.done():
+                    future.set_result(None)
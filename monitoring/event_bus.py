@@ -0,0 +1,303 @@
+"""
+事件总线模块
+监控器把记录发布到事件总线后立即返回，每个订阅者有自己的有界队列和工作线程，
+慢的订阅者（例如写数据库）不会拖慢检测循环，也不会影响检测时取的时间戳
+"""
+import time
+import threading
+import traceback
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Optional, List
+
+
+# 队列满时的处理策略
+DROP_OLDEST = 'drop_oldest'   # 丢弃最早的事件
+BLOCK = 'block'               # 发布方等待（超过 block_timeout 后丢弃新事件）
+COALESCE = 'coalesce'         # 同一键的事件只保留最新一条，队列满时丢弃最早的
+POLICIES = (DROP_OLDEST, BLOCK, COALESCE)
+
+
+class Subscription:
+    def __init__(self, callback: Callable, name: str, maxsize: int = 1024, policy: str = BLOCK,
+                 coalesce_key: Optional[Callable[[Any], Any]] = None, block_timeout: Optional[float] = 1.0):
+        """
+        初始化订阅者
+        :param callback: 事件处理函数，在订阅者自己的工作线程中调用
+        :param name: 订阅者名称（用于统计和线程名）
+        :param maxsize: 队列容量
+        :param policy: 队列满时的策略：'drop_oldest'、'block' 或 'coalesce'
+        :param coalesce_key: coalesce 策略下计算事件键的函数
+        :param block_timeout: block 策略下发布方最多等待的秒数，None表示一直等待
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"未知的队列策略: {policy}")
+        if policy == COALESCE and coalesce_key is None:
+            raise ValueError("coalesce 策略需要提供 coalesce_key")
+
+        self.callback = callback
+        self.name = name
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self.coalesce_key = coalesce_key
+        self.block_timeout = block_timeout
+
+        # 待处理事件：键 -> (事件, 发布时刻)；非合并策略的键是递增序号
+        self.pending: 'OrderedDict[Any, tuple]' = OrderedDict()
+        self.sequence = 0
+        self.busy = False
+        self.closed = False
+        self.condition = threading.Condition()
+
+        # 统计数据
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.blocked_seconds = 0.0
+        self.lag_last = 0.0
+        self.lag_max = 0.0
+        self.lag_total = 0.0
+
+        self.thread = threading.Thread(target=self._run, name=f"event-{name}", daemon=True)
+        self.thread.start()
+
+    def put(self, event: Any):
+        """放入一个事件（由发布方线程调用）"""
+        with self.condition:
+            if self.closed:
+                return
+            self.published += 1
+            now = time.monotonic()
+
+            if self.policy == COALESCE:
+                key = self.coalesce_key(event)
+                if key in self.pending:
+                    # 保持原来的排队位置，只替换为最新的事件
+                    self.pending[key] = (event, now)
+                    self.coalesced += 1
+                    return
+            else:
+                key = self.sequence
+                self.sequence += 1
+
+            if len(self.pending) >= self.maxsize:
+                if self.policy == BLOCK:
+                    deadline = None if self.block_timeout is None else now + self.block_timeout
+                    while len(self.pending) >= self.maxsize and not self.closed:
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            break
+                        self.condition.wait(remaining)
+                    self.blocked_seconds += time.monotonic() - now
+                    if len(self.pending) >= self.maxsize or self.closed:
+                        self.dropped += 1
+                        return
+                else:
+                    self.pending.popitem(last=False)
+                    self.dropped += 1
+
+            self.pending[key] = (event, now)
+            self.condition.notify_all()
+
+    def _run(self):
+        """工作线程：按顺序取出事件并调用处理函数"""
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                _, (event, published_at) = self.pending.popitem(last=False)
+                self.busy = True
+                # 唤醒因队列满而等待的发布方
+                self.condition.notify_all()
+
+            lag = time.monotonic() - published_at
+            try:
+                self.callback(event)
+            except Exception as e:
+                self.errors += 1
+                print(f"事件订阅者 {self.name} 处理出错: {e}")
+                traceback.print_exc()
+
+            with self.condition:
+                self.busy = False
+                self.delivered += 1
+                self.lag_last = lag
+                self.lag_max = max(self.lag_max, lag)
+                self.lag_total += lag
+                self.condition.notify_all()
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待队列中的事件全部处理完
+        :return: 是否在超时前处理完
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while self.pending or self.busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+    def close(self, timeout: Optional[float] = None):
+        """处理完剩余事件后停止工作线程"""
+        self.drain(timeout)
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join(timeout)
+
+    def metrics(self) -> Dict[str, Any]:
+        """订阅者的统计数据（延迟单位为毫秒）"""
+        with self.condition:
+            return {
+                'policy': self.policy,
+                'queued': len(self.pending),
+                'published': self.published,
+                'delivered': self.delivered,
+                'dropped': self.dropped,
+                'coalesced': self.coalesced,
+                'errors': self.errors,
+                'blocked_ms': self.blocked_seconds * 1000,
+                'lag_last_ms': self.lag_last * 1000,
+                'lag_max_ms': self.lag_max * 1000,
+                'lag_avg_ms': self.lag_total / self.delivered * 1000 if self.delivered else 0.0,
+            }
+
+
+class InlineSubscription:
+    def __init__(self, callback: Callable, name: str):
+        """
+        在发布方线程中直接调用的订阅者，没有队列和工作线程，事件按发布顺序同步处理
+        只适合很快的回调（例如只是把记录转交给事件循环的队列）
+        :param callback: 事件处理函数
+        :param name: 订阅者名称（用于统计）
+        """
+        self.callback = callback
+        self.name = name
+        self.policy = 'inline'
+        self.lock = threading.Lock()
+
+        # 统计数据
+        self.published = 0
+        self.delivered = 0
+        self.errors = 0
+
+    def put(self, event: Any):
+        """直接处理一个事件（由发布方线程调用）"""
+        with self.lock:
+            self.published += 1
+        try:
+            self.callback(event)
+        except Exception as e:
+            with self.lock:
+                self.errors += 1
+            print(f"事件订阅者 {self.name} 处理出错: {e}")
+            traceback.print_exc()
+        with self.lock:
+            self.delivered += 1
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """同步处理，没有积压的事件"""
+        return True
+
+    def close(self, timeout: Optional[float] = None):
+        """没有工作线程需要停止"""
+
+    def metrics(self) -> Dict[str, Any]:
+        """订阅者的统计数据（与 Subscription 的字段相同）"""
+        with self.lock:
+            return {
+                'policy': self.policy,
+                'queued': 0,
+                'published': self.published,
+                'delivered': self.delivered,
+                'dropped': 0,
+                'coalesced': 0,
+                'errors': self.errors,
+                'blocked_ms': 0.0,
+                'lag_last_ms': 0.0,
+                'lag_max_ms': 0.0,
+                'lag_avg_ms': 0.0,
+            }
+
+
+class EventBus:
+    def __init__(self, name: str = "events"):
+        """
+        初始化事件总线
+        :param name: 总线名称（订阅者默认以它为前缀命名）
+        """
+        self.name = name
+        self.subscriptions: List[Subscription] = []
+        self.lock = threading.Lock()
+
+    def subscribe(self, callback: Callable, name: Optional[str] = None, inline: bool = False,
+                  **options) -> Subscription:
+        """
+        添加订阅者，每个订阅者有独立的队列和工作线程
+        :param inline: 不使用队列和工作线程，在发布方线程中按发布顺序直接调用（见 InlineSubscription）
+        :param options: maxsize、policy、coalesce_key、block_timeout，见 Subscription
+        """
+        with self.lock:
+            name = name or f"{self.name}-{len(self.subscriptions)}"
+            if inline:
+                subscription = InlineSubscription(callback, name)
+            else:
+                subscription = Subscription(callback, name, **options)
+            self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription, timeout: Optional[float] = None):
+        """移除订阅者（先处理完已排队的事件）"""
+        with self.lock:
+            if subscription in self.subscriptions:
+                self.subscriptions.remove(subscription)
+        subscription.close(timeout)
+
+    def publish(self, event: Any):
+        """发布事件：放入每个订阅者的队列后立即返回（block 策略在队列满时才会等待）"""
+        for subscription in list(self.subscriptions):
+            subscription.put(event)
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """等待所有订阅者处理完已发布的事件"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for subscription in list(self.subscriptions):
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if not subscription.drain(remaining):
+                return False
+        return True
+
+    def close(self, timeout: Optional[float] = None):
+        """处理完剩余事件后停止所有订阅者"""
+        with self.lock:
+            subscriptions = self.subscriptions
+            self.subscriptions = []
+        for subscription in subscriptions:
+            subscription.close(timeout)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """各订阅者的队列长度、丢弃数和处理延迟"""
+        return {subscription.name: subscription.metrics() for subscription in list(self.subscriptions)}
+
+
+# 测试代码
+if __name__ == "__main__":
+    bus = EventBus("test")
+    bus.subscribe(lambda event: time.sleep(0.01), name="slow", maxsize=10, policy=DROP_OLDEST)
+    bus.subscribe(lambda event: None, name="latest", policy=COALESCE, coalesce_key=lambda event: event % 3)
+
+    start = time.perf_counter()
+    for i in range(100):
+        bus.publish(i)
+    print(f"发布100个事件用时 {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    bus.drain()
+    for name, values in bus.metrics().items():
+        print(f"{name}: {values}")
+    bus.close()
@@ -3,52 +3,83 @@
 负责记录键盘和鼠标活动频率，以及检测空闲状态
 """
 import time
+import threading
+from array import array
 from datetime import datetime, timedelta
-from typing import Dict, List, Callable, Optional
+from typing import Dict, List, Callable, Optional, Tuple
 from collections import deque
-from pynput import mouse, keyboard
+
+from monitoring.clock import SystemClock
+from monitoring.event_bus import EventBus
+from monitoring.sources import PynputInputSource, Win32LastInputSource
+from data.records import StateRecord
+
+
+# 每分钟计数的上限（uint16）
+MAX_MINUTE_COUNT = 65535
 
 
 class InputMonitor:
-    def __init__(self, idle_threshold=300):  # 5分钟 = 300秒
+    def __init__(self, idle_threshold=300, clock=None, source=None, use_hooks: bool = True,
+                 last_input_source=None):  # 5分钟 = 300秒
         """
         初始化输入监控器
         :param idle_threshold: 空闲阈值（秒），默认5分钟
+        :param clock: 时钟对象，默认使用系统时钟
+        :param source: 键鼠事件数据源，默认使用pynput全局钩子
+        :param use_hooks: 是否安装键鼠钩子统计按键/点击次数；关闭后只能检测空闲，不再计数
+        :param last_input_source: 最后输入时间数据源，在空闲检测时轮询；
+                                  不使用钩子时默认通过 GetLastInputInfo 读取
         """
+        self.clock = clock or SystemClock()
+        self.source = source or PynputInputSource()
+        self.use_hooks = use_hooks
+        if last_input_source is None and not use_hooks:
+            last_input_source = Win32LastInputSource()
+        self.last_input_source = last_input_source
         self.idle_threshold = idle_threshold
-        self.callbacks = []
+        self.events = EventBus("input")
 
         # 记录输入事件的队列（用于计算频率）
         self.keyboard_events = deque(maxlen=60)  # 保存最近60个键盘事件
         self.mouse_events = deque(maxlen=60)     # 保存最近60个鼠标事件
 
         # 最后活动时间
-        self.last_activity_time = datetime.now()
-
-        # 监听器
-        self.keyboard_listener = None
-        self.mouse_listener = None
+        self.last_activity_time = self.clock.now()
 
         # 统计数据
         self.keyboard_count = 0
         self.mouse_count = 0
         self.is_idle = False
 
+        # 当前小时内每分钟的按键/点击增量，整点后移入已完成队列等待写入
+        self.minute_lock = threading.Lock()
+        self.current_hour = self.clock.now().replace(minute=0, second=0, microsecond=0)
+        self.minute_counts = {'keyboard': array('H', bytes(120)), 'mouse': array('H', bytes(120))}
+        self.completed_hours = deque(maxlen=48)
+
+        # 当前前台会话内的按键/点击次数，窗口切换时由窗口监控器取走并清零
+        self.session_counts = {'keyboard': 0, 'mouse': 0}
+
         # 监控状态
         self.is_monitoring = False
 
-    def add_callback(self, callback: Callable):
-        """添加状态变化回调函数"""
-        self.callbacks.append(callback)
+    def add_callback(self, callback: Callable, **options):
+        """
+        添加状态变化回调函数，回调在订阅者自己的线程中执行，不阻塞键鼠钩子
+        :param options: 队列容量和溢出策略等，见 EventBus.subscribe
+        """
+        return self.events.subscribe(callback, **options)
 
     def on_key_press(self, key):
         """键盘按键事件处理"""
-        current_time = datetime.now()
+        current_time = self.clock.now()
         self.last_activity_time = current_time
         self.keyboard_count += 1
 
         # 记录事件时间
         self.keyboard_events.append(current_time)
+        self._count_minute('keyboard', current_time)
 
         # 如果之前是空闲状态，现在变为活跃状态
         if self.is_idle:
@@ -60,35 +91,78 @@ class InputMonitor:
         if not pressed:  # 只处理释放事件，避免重复计数
             return
 
-        current_time = datetime.now()
+        current_time = self.clock.now()
         self.last_activity_time = current_time
         self.mouse_count += 1
 
         # 记录事件时间
         self.mouse_events.append(current_time)
+        self._count_minute('mouse', current_time)
 
         # 如果之前是空闲状态，现在变为活跃状态
         if self.is_idle:
             self.is_idle = False
             self._notify_state_change('active')
 
-    def _notify_state_change(self, state: str):
-        """通知状态变化"""
-        record = {
-            'type': 'state_change',
-            'state': state,
-            'timestamp': datetime.now(),
-            'idle_duration': None
-        }
+    def _roll_hour(self, current_time: datetime):
+        """跨过整点时把上一小时的计数移入已完成队列（调用方需持有锁）"""
+        hour = current_time.replace(minute=0, second=0, microsecond=0)
+        if hour <= self.current_hour:
+            return
 
-        if state == 'idle':
-            record['idle_duration'] = datetime.now() - self.last_activity_time
+        if any(self.minute_counts['keyboard']) or any(self.minute_counts['mouse']):
+            self.completed_hours.append((self.current_hour, self.minute_counts['keyboard'],
+                                         self.minute_counts['mouse']))
+        self.current_hour = hour
+        self.minute_counts = {'keyboard': array('H', bytes(120)), 'mouse': array('H', bytes(120))}
+
+    def _count_minute(self, activity_type: str, current_time: datetime):
+        """在当前小时的分钟槽和当前前台会话中累加一次事件"""
+        with self.minute_lock:
+            self.session_counts[activity_type] += 1
+            self._roll_hour(current_time)
+            counts = self.minute_counts[activity_type]
+            if counts[current_time.minute] < MAX_MINUTE_COUNT:
+                counts[current_time.minute] += 1
+
+    def pop_completed_hours(self) -> List[Tuple[datetime, array, array]]:
+        """
+        取出已经结束的小时数据
+        :return: [(小时起点, 键盘60分钟计数, 鼠标60分钟计数), ...]
+        """
+        with self.minute_lock:
+            self._roll_hour(self.clock.now())
+            hours = list(self.completed_hours)
+            self.completed_hours.clear()
+        return hours
+
+    def pop_current_hour(self) -> Tuple[datetime, array, array]:
+        """取出当前未结束小时的计数并清零（停止监控时用于写入最后一段数据）"""
+        with self.minute_lock:
+            hour = self.current_hour
+            counts = self.minute_counts
+            self.minute_counts = {'keyboard': array('H', bytes(120)), 'mouse': array('H', bytes(120))}
+        return hour, counts['keyboard'], counts['mouse']
+
+    def take_session_counts(self) -> Tuple[int, int]:
+        """
+        取出当前前台会话内的计数并清零（窗口切换时调用）
+        :return: (按键次数, 点击次数)
+        """
+        with self.minute_lock:
+            counts = self.session_counts
+            self.session_counts = {'keyboard': 0, 'mouse': 0}
+        return counts['keyboard'], counts['mouse']
+
+    def _notify_state_change(self, state: str, timestamp: Optional[datetime] = None):
+        """
+        通知状态变化
+        :param timestamp: 状态变化的时间，默认为当前时间（轮询检测到恢复活动时使用实际的输入时间）
+        """
+        idle_duration = self.clock.now() - self.last_activity_time if state == 'idle' else None
+        record = StateRecord('state_change', state, timestamp or self.clock.now(), idle_duration)
 
-        for callback in self.callbacks:
-            try:
-                callback(record)
-            except Exception as e:
-                print(f"输入监控回调函数执行出错: {e}")
+        self.events.publish(record)
 
     def get_keyboard_frequency(self, window_seconds=60) -> float:
         """
@@ -99,7 +173,7 @@ class InputMonitor:
         if not self.keyboard_events:
             return 0.0
 
-        current_time = datetime.now()
+        current_time = self.clock.now()
         cutoff_time = current_time - timedelta(seconds=window_seconds)
 
         # 统计时间窗口内的事件数
@@ -118,7 +192,7 @@ class InputMonitor:
         if not self.mouse_events:
             return 0.0
 
-        current_time = datetime.now()
+        current_time = self.clock.now()
         cutoff_time = current_time - timedelta(seconds=window_seconds)
 
         # 统计时间窗口内的事件数
@@ -128,9 +202,45 @@ class InputMonitor:
         frequency = len(recent_events) * (60.0 / window_seconds)
         return frequency
 
+    def poll_last_input(self):
+        """
+        从最后输入时间数据源更新最后活动时间
+        空闲中检测到新的输入时切换为活跃状态（与钩子模式下按键时的处理相同）
+        """
+        if self.last_input_source is None:
+            return
+
+        idle_seconds = self.last_input_source.idle_seconds()
+        if idle_seconds is None:
+            return
+
+        last_input = self.clock.now() - timedelta(seconds=idle_seconds)
+        # 忽略计时精度带来的微小抖动
+        if last_input - self.last_activity_time <= timedelta(milliseconds=50):
+            return
+
+        self.last_activity_time = last_input
+        if self.is_idle:
+            self.is_idle = False
+            self._notify_state_change('active', last_input)
+
+    def is_away(self) -> bool:
+        """
+        用户是否仍处于空闲状态（后台维护任务在执行中反复调用，用户回来时立即停下）
+        不使用钩子时空闲状态要等下次 check_idle_status 才更新，这里直接读取最后输入时间，但不改变状态
+        """
+        if not self.is_idle:
+            return False
+        if self.last_input_source is not None:
+            idle_seconds = self.last_input_source.idle_seconds()
+            if idle_seconds is not None and idle_seconds < self.idle_threshold:
+                return False
+        return True
+
     def check_idle_status(self):
         """检查空闲状态"""
-        current_time = datetime.now()
+        self.poll_last_input()
+        current_time = self.clock.now()
         idle_duration = (current_time - self.last_activity_time).total_seconds()
 
         # 如果超过空闲阈值且当前不是空闲状态
@@ -140,7 +250,8 @@ class InputMonitor:
             print(f"用户进入空闲状态，空闲时长: {idle_duration:.1f}秒")
 
     def get_activity_summary(self) -> Dict:
-        """获取活动摘要"""
+        """获取活动摘要（不使用钩子时没有按键/点击统计，频率为0）"""
+        self.poll_last_input()
         return {
             'keyboard_frequency': self.get_keyboard_frequency(),
             'mouse_frequency': self.get_mouse_frequency(),
@@ -148,7 +259,7 @@ class InputMonitor:
             'total_mouse_events': self.mouse_count,
             'is_idle': self.is_idle,
             'last_activity': self.last_activity_time,
-            'idle_duration': (datetime.now() - self.last_activity_time).total_seconds()
+            'idle_duration': (self.clock.now() - self.last_activity_time).total_seconds()
         }
 
     def start_monitoring(self):
@@ -160,35 +271,40 @@ class InputMonitor:
         print("开始输入监控...")
         self.is_monitoring = True
 
-        # 启动键盘监听器
-        self.keyboard_listener = keyboard.Listener(on_press=self.on_key_press)
-        self.keyboard_listener.start()
+        if not self.use_hooks:
+            print("未安装键鼠钩子，通过轮询最后输入时间检测空闲")
+            return
 
-        # 启动鼠标监听器
-        self.mouse_listener = mouse.Listener(on_click=self.on_mouse_click)
-        self.mouse_listener.start()
+        # 启动键盘和鼠标监听
+        self.source.start(self.on_key_press, self.on_mouse_click)
 
         print("键盘和鼠标监控已启动")
 
     def stop_monitoring(self):
         """停止监控"""
+        # 等待订阅者处理完已发布的状态变化
+        self.events.drain(timeout=5)
+
         if not self.is_monitoring:
             return
 
         print("停止输入监控...")
-        self.is_monitoring = False
-
-        # 停止监听器
-        if self.keyboard_listener:
-            self.keyboard_listener.stop()
-        if self.mouse_listener:
-            self.mouse_listener.stop()
-
+        self._stop_source()
         print("输入监控已停止")
 
+    def _stop_source(self):
+        """停止键鼠监听器（不等待订阅者）"""
+        self.is_monitoring = False
+        if self.use_hooks:
+            self.source.stop()
+
     def __del__(self):
-        """析构函数，确保监听器被正确停止"""
-        self.stop_monitoring()
+        """
+        析构函数，确保监听器被停止
+        垃圾回收或解释器退出时不能阻塞，因此不等待订阅者处理完（需要时先调用 stop_monitoring）
+        """
+        if getattr(self, 'is_monitoring', False):
+            self._stop_source()
 
 
 # 测试代码
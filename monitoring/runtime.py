@@ -0,0 +1,335 @@
+"""
+异步监控运行时
+每个监控器作为独立的asyncio任务按各自的间隔运行，所有记录进入同一个队列，
+由唯一的写入协程在专用线程中批量提交到数据库
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Optional, List, Tuple, Dict, Any
+
+from monitoring.clock import SystemClock
+from data.maintenance import MaintenanceScheduler
+from data.live_status import LiveStatusWriter
+
+
+# 写入队列中的停止标记
+STOP = object()
+
+
+def publish_live_status(writer: LiveStatusWriter, window_monitor, input_monitor, now=None):
+    """把窗口监控器和输入监控器的当前状态写入实时状态文件"""
+    writer.publish(window_monitor.current_process, window_monitor.current_title, window_monitor.start_time,
+                   keyboard_rate=input_monitor.get_keyboard_frequency(),
+                   mouse_rate=input_monitor.get_mouse_frequency(),
+                   is_idle=input_monitor.is_idle, last_activity=input_monitor.last_activity_time,
+                   counting=input_monitor.use_hooks, now=now)
+
+
+class AsyncMonitorRuntime:
+    def __init__(self, storage, window_monitor, browser_monitor, input_monitor, clock=None,
+                 window_interval: float = 1.0, browser_interval: float = 1.0,
+                 idle_interval: float = 1.0, checkpoint_interval: float = 5.0,
+                 flush_interval: float = 2.0, batch_size: int = 500, verbose: bool = True,
+                 maintenance: bool = True, maintenance_interval: float = 30.0, live_status: bool = True,
+                 timeline_interval: float = 60.0):
+        """
+        初始化异步运行时
+        :param storage: DataStorage实例，其数据库连接只在写入线程中使用
+        :param clock: 时钟对象，与监控器使用同一个时钟
+        :param window_interval: 窗口检测间隔（秒）
+        :param browser_interval: 浏览器标签页检测间隔（秒）
+        :param idle_interval: 空闲检测间隔（秒）
+        :param checkpoint_interval: 会话日志心跳间隔（秒）
+        :param flush_interval: 写入协程攒批等待时间（秒），0表示有数据就写
+        :param batch_size: 单次提交的最大记录数
+        :param verbose: 是否在控制台打印记录
+        :param maintenance: 是否在用户空闲时执行数据库维护（ANALYZE、增量回收、WAL检查点等）
+        :param maintenance_interval: 空闲时检查是否有到期维护任务的间隔（秒）
+        :param live_status: 是否每次窗口检测后把当前状态写入实时状态文件供查看器读取
+        :param timeline_interval: 把新记录合并进派生活跃/空闲时间线的间隔（秒）
+        """
+        self.storage = storage
+        self.window_monitor = window_monitor
+        self.browser_monitor = browser_monitor
+        self.input_monitor = input_monitor
+        self.clock = clock or SystemClock()
+
+        self.window_interval = window_interval
+        self.browser_interval = browser_interval
+        self.idle_interval = idle_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.verbose = verbose
+        self.maintenance_interval = maintenance_interval
+        self.timeline_interval = timeline_interval
+
+        self.loop = None
+        self.loop_thread = None
+        self.queue = None
+        self.stop_event = None
+
+        # 数据库连接只在这一个线程里使用；虚拟时钟下没有并发的真实时间，写入直接在事件循环中执行，
+        # 省去每批记录的线程往返
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="focus-writer")
+        self.inline_writes = hasattr(self.clock, 'run_until')
+
+        # 维护任务与写入共用写入线程，不会同时使用数据库连接
+        self.maintenance = MaintenanceScheduler(storage.durable_db, clock=self.clock) if maintenance else None
+
+        self.live_status = LiveStatusWriter(storage.live_status_path) if live_status else None
+
+        # 统计数据
+        self.records_written = 0
+        self.batches_written = 0
+
+        # 会话日志心跳状态
+        self.last_checkpoint_time = None
+        self.last_checkpoint_start = None
+
+        # submit 只是把记录转交给事件循环，在发布方线程中直接调用（不经过订阅者工作线程），
+        # 检测任务都在事件循环中运行，记录按发布顺序进入写入队列，使用虚拟时钟时插入顺序是确定的
+        window_monitor.add_callback(lambda record: self.submit('window', record), name='runtime-window', inline=True)
+        browser_monitor.add_callback(lambda record: self.submit('browser', record), name='runtime-browser', inline=True)
+        input_monitor.add_callback(lambda record: self.submit('state', record), name='runtime-state', inline=True)
+
+    def submit(self, kind: str, record: Any):
+        """
+        提交一条待写入记录，可以从任意线程调用（pynput回调运行在自己的线程中）
+        在事件循环线程中直接入队，保持发布顺序；其他线程通过 call_soon_threadsafe 转交
+        :param kind: 'window'、'browser'、'state' 或 'input_minutes'
+        """
+        if self.loop is None:
+            return
+        if threading.get_ident() == self.loop_thread:
+            self.queue.put_nowait((kind, record))
+        else:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, (kind, record))
+
+    async def _in_writer(self, func, *args):
+        """在写入线程中执行数据库操作（虚拟时钟下直接在事件循环中执行）"""
+        if self.inline_writes:
+            return func(*args)
+        return await self.loop.run_in_executor(self.executor, func, *args)
+
+    def event_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """三个监控器事件总线上各订阅者的队列长度、丢弃数和处理延迟"""
+        metrics = {}
+        for monitor in (self.window_monitor, self.browser_monitor, self.input_monitor):
+            metrics.update(monitor.events.metrics())
+        return metrics
+
+    async def _window_task(self):
+        """窗口检测任务"""
+        while True:
+            self.window_monitor.check_window_change()
+            self._checkpoint()
+            if self.live_status is not None:
+                publish_live_status(self.live_status, self.window_monitor, self.input_monitor, self.clock.now())
+            await self.clock.sleep(self.window_interval)
+
+    async def _browser_task(self):
+        """浏览器标签页检测任务，直接使用窗口监控器的当前进程，不再重复查询前台窗口"""
+        while True:
+            if self.window_monitor.current_process:
+                self.browser_monitor.check_tab_change(self.window_monitor.current_process)
+            await self.clock.sleep(self.browser_interval)
+
+    async def _input_task(self):
+        """空闲检测任务，同时收集已结束小时的每分钟输入计数"""
+        while True:
+            self.input_monitor.check_idle_status()
+            for hour in self.input_monitor.pop_completed_hours():
+                self.submit('input_minutes', hour)
+            await self.clock.sleep(self.idle_interval)
+
+    async def _maintenance_task(self):
+        """用户空闲时在写入线程中分片执行到期的维护任务，用户回来后立即停下，下次空闲时继续"""
+        def keep_going():
+            return self.input_monitor.is_away() and not self.stop_event.is_set()
+
+        while True:
+            if keep_going() and self.maintenance.pending():
+                finished = await self._in_writer(self.maintenance.run_slice, keep_going)
+                if not finished:
+                    # 预算用完或被打断，稍后继续；期间写入协程可以提交积攒的记录
+                    await self.clock.sleep(self.idle_interval)
+                    continue
+            await self.clock.sleep(self.maintenance_interval)
+
+    async def _hot_tier_task(self):
+        """长时间没有新记录时也按间隔把热层刷写到数据库（在写入线程中执行）"""
+        while True:
+            await self.clock.sleep(self.storage.hot_tier.flush_interval)
+            await self._in_writer(self.storage.hot_tier.flush_if_due)
+
+    async def _timeline_task(self):
+        """按间隔在写入线程中刷新派生时间线，读取方（查看器、报告）不再需要写数据库"""
+        while True:
+            await self.clock.sleep(self.timeline_interval)
+            await self._in_writer(self.storage.durable_db.refresh_activity_timeline)
+
+    def _checkpoint(self):
+        """窗口切换后或每隔 checkpoint_interval 秒写一次会话日志心跳"""
+        start_time = self.window_monitor.start_time
+        if start_time is None:
+            return
+
+        now = self.clock.now()
+        if (start_time != self.last_checkpoint_start or self.last_checkpoint_time is None
+                or (now - self.last_checkpoint_time).total_seconds() >= self.checkpoint_interval):
+            self.storage.journal.checkpoint(self.window_monitor.current_process,
+                                            self.window_monitor.current_title, start_time, now)
+            self.last_checkpoint_time = now
+            self.last_checkpoint_start = start_time
+
+    async def _writer(self):
+        """唯一的写入协程：攒批后在写入线程中执行插入并一次提交"""
+        stopping = False
+        while True:
+            if stopping and self.queue.empty():
+                return
+
+            batch = [await self.queue.get()]
+
+            if self.flush_interval > 0 and not self.stop_event.is_set():
+                try:
+                    await asyncio.wait_for(self.stop_event.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            stopping = stopping or any(kind is STOP for kind, _ in batch)
+            records = [(kind, record) for kind, record in batch if kind is not STOP]
+            if records:
+                await self._in_writer(self._write_batch, records)
+
+    def _write_batch(self, records: List[Tuple[str, Any]]):
+        """在写入线程中执行一批插入"""
+        db = self.storage.db
+        for kind, record in records:
+            try:
+                if kind == 'window':
+                    db.insert_window_activity(
+                        process_name=record['process_name'],
+                        window_title=record['window_title'],
+                        start_time=record['start_time'],
+                        end_time=record['end_time'],
+                        duration=record['duration'],
+                        keystrokes=record.get('keystrokes', 0),
+                        clicks=record.get('clicks', 0),
+                        commit=False
+                    )
+                elif kind == 'browser':
+                    db.insert_browser_activity(
+                        browser_name=record['browser'],
+                        page_title=record['title'],
+                        page_url=record['url'],
+                        start_time=record['timestamp'],
+                        commit=False
+                    )
+                elif kind == 'state':
+                    idle_duration = None
+                    if record['state'] == 'idle' and record['idle_duration']:
+                        idle_duration = record['idle_duration'].total_seconds()
+                    db.insert_state_change(record['state'], record['timestamp'], idle_duration, commit=False)
+                elif kind == 'input_minutes':
+                    hour_start, keyboard_counts, mouse_counts = record
+                    if any(keyboard_counts):
+                        db.upsert_input_minutes(hour_start, 'keyboard', keyboard_counts, commit=False)
+                    if any(mouse_counts):
+                        db.upsert_input_minutes(hour_start, 'mouse', mouse_counts, commit=False)
+            except Exception as e:
+                print(f"写入{kind}记录时出错: {e}")
+
+            if self.verbose and kind == 'window':
+                print(f"📊 [{record['duration']:6.1f}s] {record['process_name']} - {record['window_title'][:50]}")
+
+        db.commit()
+        self.records_written += len(records)
+        self.batches_written += 1
+
+    async def run(self, duration: Optional[float] = None):
+        """
+        运行所有监控任务，直到 stop() 被调用、任务被取消（Ctrl+C）或运行满 duration 秒
+        使用虚拟时钟时，duration 按虚拟时间计算并由本协程推进时钟
+        """
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        self.queue = asyncio.Queue()
+        self.stop_event = asyncio.Event()
+
+        writer = asyncio.create_task(self._writer())
+        probes = [
+            asyncio.create_task(self._window_task()),
+            asyncio.create_task(self._browser_task()),
+            asyncio.create_task(self._input_task()),
+            asyncio.create_task(self._timeline_task()),
+        ]
+        if self.maintenance is not None:
+            probes.append(asyncio.create_task(self._maintenance_task()))
+        if self.storage.hot_tier is not None:
+            probes.append(asyncio.create_task(self._hot_tier_task()))
+
+        try:
+            if duration is None:
+                await self.stop_event.wait()
+            elif hasattr(self.clock, 'run_until'):
+                await self.clock.run_until(self.clock.now() + timedelta(seconds=duration))
+            else:
+                await asyncio.wait_for(self.stop_event.wait(), timeout=duration)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            pass
+        finally:
+            await self._shutdown(probes, writer)
+
+    def stop(self):
+        """请求停止（可以从任意线程调用）"""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.stop_event.set)
+
+    async def _shutdown(self, probes: List[asyncio.Task], writer: asyncio.Task):
+        """停止检测任务，把最后的会话和计数写入队列，等待写入协程全部写完"""
+        self.stop_event.set()
+        for task in probes:
+            task.cancel()
+        await asyncio.gather(*probes, return_exceptions=True)
+
+        # 结束进行中的会话，产生的记录通过 submit 进入队列（stop_monitoring 等待订阅者处理完）
+        self.window_monitor.stop_monitoring()
+        self.browser_monitor.stop_monitoring()
+        self.input_monitor.stop_monitoring()
+        if self.live_status is not None:
+            self.live_status.close()
+        for hour in self.input_monitor.pop_completed_hours():
+            self.submit('input_minutes', hour)
+        self.submit('input_minutes', self.input_monitor.pop_current_hour())
+
+        # 停止标记排在之前所有 call_soon_threadsafe 提交的记录之后
+        self.loop.call_soon(self.queue.put_nowait, (STOP, None))
+        await writer
+
+        await self._in_writer(self.storage.durable_db.refresh_activity_timeline)
+        self.executor.shutdown(wait=True)
+        self.storage.mark_window_session_saved()
+        print(f"写入协程已停止，共写入 {self.records_written} 条记录，{self.batches_written} 次提交")
+        for name, values in self.event_metrics().items():
+            if values['dropped']:
+                print(f"事件订阅者 {name} 丢弃了 {values['dropped']} 条记录")
+        if self.maintenance is not None:
+            for name, values in self.maintenance.metrics().items():
+                if values['steps']:
+                    print(f"维护任务 {name}: 完成 {values['rounds']} 轮，{values['steps']} 步，"
+                          f"耗时 {values['seconds']:.2f} 秒，中断 {values['interrupted']} 次")
+        if self.storage.hot_tier is not None:
+            values = self.storage.hot_tier.metrics()
+            print(f"热层: 刷写 {values['flushes']} 次共 {values['records_flushed']} 条，"
+                  f"重做日志 {values['log_bytes']} 字节 / {values['log_syncs']} 次 fsync，"
+                  f"内存查询 {values['hot_reads']} 次")
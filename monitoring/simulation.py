@@ -0,0 +1,135 @@
+"""
+模拟监控模块
+用虚拟时钟和随机生成的前台窗口/输入事件驱动异步运行时，
+不依赖Windows API和pynput，几小时的监控在几秒内跑完
+（每个检测任务每虚拟秒仍要在事件循环中运行一次，耗时与模拟时长成正比，
+8小时约十万次任务唤醒，加上时间线刷新和会话日志心跳的实际写入）
+
+用法:
+    python -m monitoring.simulation --hours 8
+"""
+import sys
+import os
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from datetime import timedelta
+from typing import Optional, Tuple
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monitoring.clock import FakeClock
+from monitoring.window_monitor import WindowMonitor
+from monitoring.browser_monitor import BrowserMonitor
+from monitoring.input_monitor import InputMonitor
+from monitoring.runtime import AsyncMonitorRuntime
+from data.storage import DataStorage
+from data.records import TabRecord
+
+
+SIMULATED_APPS = ['code.exe', 'chrome.exe', 'explorer.exe', 'python.exe', 'cmd.exe', 'WeChat.exe']
+
+
+class SimulatedWindowMonitor(WindowMonitor):
+    """按虚拟时间随机切换前台窗口的窗口监控器"""
+
+    def __init__(self, clock, seed: int = 0, mean_session: float = 90.0, input_monitor=None):
+        super().__init__(clock=clock, input_monitor=input_monitor)
+        self.rng = random.Random(seed)
+        self.mean_session = mean_session
+        self.foreground = None
+        self.next_switch = clock.now()
+
+    def get_active_window_info(self) -> Optional[Tuple[str, str, int]]:
+        now = self.clock.now()
+        if self.foreground is None or now >= self.next_switch:
+            app = self.rng.choice(SIMULATED_APPS)
+            title = f"文档{self.rng.randint(1, 20)} - {app}"
+            if app == 'chrome.exe':
+                title = f"页面{self.rng.randint(1, 20)} - Google Chrome"
+            self.foreground = (app, title, 0)
+            self.next_switch = now + timedelta(seconds=self.rng.expovariate(1.0 / self.mean_session) + 1)
+        return self.foreground
+
+
+class SimulatedBrowserMonitor(BrowserMonitor):
+    """从模拟窗口标题解析标签页的浏览器监控器"""
+
+    def __init__(self, clock, window_monitor: SimulatedWindowMonitor):
+        super().__init__(clock=clock)
+        self.window_monitor = window_monitor
+
+    def get_current_tab_info(self, process_name: str):
+        if process_name != 'chrome.exe' or not self.window_monitor.current_title:
+            return None
+        return TabRecord('Chrome', self.window_monitor.current_title.replace(" - Google Chrome", ""),
+                         'chrome://simulated', self.window_monitor.start_time)
+
+
+async def drive_input(input_monitor: InputMonitor, clock, seed: int = 0, events_per_second: float = 2.0):
+    """按虚拟时间每秒产生一批键盘/鼠标事件，偶尔停顿进入空闲"""
+    rng = random.Random(seed)
+    while True:
+        if rng.random() < 0.0005:
+            await clock.sleep(rng.uniform(input_monitor.idle_threshold, input_monitor.idle_threshold * 4))
+        for _ in range(int(rng.expovariate(1.0 / events_per_second))):
+            if rng.random() < 0.8:
+                input_monitor.on_key_press(None)
+            else:
+                input_monitor.on_mouse_click(0, 0, None, True)
+        await clock.sleep(1.0)
+
+
+async def run_simulation(storage: DataStorage, hours: float, seed: int = 0,
+                         idle_threshold: float = 300) -> AsyncMonitorRuntime:
+    """
+    在虚拟时间中运行完整的监控流程
+    :param storage: 数据存储
+    :param hours: 模拟的小时数
+    :param seed: 随机种子
+    :param idle_threshold: 空闲阈值（秒）
+    """
+    clock = FakeClock()
+    input_monitor = InputMonitor(idle_threshold=idle_threshold, clock=clock)
+    window_monitor = SimulatedWindowMonitor(clock, seed, input_monitor=input_monitor)
+    browser_monitor = SimulatedBrowserMonitor(clock, window_monitor)
+
+    runtime = AsyncMonitorRuntime(storage, window_monitor, browser_monitor, input_monitor,
+                                  clock=clock, flush_interval=0, verbose=False)
+
+    driver = asyncio.create_task(drive_input(input_monitor, clock, seed))
+    try:
+        await runtime.run(duration=hours * 3600)
+    finally:
+        driver.cancel()
+    return runtime
+
+
+def main():
+    """主函数 - 在临时目录中运行模拟并打印统计"""
+    parser = argparse.ArgumentParser(description="Focus-Insight 虚拟时钟模拟运行")
+    parser.add_argument('--hours', type=float, default=8, help="模拟的小时数")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="focus_sim_")
+    storage = DataStorage(data_dir)
+
+    begin = time.perf_counter()
+    runtime = asyncio.run(run_simulation(storage, args.hours, args.seed))
+    elapsed = time.perf_counter() - begin
+
+    summary = storage.db.get_daily_summary(FakeClock().now())
+    print(f"模拟 {args.hours} 小时用时 {elapsed:.2f} 秒，写入 {runtime.records_written} 条记录")
+    print(f"活跃时间: {summary['total_active_time'] / 3600:.2f} 小时, "
+          f"空闲时间: {summary['total_idle_time'] / 3600:.2f} 小时, 应用数量: {summary['app_count']}")
+
+    storage.close()
+    print(f"模拟数据位于: {data_dir}")
+
+
+if __name__ == "__main__":
+    main()
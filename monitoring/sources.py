@@ -0,0 +1,132 @@
+"""
+系统数据源模块
+监控器通过数据源读取前台窗口和键鼠事件，Windows API和pynput只在这里使用；
+测试、模拟和轨迹回放时替换为其它实现，监控逻辑不依赖具体平台
+"""
+from typing import Optional, Tuple, Callable
+
+
+# 前台窗口快照：(进程名, 窗口标题, 窗口句柄)
+ForegroundInfo = Tuple[str, str, int]
+
+
+class Win32ForegroundSource:
+    """通过Windows API读取前台窗口"""
+
+    def get_foreground(self) -> Optional[ForegroundInfo]:
+        """
+        获取当前活动窗口信息
+        返回: (进程名, 窗口标题, 窗口句柄)
+        """
+        try:
+            import win32gui
+            import win32process
+            import win32api
+            import win32con
+
+            # 获取前台窗口句柄
+            hwnd = win32gui.GetForegroundWindow()
+            if not hwnd:
+                return None
+
+            # 获取窗口标题
+            window_title = win32gui.GetWindowText(hwnd)
+            if not window_title:
+                window_title = "无标题窗口"
+
+            # 获取进程信息
+            _, pid = win32process.GetWindowThreadProcessId(hwnd)
+            process = win32api.OpenProcess(win32con.PROCESS_QUERY_INFORMATION | win32con.PROCESS_VM_READ, False, pid)
+            try:
+                # 尝试获取进程名
+                exe_path = win32process.GetModuleFileNameEx(process, 0)
+                process_name = exe_path.split('\\')[-1]
+            except:
+                process_name = f"进程_{pid}"
+            finally:
+                win32api.CloseHandle(process)
+
+            return process_name, window_title, hwnd
+
+        except Exception as e:
+            print(f"获取窗口信息时出错: {e}")
+            return None
+
+
+class PynputInputSource:
+    """通过pynput全局钩子接收键盘和鼠标事件"""
+
+    def __init__(self):
+        self.keyboard_listener = None
+        self.mouse_listener = None
+
+    def start(self, on_key_press: Callable, on_mouse_click: Callable):
+        """
+        启动监听器，事件在pynput自己的线程中回调
+        :param on_key_press: on_key_press(key)
+        :param on_mouse_click: on_mouse_click(x, y, button, pressed)
+        """
+        from pynput import mouse, keyboard
+
+        self.keyboard_listener = keyboard.Listener(on_press=on_key_press)
+        self.keyboard_listener.start()
+
+        self.mouse_listener = mouse.Listener(on_click=on_mouse_click)
+        self.mouse_listener.start()
+
+    def stop(self):
+        """停止监听器"""
+        if self.keyboard_listener:
+            self.keyboard_listener.stop()
+            self.keyboard_listener = None
+        if self.mouse_listener:
+            self.mouse_listener.stop()
+            self.mouse_listener = None
+
+
+class Win32LastInputSource:
+    """通过 GetLastInputInfo 轮询系统最后一次输入距今的时间，不需要安装全局钩子"""
+
+    def __init__(self):
+        import ctypes
+
+        class LASTINPUTINFO(ctypes.Structure):
+            _fields_ = [('cbSize', ctypes.c_uint), ('dwTime', ctypes.c_uint)]
+
+        self.ctypes = ctypes
+        self.info = LASTINPUTINFO()
+        self.info.cbSize = ctypes.sizeof(LASTINPUTINFO)
+
+    def idle_seconds(self) -> Optional[float]:
+        """最后一次键鼠输入距今的秒数，读取失败时返回None"""
+        try:
+            user32 = self.ctypes.windll.user32
+            kernel32 = self.ctypes.windll.kernel32
+            if not user32.GetLastInputInfo(self.ctypes.byref(self.info)):
+                return None
+            # 两者都是开机以来的毫秒数（32位，约49天回绕一次）
+            millis = (kernel32.GetTickCount() - self.info.dwTime) & 0xFFFFFFFF
+            return millis / 1000.0
+        except Exception as e:
+            print(f"获取最后输入时间时出错: {e}")
+            return None
+
+
+class FakeLastInputSource:
+    """可控的最后输入时间数据源，用于测试和模拟"""
+
+    def __init__(self, clock):
+        """
+        初始化
+        :param clock: 与监控器相同的时钟对象
+        """
+        self.clock = clock
+        self.last_input = clock.now()
+
+    def touch(self, moment=None):
+        """模拟一次输入"""
+        self.last_input = moment or self.clock.now()
+
+    def idle_seconds(self) -> Optional[float]:
+        """最后一次输入距今的秒数"""
+        return max((self.clock.now() - self.last_input).total_seconds(), 0.0)
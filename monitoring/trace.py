@@ -0,0 +1,400 @@
+"""
+监控轨迹录制与回放模块
+录制真实会话中数据源的原始探测结果（前台窗口快照、键鼠事件时间、空闲切换），
+回放时把它们重新喂给 WindowMonitor/BrowserMonitor/InputMonitor 和存储流程，
+可以按真实速度或尽可能快地运行，在任何平台上复现吞吐和延迟测试
+
+文件格式（小端）:
+    文件头  magic 'FIT1', 版本(u16), 起始时间戳(f64), 空闲阈值(f64)
+    记录    类型(u8), 距上一条记录的毫秒数(u32), 负载
+    字符串  类型 STRING，负载为长度(u16) + UTF-8，按出现顺序编号，之后用编号引用
+    前台窗口只在变化时记录（进程名编号, 标题编号），-1 表示没有前台窗口
+
+用法:
+    python main.py --async --record-trace session.trace      # 在Windows上录制
+    python -m monitoring.trace session.trace --speed 0        # 尽可能快地回放
+"""
+import sys
+import os
+import time
+import struct
+import bisect
+import asyncio
+import argparse
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from typing import List, Tuple, Optional, Dict, Any, Iterator, Callable
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monitoring.clock import SystemClock, FakeClock
+from monitoring.sources import ForegroundInfo
+
+
+TRACE_MAGIC = b'FIT1'
+TRACE_VERSION = 1
+HEADER = struct.Struct('<4sHdd')
+RECORD = struct.Struct('<BI')
+STRING_LENGTH = struct.Struct('<H')
+FOREGROUND = struct.Struct('<ii')
+
+# 记录类型
+KIND_STRING = 0
+KIND_FOREGROUND = 1
+KIND_KEY = 2
+KIND_CLICK = 3
+KIND_IDLE = 4
+KIND_ACTIVE = 5
+KIND_END = 6
+
+MAX_DELTA_MS = 0xFFFFFFFF
+
+
+class TraceWriter:
+    def __init__(self, path: str, start: datetime, idle_threshold: float = 300):
+        """
+        初始化轨迹写入器
+        :param path: 轨迹文件路径
+        :param start: 录制起始时间
+        :param idle_threshold: 录制时使用的空闲阈值（回放时沿用）
+        """
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(TRACE_MAGIC, TRACE_VERSION, start.timestamp(), idle_threshold))
+
+        # 键鼠事件来自钩子线程，写入需要加锁
+        self.lock = threading.Lock()
+        self.last_ms = 0
+        self.start_ts = start.timestamp()
+        self.strings: Dict[str, int] = {}
+        self.last_foreground = None
+        self.record_count = 0
+
+    def _write(self, kind: int, moment: datetime, payload: bytes = b''):
+        """写入一条记录（调用方需持有锁）"""
+        ms = max(int((moment.timestamp() - self.start_ts) * 1000), self.last_ms)
+        delta = min(ms - self.last_ms, MAX_DELTA_MS)
+        self.last_ms += delta
+        self.file.write(RECORD.pack(kind, delta) + payload)
+        self.record_count += 1
+
+    def _string_id(self, text: str, moment: datetime) -> int:
+        """字符串编号，第一次出现时写入字符串定义"""
+        if text not in self.strings:
+            data = text.encode('utf-8')[:0xFFFF]
+            self.strings[text] = len(self.strings)
+            self._write(KIND_STRING, moment, STRING_LENGTH.pack(len(data)) + data)
+        return self.strings[text]
+
+    def write_foreground(self, moment: datetime, info: Optional[ForegroundInfo]):
+        """记录前台窗口快照（与上一次相同时不写）"""
+        key = (info[0], info[1]) if info else None
+        with self.lock:
+            if key == self.last_foreground:
+                return
+            self.last_foreground = key
+            if key is None:
+                self._write(KIND_FOREGROUND, moment, FOREGROUND.pack(-1, -1))
+            else:
+                process_id = self._string_id(key[0], moment)
+                title_id = self._string_id(key[1], moment)
+                self._write(KIND_FOREGROUND, moment, FOREGROUND.pack(process_id, title_id))
+
+    def write_event(self, kind: int, moment: datetime):
+        """记录一次按键、点击或空闲切换"""
+        with self.lock:
+            self._write(kind, moment)
+
+    def close(self, end: Optional[datetime] = None):
+        """写入结束标记并关闭文件"""
+        with self.lock:
+            if self.file is None:
+                return
+            self._write(KIND_END, end or datetime.now())
+            self.file.close()
+            self.file = None
+
+
+class Trace:
+    def __init__(self, path: str):
+        """
+        读取整个轨迹文件
+        :param path: 轨迹文件路径
+        """
+        self.path = path
+        self.foreground: List[Tuple[datetime, Optional[ForegroundInfo]]] = []
+        self.inputs: List[Tuple[datetime, int]] = []
+        self.states: List[Tuple[datetime, int]] = []
+
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        magic, version, start_ts, self.idle_threshold = HEADER.unpack_from(data, 0)
+        if magic != TRACE_MAGIC or version != TRACE_VERSION:
+            raise ValueError(f"不是有效的轨迹文件: {path}")
+        self.start = datetime.fromtimestamp(start_ts)
+        self.end = self.start
+
+        strings = []
+        for kind, moment, payload in self._iter_records(data, HEADER.size):
+            if kind == KIND_STRING:
+                strings.append(payload)
+            elif kind == KIND_FOREGROUND:
+                process_id, title_id = payload
+                info = None if process_id < 0 else (strings[process_id], strings[title_id], 0)
+                self.foreground.append((moment, info))
+            elif kind in (KIND_KEY, KIND_CLICK):
+                self.inputs.append((moment, kind))
+            elif kind in (KIND_IDLE, KIND_ACTIVE):
+                self.states.append((moment, kind))
+            self.end = max(self.end, moment)
+
+    def _iter_records(self, data: bytes, offset: int) -> Iterator[Tuple[int, datetime, Any]]:
+        """逐条解析记录，文件末尾不完整的记录（录制中断）被忽略"""
+        elapsed_ms = 0
+        while offset + RECORD.size <= len(data):
+            kind, delta = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+            elapsed_ms += delta
+            moment = self.start + timedelta(milliseconds=elapsed_ms)
+
+            payload = None
+            if kind == KIND_STRING:
+                if offset + STRING_LENGTH.size > len(data):
+                    return
+                (length,) = STRING_LENGTH.unpack_from(data, offset)
+                offset += STRING_LENGTH.size
+                if offset + length > len(data):
+                    return
+                payload = data[offset:offset + length].decode('utf-8', errors='replace')
+                offset += length
+            elif kind == KIND_FOREGROUND:
+                if offset + FOREGROUND.size > len(data):
+                    return
+                payload = FOREGROUND.unpack_from(data, offset)
+                offset += FOREGROUND.size
+            yield kind, moment, payload
+
+    @property
+    def duration(self) -> float:
+        """轨迹时长（秒）"""
+        return (self.end - self.start).total_seconds()
+
+
+class RecordingForegroundSource:
+    """包装真实的前台窗口数据源，把每次探测结果写入轨迹（只记录变化）"""
+
+    def __init__(self, inner, writer: TraceWriter, clock=None):
+        self.inner = inner
+        self.writer = writer
+        self.clock = clock or SystemClock()
+
+    def get_foreground(self) -> Optional[ForegroundInfo]:
+        info = self.inner.get_foreground()
+        self.writer.write_foreground(self.clock.now(), info)
+        return info
+
+
+class RecordingInputSource:
+    """包装真实的键鼠数据源，转发事件前记录事件时间"""
+
+    def __init__(self, inner, writer: TraceWriter, clock=None):
+        self.inner = inner
+        self.writer = writer
+        self.clock = clock or SystemClock()
+
+    def start(self, on_key_press: Callable, on_mouse_click: Callable):
+        def key_press(key):
+            self.writer.write_event(KIND_KEY, self.clock.now())
+            on_key_press(key)
+
+        def mouse_click(x, y, button, pressed):
+            if pressed:
+                self.writer.write_event(KIND_CLICK, self.clock.now())
+            on_mouse_click(x, y, button, pressed)
+
+        self.inner.start(key_press, mouse_click)
+
+    def stop(self):
+        self.inner.stop()
+
+
+def attach_recorder(writer: TraceWriter, window_monitor, browser_monitor, input_monitor):
+    """
+    让三个监控器通过录制数据源工作，并记录空闲切换
+    在 start_monitoring 之前调用
+    """
+    clock = window_monitor.clock
+    foreground = RecordingForegroundSource(window_monitor.source, writer, clock)
+    window_monitor.source = foreground
+    browser_monitor.source = foreground
+    input_monitor.source = RecordingInputSource(input_monitor.source, writer, clock)
+    input_monitor.add_callback(
+        lambda record: writer.write_event(KIND_IDLE if record['state'] == 'idle' else KIND_ACTIVE,
+                                          record['timestamp']),
+        name='trace-recorder')
+
+
+class ReplayClock:
+    """按轨迹时间运行的真实时钟，speed 倍速推进"""
+
+    def __init__(self, start: datetime, speed: float = 1.0):
+        """
+        初始化回放时钟
+        :param start: 轨迹起始时间
+        :param speed: 回放倍速
+        """
+        self.start = start
+        self.speed = speed
+        self.origin = time.monotonic()
+
+    def now(self) -> datetime:
+        """当前轨迹时间"""
+        return self.start + timedelta(seconds=(time.monotonic() - self.origin) * self.speed)
+
+    def time(self) -> float:
+        """当前轨迹时间戳（秒）"""
+        return self.now().timestamp()
+
+    async def sleep(self, seconds: float):
+        """按倍速缩短的真实等待"""
+        await asyncio.sleep(max(seconds, 0) / self.speed)
+
+
+class ReplayForegroundSource:
+    """按时钟返回轨迹中当时的前台窗口"""
+
+    def __init__(self, snapshots: List[Tuple[datetime, Optional[ForegroundInfo]]], clock):
+        self.times = [moment for moment, _ in snapshots]
+        self.infos = [info for _, info in snapshots]
+        self.clock = clock
+        self.probes = 0
+
+    def get_foreground(self) -> Optional[ForegroundInfo]:
+        self.probes += 1
+        index = bisect.bisect_right(self.times, self.clock.now()) - 1
+        return self.infos[index] if index >= 0 else None
+
+
+class ReplayInputSource:
+    """保存监控器的事件回调，由 drive 协程按轨迹时间触发"""
+
+    def __init__(self, events: List[Tuple[datetime, int]], clock):
+        self.events = events
+        self.clock = clock
+        self.on_key_press = None
+        self.on_mouse_click = None
+        self.delivered = 0
+
+    def start(self, on_key_press: Callable, on_mouse_click: Callable):
+        self.on_key_press = on_key_press
+        self.on_mouse_click = on_mouse_click
+
+    def stop(self):
+        self.on_key_press = None
+        self.on_mouse_click = None
+
+    async def drive(self):
+        """按时间顺序触发事件，同一毫秒的事件连续触发"""
+        for moment, kind in self.events:
+            wait = (moment - self.clock.now()).total_seconds()
+            if wait > 0:
+                await self.clock.sleep(wait)
+            if self.on_key_press is None:
+                return
+            if kind == KIND_KEY:
+                self.on_key_press(None)
+            else:
+                self.on_mouse_click(0, 0, None, True)
+            self.delivered += 1
+
+
+class TraceReplayer:
+    def __init__(self, trace: Trace, storage, speed: float = 0, verbose: bool = False):
+        """
+        初始化回放器
+        :param trace: 已读取的轨迹
+        :param storage: DataStorage实例，回放结果写入其中
+        :param speed: 回放倍速，0表示使用虚拟时钟尽可能快地运行
+        :param verbose: 是否打印写入的记录
+        """
+        self.trace = trace
+        self.storage = storage
+        self.speed = speed
+        self.verbose = verbose
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        回放整个轨迹
+        :return: 用时、探测次数、事件数、写入记录数和事件订阅者统计
+        """
+        from monitoring.window_monitor import WindowMonitor
+        from monitoring.browser_monitor import BrowserMonitor
+        from monitoring.input_monitor import InputMonitor
+        from monitoring.runtime import AsyncMonitorRuntime
+
+        trace = self.trace
+        clock = FakeClock(trace.start) if self.speed <= 0 else ReplayClock(trace.start, self.speed)
+
+        foreground = ReplayForegroundSource(trace.foreground, clock)
+        inputs = ReplayInputSource(trace.inputs, clock)
+        input_monitor = InputMonitor(idle_threshold=trace.idle_threshold, clock=clock, source=inputs)
+        window_monitor = WindowMonitor(clock=clock, source=foreground, input_monitor=input_monitor)
+        browser_monitor = BrowserMonitor(clock=clock, source=foreground)
+
+        runtime = AsyncMonitorRuntime(self.storage, window_monitor, browser_monitor, input_monitor,
+                                      clock=clock, flush_interval=0 if self.speed <= 0 else 2.0,
+                                      verbose=self.verbose)
+
+        begin = time.perf_counter()
+        input_monitor.start_monitoring()
+        driver = asyncio.create_task(inputs.drive())
+        try:
+            # 虚拟时钟按轨迹时间运行；真实时钟按倍速换算为真实秒数
+            duration = trace.duration if self.speed <= 0 else trace.duration / self.speed
+            await runtime.run(duration=duration)
+        finally:
+            driver.cancel()
+        elapsed = time.perf_counter() - begin
+
+        return {
+            'trace_seconds': trace.duration,
+            'elapsed_seconds': elapsed,
+            'speedup': trace.duration / elapsed if elapsed > 0 else 0.0,
+            'probes': foreground.probes,
+            'input_events': inputs.delivered,
+            'records_written': runtime.records_written,
+            'batches_written': runtime.batches_written,
+            'event_metrics': runtime.event_metrics(),
+        }
+
+
+def main():
+    """主函数 - 把轨迹回放到临时数据目录并打印统计"""
+    parser = argparse.ArgumentParser(description="Focus-Insight 监控轨迹回放")
+    parser.add_argument('trace', help="轨迹文件路径")
+    parser.add_argument('--speed', type=float, default=0, help="回放倍速，0表示尽可能快")
+    parser.add_argument('--data-dir', default=None, help="回放数据目录，默认使用临时目录")
+    args = parser.parse_args()
+
+    from data.storage import DataStorage
+
+    trace = Trace(args.trace)
+    print(f"轨迹: {trace.start} 到 {trace.end}，{len(trace.foreground)} 次窗口变化，"
+          f"{len(trace.inputs)} 个键鼠事件，{len(trace.states)} 次空闲切换")
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="focus_replay_")
+    storage = DataStorage(data_dir)
+    result = asyncio.run(TraceReplayer(trace, storage, speed=args.speed).run())
+    storage.close()
+
+    print(f"回放 {result['trace_seconds'] / 3600:.2f} 小时用时 {result['elapsed_seconds']:.2f} 秒"
+          f"（{result['speedup']:.0f} 倍速），{result['probes']} 次探测，"
+          f"写入 {result['records_written']} 条记录")
+    print(f"回放数据位于: {data_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,60 +2,45 @@
 窗口监控模块
 负责记录当前聚焦的顶层应用名称及其窗口标题
 """
-import win32gui
-import win32process
-import win32api
-import win32con
 import time
 from typing import Optional, Tuple
-from datetime import datetime
+
+from monitoring.clock import SystemClock
+from monitoring.event_bus import EventBus
+from monitoring.sources import Win32ForegroundSource
+from data.records import WindowRecord
 
 
 class WindowMonitor:
-    def __init__(self):
+    def __init__(self, clock=None, source=None, input_monitor=None):
+        """
+        初始化窗口监控器
+        :param clock: 时钟对象，默认使用系统时钟
+        :param source: 前台窗口数据源，默认通过Windows API读取
+        :param input_monitor: 输入监控器，提供时把会话期间的按键/点击次数写入窗口记录
+        """
+        self.clock = clock or SystemClock()
+        self.source = source or Win32ForegroundSource()
+        self.input_monitor = input_monitor
         self.current_window = None
         self.current_title = ""
         self.current_process = ""
         self.start_time = None
-        self.callbacks = []
+        self.events = EventBus("window")
 
-    def add_callback(self, callback):
-        """添加数据回调函数"""
-        self.callbacks.append(callback)
+    def add_callback(self, callback, **options):
+        """
+        添加数据回调函数，回调在订阅者自己的线程中执行，不阻塞检测
+        :param options: 队列容量和溢出策略等，见 EventBus.subscribe
+        """
+        return self.events.subscribe(callback, **options)
 
-    def get_active_window_info(self) -> Optional[Tuple[str, str, str]]:
+    def get_active_window_info(self) -> Optional[Tuple[str, str, int]]:
         """
         获取当前活动窗口信息
         返回: (进程名, 窗口标题, 窗口句柄)
         """
-        try:
-            # 获取前台窗口句柄
-            hwnd = win32gui.GetForegroundWindow()
-            if not hwnd:
-                return None
-
-            # 获取窗口标题
-            window_title = win32gui.GetWindowText(hwnd)
-            if not window_title:
-                window_title = "无标题窗口"
-
-            # 获取进程信息
-            _, pid = win32process.GetWindowThreadProcessId(hwnd)
-            process = win32api.OpenProcess(win32con.PROCESS_QUERY_INFORMATION | win32con.PROCESS_VM_READ, False, pid)
-            try:
-                # 尝试获取进程名
-                exe_path = win32process.GetModuleFileNameEx(process, 0)
-                process_name = exe_path.split('\\')[-1]
-            except:
-                process_name = f"进程_{pid}"
-            finally:
-                win32api.CloseHandle(process)
-
-            return process_name, window_title, hwnd
-
-        except Exception as e:
-            print(f"获取窗口信息时出错: {e}")
-            return None
+        return self.source.get_foreground()
 
     def check_window_change(self):
         """检查窗口是否发生变化"""
@@ -80,7 +65,10 @@ class WindowMonitor:
             self.current_window = current_key
             self.current_process = process_name
             self.current_title = window_title
-            self.start_time = datetime.now()
+            self.start_time = self.clock.now()
+            # 上一个会话的计数已在结束时取走，这里丢弃没有前台窗口期间的输入
+            if self.input_monitor is not None:
+                self.input_monitor.take_session_counts()
 
             print(f"窗口切换: {process_name} - {window_title}")
 
@@ -89,26 +77,18 @@ class WindowMonitor:
         if self.start_time is None:
             return
 
-        end_time = datetime.now()
+        end_time = self.clock.now()
         duration = end_time - self.start_time
+        keystrokes, clicks = 0, 0
+        if self.input_monitor is not None:
+            keystrokes, clicks = self.input_monitor.take_session_counts()
 
         # 构造记录数据
-        record = {
-            'process_name': self.current_process,
-            'window_title': self.current_title,
-            'start_time': self.start_time,
-            'end_time': end_time,
-            'duration': duration.total_seconds()
-        }
-
-        # 调用回调函数
-        for i, callback in enumerate(self.callbacks):
-            try:
-                callback(record)
-            except Exception as e:
-                print(f"窗口监控回调函数 {i} 执行出错: {e}")
-                import traceback
-                traceback.print_exc()
+        record = WindowRecord(self.current_process, self.current_title, self.start_time, end_time,
+                              duration.total_seconds(), keystrokes, clicks)
+
+        # 发布记录，订阅者各自处理
+        self.events.publish(record)
 
     def start_monitoring(self, interval=1.0):
         """开始监控"""
@@ -128,6 +108,8 @@ class WindowMonitor:
         """停止监控并记录最后一个窗口"""
         if self.current_window is not None:
             self._record_window_end()
+        # 等待订阅者处理完最后的记录
+        self.events.drain(timeout=5)
         print("窗口监控已停止")
 
 
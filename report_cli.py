@@ -0,0 +1,284 @@
+"""
+报告命令行
+无需图形界面，使用Agg后端为一段日期批量生成每日、每周的时间轴/饼图/条形图（PNG或SVG）
+和HTML汇总页，适合定时任务；多个日期由进程池并行渲染，数据未变化的日期自动跳过
+
+用法:
+    python report_cli.py --start 2024-01-01 --end 2024-01-31 --output reports
+"""
+import sys
+import os
+import json
+import html
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, date, timedelta
+from typing import List, Dict, Any, Tuple, Optional
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from data.database import Database
+from data.partitions import open_database
+from data.storage import DataStorage
+from reporting import charts
+
+
+MANIFEST_NAME = "manifest.json"
+
+# 每个任务输出的图表：(文件名, 图形尺寸)
+DAY_CHARTS = [('timeline', (12, 4)), ('pie', (8, 8)), ('bar', (10, 6))]
+WEEK_CHARTS = DAY_CHARTS + [('range', (12, 8))]
+
+# 工作进程各自持有的数据库连接
+_worker_db: Optional[Database] = None
+
+
+def _init_worker(db_path: str):
+    """进程池初始化：每个工作进程以只读方式打开自己的数据库连接（按月分区时 db_path 为分区目录）"""
+    global _worker_db
+    _worker_db = open_database(db_path, read_only=True)
+
+
+def _save_figure(fig: Figure, path: str):
+    """调整布局并保存图形"""
+    fig.tight_layout()
+    fig.savefig(path)
+
+
+def render_job(kind: str, label: str, start: datetime, end: datetime,
+               out_dir: str, fmt: str) -> Tuple[str, str, List[str]]:
+    """
+    渲染一个日期或一周的全部图表（在工作进程中执行）
+    :param kind: 'day' 或 'week'
+    :return: (kind, label, 生成的文件名列表)
+    """
+    db = _worker_db
+    os.makedirs(out_dir, exist_ok=True)
+
+    columns = db.read_columns('window_activities', start, end, clip=True,
+                              columns=['process_name', 'start_time', 'end_time', 'duration'])
+    app_usage = charts.summarize_columns(columns)
+    input_series = db.get_input_minutes(start, end) if kind == 'day' else None
+
+    files = []
+    for name, size in (DAY_CHARTS if kind == 'day' else WEEK_CHARTS):
+        fig = Figure(figsize=size, dpi=100)
+        fig.patch.set_facecolor('white')
+        if name == 'range':
+            charts.draw_range_report(fig, db.get_range_report(start, end))
+        else:
+            ax = fig.add_subplot(111)
+            if name == 'timeline':
+                charts.draw_timeline_columns(ax, columns, app_usage, input_series)
+            elif name == 'pie':
+                charts.draw_pie_chart(ax, app_usage)
+            else:
+                charts.draw_bar_chart(ax, app_usage)
+
+        filename = f"{name}.{fmt}"
+        _save_figure(fig, os.path.join(out_dir, filename))
+        files.append(filename)
+
+    return kind, label, files
+
+
+class ReportBuilder:
+    def __init__(self, data_dir: str, output_dir: str, fmt: str = 'png',
+                 workers: Optional[int] = None, force: bool = False):
+        """
+        初始化报告生成器
+        :param data_dir: 数据目录（包含 focus_insight.db）
+        :param output_dir: 输出目录
+        :param fmt: 图片格式，'png' 或 'svg'
+        :param workers: 渲染进程数，默认为CPU核数
+        :param force: 忽略清单，全部重新渲染
+        """
+        self.storage = DataStorage(data_dir, read_only=True)
+        self.output_dir = output_dir
+        self.fmt = fmt
+        self.workers = workers
+        self.force = force
+
+        os.makedirs(output_dir, exist_ok=True)
+        self.manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        self.manifest = self.load_manifest()
+
+    def load_manifest(self) -> Dict[str, Any]:
+        """读取上次生成时记录的数据版本"""
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"读取报告清单失败，将全部重新生成: {e}")
+        return {'jobs': {}}
+
+    def save_manifest(self):
+        """保存清单"""
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+
+    def plan_jobs(self, start_day: date, end_day: date) -> List[Dict[str, Any]]:
+        """列出范围内的每一天和涉及的每一周（周一到周日）"""
+        jobs = []
+        day = start_day
+        while day <= end_day:
+            begin = datetime.combine(day, datetime.min.time())
+            jobs.append({'kind': 'day', 'label': day.isoformat(), 'start': begin,
+                         'end': datetime.combine(day, datetime.max.time())})
+            day += timedelta(days=1)
+
+        week = start_day - timedelta(days=start_day.weekday())
+        while week <= end_day:
+            year, number, _ = week.isocalendar()
+            jobs.append({'kind': 'week', 'label': f"{year}-W{number:02d}",
+                         'start': datetime.combine(week, datetime.min.time()),
+                         'end': datetime.combine(week + timedelta(days=6), datetime.max.time())})
+            week += timedelta(days=7)
+        return jobs
+
+    def job_dir(self, job: Dict[str, Any]) -> str:
+        """任务的输出目录"""
+        return os.path.join(self.output_dir, job['label'])
+
+    def is_up_to_date(self, job: Dict[str, Any]) -> bool:
+        """数据版本和图片格式与清单一致且文件都在时跳过"""
+        entry = self.manifest['jobs'].get(job['label'])
+        if self.force or not entry:
+            return False
+        if entry['watermark'] != job['watermark'] or entry['format'] != self.fmt:
+            return False
+        return all(os.path.exists(os.path.join(self.job_dir(job), name)) for name in entry['files'])
+
+    def build(self, start_day: date, end_day: date) -> Dict[str, int]:
+        """
+        生成报告
+        :return: 渲染和跳过的任务数
+        """
+        jobs = self.plan_jobs(start_day, end_day)
+        for job in jobs:
+            job['watermark'] = self.storage.db.get_range_watermark(job['start'], job['end'])
+        pending = [job for job in jobs if not self.is_up_to_date(job)]
+
+        print(f"共 {len(jobs)} 个任务，{len(jobs) - len(pending)} 个数据未变化已跳过，{len(pending)} 个需要渲染")
+
+        if pending:
+            jobs_by_label = {job['label']: job for job in pending}
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(self.storage.db.db_path,)) as pool:
+                futures = [pool.submit(render_job, job['kind'], job['label'], job['start'], job['end'],
+                                       self.job_dir(job), self.fmt) for job in pending]
+                for future in as_completed(futures):
+                    try:
+                        kind, label, files = future.result()
+                    except Exception as e:
+                        print(f"渲染失败: {e}")
+                        continue
+                    self.manifest['jobs'][label] = {
+                        'kind': kind,
+                        'watermark': jobs_by_label[label]['watermark'],
+                        'format': self.fmt,
+                        'files': files,
+                        'rendered_at': datetime.now().isoformat(timespec='seconds'),
+                    }
+                    print(f"已生成 {label}")
+                    # 每完成一个任务就保存清单，中断后重跑只补做剩下的
+                    self.save_manifest()
+
+        self.write_index(jobs)
+        return {'rendered': len(pending), 'skipped': len(jobs) - len(pending)}
+
+    def write_index(self, jobs: List[Dict[str, Any]]):
+        """生成HTML汇总页：每日摘要表格和各日期、各周的图表"""
+        rows = []
+        sections = []
+        for job in jobs:
+            entry = self.manifest['jobs'].get(job['label'])
+            images = ''.join(f'<img src="{html.escape(job["label"])}/{html.escape(name)}" alt="{html.escape(name)}">'
+                             for name in (entry['files'] if entry else []))
+            sections.append(f'<h2 id="{job["label"]}">{job["label"]}</h2>\n<div class="charts">{images}</div>')
+
+            if job['kind'] != 'day':
+                continue
+            summary = self.storage.get_daily_summary(job['start'])
+            rows.append(
+                f'<tr><td><a href="#{job["label"]}">{job["label"]}</a></td>'
+                f'<td>{summary["total_active_time"] / 3600:.1f}</td>'
+                f'<td>{summary["total_idle_time"] / 3600:.1f}</td>'
+                f'<td>{summary["app_count"]}</td>'
+                f'<td>{summary["focus_streak_count"]}</td>'
+                f'<td>{summary["longest_focus_streak"] / 60:.0f}</td>'
+                f'<td>{summary["focus_efficiency"]:.1f}%</td></tr>'
+            )
+
+        page = f"""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<title>Focus-Insight 报告</title>
+<style>
+body {{ font-family: sans-serif; margin: 20px; }}
+table {{ border-collapse: collapse; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 10px; text-align: right; }}
+.charts img {{ max-width: 32%; margin: 4px; vertical-align: top; }}
+</style>
+</head>
+<body>
+<h1>Focus-Insight 报告</h1>
+<p>生成时间: {datetime.now():%Y-%m-%d %H:%M}</p>
+<table>
+<tr><th>日期</th><th>活跃(小时)</th><th>空闲(小时)</th><th>应用数</th><th>专注段</th><th>最长专注(分钟)</th><th>专注效率</th></tr>
+{chr(10).join(rows)}
+</table>
+{chr(10).join(sections)}
+</body>
+</html>
+"""
+        with open(os.path.join(self.output_dir, "index.html"), 'w', encoding='utf-8') as f:
+            f.write(page)
+
+    def close(self):
+        """关闭数据存储"""
+        self.storage.close()
+
+
+def parse_date(text: str) -> date:
+    """解析 YYYY-MM-DD 格式的日期"""
+    return datetime.strptime(text, "%Y-%m-%d").date()
+
+
+def main():
+    """主函数 - 解析参数并生成报告"""
+    parser = argparse.ArgumentParser(description="Focus-Insight 报告命令行（无界面批量生成图表和HTML）")
+    parser.add_argument('--start', type=parse_date, default=None, help="起始日期 YYYY-MM-DD，默认为7天前")
+    parser.add_argument('--end', type=parse_date, default=None, help="结束日期 YYYY-MM-DD，默认为今天")
+    parser.add_argument('--output', default="reports", help="输出目录")
+    parser.add_argument('--format', choices=['png', 'svg'], default='png', help="图片格式")
+    parser.add_argument('--workers', type=int, default=None, help="渲染进程数，默认为CPU核数")
+    parser.add_argument('--data-dir', default="data", help="数据目录")
+    parser.add_argument('--force', action='store_true', help="忽略清单，全部重新渲染")
+    args = parser.parse_args()
+
+    end_day = args.end or date.today()
+    start_day = args.start or end_day - timedelta(days=6)
+    if start_day > end_day:
+        parser.error("起始日期不能晚于结束日期")
+
+    print(f"=== Focus-Insight 报告: {start_day} 到 {end_day} ===")
+    builder = ReportBuilder(args.data_dir, args.output, fmt=args.format,
+                            workers=args.workers, force=args.force)
+    try:
+        result = builder.build(start_day, end_day)
+        print(f"完成：渲染 {result['rendered']} 个，跳过 {result['skipped']} 个，"
+              f"汇总页: {os.path.join(args.output, 'index.html')}")
+    finally:
+        builder.close()
+
+
+if __name__ == "__main__":
+    main()
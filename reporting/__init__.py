@@ -0,0 +1,6 @@
+"""
+报告模块初始化文件
+"""
+from . import charts
+
+__all__ = ['charts']
@@ -0,0 +1,316 @@
+"""
+图表绘制模块
+时间轴、饼图、条形图和范围报告的绘制函数，只依赖matplotlib的坐标轴对象，
+既供Tk界面中的 TimelineWidget 使用，也供无界面的报告命令行（Agg后端）使用
+"""
+import matplotlib.pyplot as plt
+import matplotlib.patches as mpatches
+from matplotlib.patches import Rectangle
+from matplotlib.colors import to_rgba
+from matplotlib.dates import AutoDateLocator, ConciseDateFormatter, date2num
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Tuple, Optional
+
+# 设置中文字体
+plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'SimSun', 'Arial Unicode MS']
+plt.rcParams['axes.unicode_minus'] = False
+
+
+# 应用颜色映射
+APP_COLORS = {
+    'chrome.exe': '#4285F4',      # Google蓝
+    'firefox.exe': '#FF6611',     # Firefox橙
+    'msedge.exe': '#0078D4',      # Edge蓝
+    'explorer.exe': '#00BCF2',    # Windows蓝
+    'cmd.exe': '#000000',         # 黑色
+    'python.exe': '#3776AB',      # Python蓝
+    'zed.exe': '#FFA500',         # 橙色
+    'code.exe': '#007ACC',        # VS Code蓝
+    'default': '#888888'          # 默认灰色
+}
+
+# 时间块高度
+BAR_HEIGHT = 0.8
+
+NO_DATA_TEXT = '暂无数据\n请先运行监控程序收集数据'
+
+
+def get_app_color(process_name: str) -> str:
+    """获取应用颜色"""
+    return APP_COLORS.get(process_name.lower(), APP_COLORS['default'])
+
+
+def parse_time(value) -> datetime:
+    """数据库中的时间可能是字符串"""
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def summarize_usage(data: List[Dict[str, Any]], app_usage: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """
+    按应用累计时长
+    :param app_usage: 已有的累计结果，传入时在其基础上累加
+    """
+    app_usage = {} if app_usage is None else app_usage
+    for record in data:
+        app = record['process_name']
+        app_usage[app] = app_usage.get(app, 0) + record['duration']
+    return app_usage
+
+
+def summarize_columns(columns: Dict[str, Any]) -> Dict[str, float]:
+    """按应用累计时长（列数据版本，Database.read_columns 的结果需包含 process_name 和 duration）"""
+    import numpy as np
+
+    names = columns['dictionaries']['process_name']
+    totals = np.bincount(columns['process_name'], weights=columns['duration'], minlength=len(names))
+    return {name: float(total) for name, total in zip(names, totals) if total > 0}
+
+
+def draw_no_data(ax):
+    """在坐标轴中央显示无数据提示"""
+    ax.text(0.5, 0.5, NO_DATA_TEXT, ha='center', va='center', transform=ax.transAxes, fontsize=14)
+
+
+def add_session_patch(ax, record: Dict[str, Any], bar_height: float = BAR_HEIGHT) -> Tuple[float, float]:
+    """
+    为一条会话添加时间块
+    :return: 时间块的 (起点, 终点)，matplotlib日期数值
+    """
+    start_num = date2num(parse_time(record['start_time']))
+    end_num = date2num(parse_time(record['end_time']))
+
+    rect = Rectangle((start_num, 0), end_num - start_num, bar_height,
+                     facecolor=get_app_color(record['process_name']), edgecolor='white',
+                     linewidth=1, picker=True)
+    ax.add_patch(rect)
+    return start_num, end_num
+
+
+def add_live_session_patch(ax, record: Dict[str, Any], bar_height: float = BAR_HEIGHT) -> Rectangle:
+    """
+    为进行中的会话添加时间块（半透明、带斜线，区别于已结束的会话）
+    animated 的图元不参与完整重绘，由调用方通过 blit 绘制，会话每秒延长时不需要重绘整个时间轴
+    """
+    rect = Rectangle((0, 0), 0, bar_height, facecolor='none', linewidth=1.5, linestyle='--',
+                     hatch='//', animated=True)
+    update_live_session_patch(rect, record)
+    ax.add_patch(rect)
+    return rect
+
+
+def update_live_session_patch(rect: Rectangle, record: Dict[str, Any]):
+    """把进行中会话的时间块更新到最新的应用和结束时间"""
+    start_num = date2num(parse_time(record['start_time']))
+    end_num = date2num(parse_time(record['end_time']))
+    color = get_app_color(record['process_name'])
+    rect.set_x(start_num)
+    rect.set_width(end_num - start_num)
+    rect.set_facecolor(to_rgba(color, 0.45))
+    rect.set_edgecolor(color)
+
+
+def padded_limits(min_time: datetime, max_time: datetime) -> Tuple[datetime, datetime]:
+    """时间范围两侧各留5%的空白"""
+    time_range = max_time - min_time
+    if time_range.total_seconds() == 0:
+        time_range = timedelta(hours=1)  # 至少显示1小时
+    return min_time - time_range * 0.05, max_time + time_range * 0.05
+
+
+def draw_input_intensity(ax, input_series, base_y: float = BAR_HEIGHT):
+    """在时间轴上方绘制键盘+鼠标的每分钟活动强度曲线"""
+    if input_series is None or len(input_series['times']) == 0:
+        return
+
+    intensity = input_series['keyboard'] + input_series['mouse']
+    peak = intensity.max()
+    if peak <= 0:
+        return
+
+    # 缩放到时间块上方的 [base_y + 0.05, base_y + 0.6] 区域
+    level = base_y + 0.05 + intensity / peak * 0.55
+    ax.fill_between(input_series['times'], base_y + 0.05, level,
+                    step='post', color='#34A853', alpha=0.4, linewidth=0)
+
+
+def add_legend(ax, app_usage: Dict[str, float]):
+    """添加图例（使用时间最长的8个应用）"""
+    legend_items = []
+    for app, duration in sorted(app_usage.items(), key=lambda x: x[1], reverse=True)[:8]:
+        label = f"{app} ({duration/60:.1f}分钟)"
+        legend_items.append(mpatches.Patch(color=get_app_color(app), label=label))
+
+    if legend_items:
+        ax.legend(handles=legend_items, loc='upper right', fontsize=8)
+
+
+def draw_timeline(ax, data: List[Dict[str, Any]], app_usage: Dict[str, float], input_series=None,
+                  limits: Optional[Tuple[datetime, datetime]] = None,
+                  bar_height: float = BAR_HEIGHT) -> List[Tuple[float, float, Dict[str, Any]]]:
+    """
+    绘制时间轴
+    :param limits: 固定的可见范围，默认按数据范围自动设置（两侧留白）
+    :return: 每个时间块的 (起点, 终点, 记录)，供鼠标悬停查找
+    """
+    if not data and limits is None:
+        draw_no_data(ax)
+        return []
+
+    # 绘制时间轴块
+    sessions = []
+    for record in data:
+        start_num, end_num = add_session_patch(ax, record, bar_height)
+        sessions.append((start_num, end_num, record))
+
+    # 在时间块上方绘制每分钟输入强度
+    draw_input_intensity(ax, input_series, bar_height)
+
+    if limits is None:
+        limits = padded_limits(min(parse_time(record['start_time']) for record in data),
+                               max(parse_time(record['end_time']) for record in data))
+    style_timeline_axes(ax, limits, app_usage)
+    return sessions
+
+
+def draw_timeline_columns(ax, columns: Dict[str, Any], app_usage: Dict[str, float], input_series=None,
+                          limits: Optional[Tuple[datetime, datetime]] = None, bar_height: float = BAR_HEIGHT):
+    """
+    按列数据绘制时间轴（无界面报告使用）：每个应用一次 broken_barh，不逐条创建矩形
+    :param columns: Database.read_columns 的结果，需包含 process_name、start_time、end_time
+    :param limits: 固定的可见范围，默认按数据范围自动设置（两侧留白）
+    """
+    import numpy as np
+
+    count = len(columns['start_time'])
+    if count == 0 and limits is None:
+        draw_no_data(ax)
+        return
+
+    starts = date2num(columns['start_time'].view('datetime64[us]'))
+    widths = date2num(columns['end_time'].view('datetime64[us]')) - starts
+    codes = columns['process_name']
+    for code, app in enumerate(columns['dictionaries']['process_name']):
+        selected = codes == code
+        if selected.any():
+            ax.broken_barh(np.column_stack((starts[selected], widths[selected])), (0, bar_height),
+                           facecolors=get_app_color(app), edgecolor='white', linewidth=1)
+
+    draw_input_intensity(ax, input_series, bar_height)
+
+    if limits is None:
+        first = columns['start_time'].min().astype('datetime64[us]').astype(datetime)
+        last = columns['end_time'].max().astype('datetime64[us]').astype(datetime)
+        limits = padded_limits(first, last)
+    style_timeline_axes(ax, limits, app_usage)
+
+
+def style_timeline_axes(ax, limits: Tuple[datetime, datetime], app_usage: Dict[str, float]):
+    """设置时间轴的可见范围、刻度、标题和图例"""
+    ax.set_xlim(*limits)
+    ax.set_ylim(-0.5, 1.5)
+
+    # 刻度随可见跨度自动选择（分钟、小时或日期）
+    locator = AutoDateLocator()
+    ax.xaxis.set_major_locator(locator)
+    ax.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+
+    # 隐藏y轴
+    ax.set_yticks([])
+    ax.set_ylabel('')
+
+    # 设置标题
+    ax.set_title('Timeline - Application Usage', fontsize=16, fontweight='bold', pad=20)
+
+    # 添加网格
+    ax.grid(True, axis='x', alpha=0.3)
+
+    # 添加图例
+    add_legend(ax, app_usage)
+
+
+def draw_pie_chart(ax, app_usage: Dict[str, float]):
+    """绘制应用使用时间占比饼图"""
+    if not app_usage:
+        draw_no_data(ax)
+        return
+
+    apps = list(app_usage.keys())
+    durations = list(app_usage.values())
+    colors = [get_app_color(app) for app in apps]
+
+    ax.pie(durations, labels=apps, colors=colors, autopct='%1.1f%%', startangle=90)
+    ax.set_title('Application Usage Distribution', fontsize=16, fontweight='bold')
+
+
+def draw_bar_chart(ax, app_usage: Dict[str, float]):
+    """绘制使用时间最长的10个应用的条形图"""
+    sorted_apps = sorted(app_usage.items(), key=lambda x: x[1], reverse=True)[:10]
+    if not sorted_apps:
+        draw_no_data(ax)
+        return
+
+    apps = [item[0] for item in sorted_apps]
+    durations = [item[1]/60 for item in sorted_apps]  # 转换为分钟
+    colors = [get_app_color(app) for app in apps]
+
+    bars = ax.bar(range(len(apps)), durations, color=colors)
+
+    # 设置标签
+    ax.set_xticks(range(len(apps)))
+    ax.set_xticklabels(apps, rotation=45, ha='right')
+    ax.set_ylabel('Usage Time (minutes)')
+    ax.set_title('Top Applications by Usage Time', fontsize=16, fontweight='bold')
+
+    # 在条形图上显示数值
+    for bar, duration in zip(bars, durations):
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2., height, f'{duration:.1f}', ha='center', va='bottom')
+
+
+def draw_range_report(fig, report: Dict[str, Any]) -> list:
+    """
+    在整个图形上绘制日期范围报告：应用总计、每日趋势和星期×小时热力图
+    :return: 创建的子图列表
+    """
+    fig.clear()
+    grid = fig.add_gridspec(2, 2, height_ratios=[1, 1])
+    ax_apps = fig.add_subplot(grid[0, 0])
+    ax_trend = fig.add_subplot(grid[0, 1])
+    ax_heatmap = fig.add_subplot(grid[1, :])
+    axes = [ax_apps, ax_trend, ax_heatmap]
+
+    if not report['app_totals']:
+        draw_no_data(ax_apps)
+        return axes
+
+    # 应用总计（前10，单位小时）
+    top_apps = report['app_totals'][:10][::-1]
+    apps = [item['process_name'] for item in top_apps]
+    hours = [item['seconds'] / 3600 for item in top_apps]
+    ax_apps.barh(range(len(apps)), hours, color=[get_app_color(app) for app in apps])
+    ax_apps.set_yticks(range(len(apps)))
+    ax_apps.set_yticklabels(apps, fontsize=8)
+    ax_apps.set_xlabel('Hours')
+    ax_apps.set_title('Top Applications', fontsize=12, fontweight='bold')
+
+    # 每日趋势
+    days = [item['date'] for item in report['daily_trend']]
+    day_hours = [item['seconds'] / 3600 for item in report['daily_trend']]
+    ax_trend.bar(range(len(days)), day_hours, color='#4285F4')
+    step = max(1, len(days) // 10)
+    ax_trend.set_xticks(range(0, len(days), step))
+    ax_trend.set_xticklabels([day.strftime('%m-%d') for day in days[::step]],
+                             rotation=45, ha='right', fontsize=8)
+    ax_trend.set_ylabel('Hours')
+    ax_trend.set_title('Daily Trend', fontsize=12, fontweight='bold')
+
+    # 星期 × 小时热力图（单位分钟）
+    heatmap = [[seconds / 60 for seconds in row] for row in report['heatmap']]
+    image = ax_heatmap.imshow(heatmap, aspect='auto', cmap='Blues', interpolation='nearest')
+    ax_heatmap.set_yticks(range(7))
+    ax_heatmap.set_yticklabels(['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'], fontsize=8)
+    ax_heatmap.set_xticks(range(0, 24, 2))
+    ax_heatmap.set_xticklabels([f"{hour:02d}:00" for hour in range(0, 24, 2)], fontsize=8)
+    ax_heatmap.set_title('Activity Heatmap (minutes)', fontsize=12, fontweight='bold')
+    fig.colorbar(image, ax=ax_heatmap, fraction=0.03)
+    return axes